@@ -0,0 +1,88 @@
+# encoding: utf-8
+"""
+Peak memory and CPU time spent turning a gzipped REST response into
+Python objects, with the former read-everything pipeline and with the
+incremental one of `twitter.api.read_body`.
+
+The response is a synthetic 200 tweets `tweet_mode=extended` timeline::
+
+    PYTHONPATH=. python benchmarks/bench_decode.py [repeat]
+"""
+from __future__ import print_function, unicode_literals
+
+import gzip
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from twitter.api import read_body
+
+
+def make_timeline(count=200):
+    user = {
+        "id": 12, "id_str": "12", "name": "Someone", "screen_name": "someone",
+        "description": "x" * 160, "followers_count": 1234,
+        "profile_image_url_https": "https://pbs.twimg.com/profile_images/1/a.jpg",
+    }
+    return [{
+        "id": 1000 + i, "id_str": str(1000 + i),
+        "created_at": "Wed Oct 10 20:19:24 +0000 2018",
+        "full_text": "tweet number %i " % i + "lorem ipsum " * 20,
+        "display_text_range": [0, 260], "truncated": False,
+        "entities": {
+            "hashtags": [{"text": "python", "indices": [1, 8]}],
+            "urls": [{"url": "https://t.co/abc", "expanded_url":
+                      "https://example.com/%i" % i, "indices": [9, 32]}],
+            "user_mentions": [],
+        },
+        "user": dict(user), "retweet_count": i, "favorite_count": 2 * i,
+        "lang": "en",
+    } for i in range(count)]
+
+
+class FakeResponse(object):
+
+    def __init__(self, data):
+        self.headers = {"Content-Encoding": "gzip"}
+        self._fp = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._fp.read(amt)
+
+
+def old_pipeline(handle):
+    data = handle.read()
+    buf = io.BytesIO(data)
+    data = gzip.GzipFile(fileobj=buf).read()
+    return json.loads(data.decode('utf8'))
+
+
+def new_pipeline(handle):
+    return json.loads(read_body(handle).decode('utf8'))
+
+
+def measure(pipeline, data, repeat):
+    tracemalloc.start()
+    pipeline(FakeResponse(data))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.process_time()
+    for _ in range(repeat):
+        pipeline(FakeResponse(data))
+    return peak, (time.process_time() - start) / repeat
+
+
+def main(repeat=50):
+    body = json.dumps(make_timeline()).encode('utf8')
+    data = gzip.compress(body)
+    print("response: %i bytes, %i bytes gzipped" % (len(body), len(data)))
+    for name, pipeline in (("old", old_pipeline), ("new", new_pipeline)):
+        peak, cpu = measure(pipeline, data, repeat)
+        print("%s: peak %7.1f KiB, %6.2f ms CPU per response" % (
+            name, peak / 1024.0, cpu * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,263 @@
+# encoding: utf-8
+"""
+Time per call of the hot paths of the client, measured offline on
+synthetic payloads shaped like the real ones::
+
+    PYTHONPATH=. python benchmarks/bench_hotpaths.py [options] [name...]
+
+Options:
+  --json FILE      write the results to FILE, as JSON
+  --compare FILE   compare them with the results saved in FILE
+  --time SECONDS   time spent on each repetition (default 0.2)
+  --repeat N       repetitions per benchmark, the best counts (default 5)
+
+The names given select the benchmarks whose name starts with them. To
+compare two releases, save the results of the old one and compare those
+of the new one with them::
+
+    python benchmarks/bench_hotpaths.py --json old.json      # old checkout
+    python benchmarks/bench_hotpaths.py --compare old.json   # new checkout
+
+REST calls go through a `twitter.transport.MemoryTransport`, so that
+the whole of `TwitterCall.__call__` is measured without any network.
+Releases without transports (or without `twitter.json_backend`) skip
+the benchmarks which need them.
+"""
+from __future__ import print_function, unicode_literals
+
+import gzip
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+from payloads import make_user
+
+from twitter import OAuth, Twitter
+from twitter.api import build_uri, method_for_uri, wrap_response
+from twitter.archiver import format_date, load_tweets, save_tweets
+from twitter.cmdline import status_formatters
+from twitter.oauth import urlencode_noplus
+from twitter.stream import HttpChunkDecoder, JsonDecoder
+
+# Missing from older releases, which are still worth comparing with.
+try:
+    from twitter.json_backend import get_backend
+except ImportError:
+    get_backend = None
+try:
+    from twitter.transport import MemoryResponse, MemoryTransport
+except ImportError:
+    MemoryTransport = None
+
+TEXTS = [
+    "Just setting up my twttr",
+    "RT @someone: Lorem ipsum dolor sit amet, consectetur adipiscing elit "
+    "#python https://t.co/abcdefghij",
+    "@user3 @user7 café naïve — \U0001F600 &amp; &lt;3 "
+    "https://t.co/0123456789 sed do eiusmod tempor incididunt ut labore",
+]
+
+
+def make_status(i, users=20):
+    """A tweet as the v1.1 API returns it, with its author."""
+    created = datetime(2018, 10, 10, 20, 19, 24) + timedelta(minutes=i)
+    return {
+        "created_at": created.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        "id": 10 ** 18 + i, "id_str": str(10 ** 18 + i),
+        "text": TEXTS[i % len(TEXTS)],
+        "truncated": False,
+        "entities": {"hashtags": [{"text": "python", "indices": [70, 77]}],
+                     "symbols": [], "user_mentions": [],
+                     "urls": [{"url": "https://t.co/abcdefghij",
+                               "expanded_url": "https://example.com/%i" % i,
+                               "indices": [78, 101]}]},
+        "source": '<a href="https://mobile.twitter.com">Twitter Web App</a>',
+        "in_reply_to_status_id": None, "in_reply_to_user_id": None,
+        "in_reply_to_screen_name": None, "user": make_user(i % users),
+        "geo": None, "coordinates": None, "place": None,
+        "is_quote_status": False, "retweet_count": i, "favorite_count": 2 * i,
+        "favorited": False, "retweeted": False, "lang": "en",
+    }
+
+
+def make_timeline(count=200):
+    return [make_status(i) for i in range(count)]
+
+
+def chunked(messages):
+    """The body of a stream of messages, with its HTTP chunk framing."""
+    body = bytearray()
+    for message in messages:
+        data = json.dumps(message).encode('utf-8') + b'\r\n'
+        body += b'%x\r\n%s\r\n' % (len(data), data)
+    return bytes(body)
+
+
+def gzipped(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def benchmarks(tmpdir):
+    """Return the (name, function) of the benchmarks, each function
+    running the code measured once."""
+    timeline = make_timeline()
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    messages = make_timeline(50)
+    stream_body = chunked(messages)
+    stream_text = ''.join(json.dumps(m) + '\r\n' for m in messages)
+    json_backend = get_backend() if get_backend is not None else None
+    oauth = OAuth("12-token", "token-secret", "consumer-key",
+                  "consumer-secret")
+    params = {"status": TEXTS[2], "in_reply_to_status_id": "1000000000000000",
+              "auto_populate_reply_metadata": "true", "tweet_mode": "extended"}
+    params_list = sorted(params.items())
+    uris = ["statuses/user_timeline", "statuses/update", "friendships/create",
+            "users/show", "statuses/destroy/12345", "lists/members/create_all",
+            "direct_messages/events/list", "search/tweets"]
+    twitter = Twitter()
+    twitter.statuses.user_timeline   # memoized children, as in a program
+
+    archive = os.path.join(tmpdir, "archive.txt")
+    tweets = dict((status["id"], status["text"]) for status in
+                  make_timeline(1000))
+    save_tweets(archive, tweets)
+    dates = [status["created_at"] for status in timeline[:20]]
+    options = {"timestamp": True, "datestamp": True}
+    formatters = dict((name, cls()) for name, cls in
+                      sorted(status_formatters.items()))
+
+    def decode_chunks():
+        # in pieces of the size read from the socket
+        decoder = HttpChunkDecoder()
+        for i in range(0, len(stream_body), 4096):
+            decoder.decode(stream_body[i:i + 4096])
+
+    def decode_json():
+        decoder = JsonDecoder(json_backend) if json_backend else JsonDecoder()
+        for i in range(0, len(stream_text), 4096):
+            decoder.decode(stream_text[i:i + 4096])
+
+    def format_statuses(formatter):
+        def run():
+            for status in timeline[:20]:
+                formatter(dict(status), options)
+        return run
+
+    yield "build_uri", lambda: build_uri(
+        ["statuses", "show", "_id"], {"_id": 1234, "tweet_mode": "extended"})
+    yield "method_for_uri", lambda: [method_for_uri(uri) for uri in uris]
+    yield "getattr_chain", lambda: twitter.statuses.user_timeline
+    yield "getattr_chain_new", lambda: Twitter().statuses.user_timeline
+    yield "oauth_encode_params", lambda: oauth.encode_params(
+        "https://api.twitter.com/1.1/statuses/update.json", "POST", params)
+    yield "urlencode_noplus", lambda: urlencode_noplus(params_list)
+    yield "wrap_response_dict", lambda: wrap_response(timeline[0], headers)
+    yield "wrap_response_list", lambda: wrap_response(timeline, headers)
+    yield "http_chunk_decode_50", decode_chunks
+    yield "json_decode_50_%s" % (
+        json_backend.name if json_backend else "json"), decode_json
+    if MemoryTransport is not None:
+        transport = MemoryTransport()
+        transport.add("GET", "/1.1/statuses/home_timeline.json",
+                      MemoryResponse(
+                          200, dict(headers, **{"Content-Encoding": "gzip"}),
+                          gzipped(json.dumps(timeline).encode('utf-8'))))
+        transport.add("GET", "/1.1/users/show.json", make_user(12))
+        rest = Twitter(auth=oauth, transport=transport)
+        rest.gzip = True
+        yield "call_users_show", lambda: rest.users.show(screen_name="user12")
+        yield "call_home_timeline_200_gzip", \
+            lambda: rest.statuses.home_timeline(count=200)
+    yield "archiver_format_date_20", lambda: [format_date(d) for d in dates]
+    yield "archiver_load_tweets_1000", lambda: load_tweets(archive)
+    yield "archiver_save_tweets_1000", lambda: save_tweets(archive, tweets)
+    for name, formatter in formatters.items():
+        yield "cmdline_format_%s_20" % name, format_statuses(formatter)
+
+
+def measure(fn, seconds, repeat):
+    """Return the number of calls per run and the best and median time
+    per call of `repeat` runs of about `seconds`."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        if timer.timeit(number) >= seconds / 10:
+            break
+        number *= 10
+    number = max(1, int(number * seconds / timer.timeit(number)))
+    times = sorted(t / number for t in timer.repeat(repeat, number))
+    return number, times[0], times[len(times) // 2]
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds >= 1 / scale:
+            return "%7.2f %-2s" % (seconds * scale, unit)
+    return "%7.2f ns" % (seconds * 1e9)
+
+
+def main(argv):
+    args = list(argv)
+    options = {"--json": None, "--compare": None, "--time": "0.2",
+               "--repeat": "5"}
+    names = []
+    while args:
+        arg = args.pop(0)
+        if arg in options:
+            options[arg] = args.pop(0)
+        else:
+            names.append(arg)
+    seconds = float(options["--time"])
+    repeat = int(options["--repeat"])
+    previous = {}
+    if options["--compare"]:
+        with open(options["--compare"]) as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name, fn in benchmarks(tmpdir):
+            if names and not any(name.startswith(n) for n in names):
+                continue
+            try:
+                number, best, median = measure(fn, seconds, repeat)
+            except Exception as e:
+                # e.g. code broken in the release measured
+                print("%-32s failed: %r" % (name, e))
+                continue
+            results[name] = {"number": number, "best": best, "median": median}
+            line = "%-32s %s  (median %s)" % (
+                name, format_time(best), format_time(median))
+            if name in previous:
+                line += "  %+6.1f%%" % (
+                    100.0 * (best / previous[name]["best"] - 1))
+            print(line)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if options["--json"]:
+        report = {
+            "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "json_backend": get_backend().name if get_backend else "json",
+            "unit": "seconds per call",
+            "results": results,
+        }
+        with open(options["--json"], "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+# encoding: utf-8
+"""
+Memory held by decoded home timelines, as dicts and as the models of
+`twitter.models`, and the time spent decoding them::
+
+    PYTHONPATH=. python benchmarks/bench_models.py [timelines]
+
+Each synthetic timeline holds 200 tweets written by 20 users, with the
+full user profile repeated in every tweet as the API does.
+"""
+from __future__ import print_function, unicode_literals
+
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from payloads import make_user
+
+from twitter.json_backend import get_backend
+from twitter.models import loads
+
+
+def make_timeline(count=200, users=20):
+    return [{
+        "created_at": "Wed Oct 10 20:19:24 +0000 2018",
+        "id": 10 ** 18 + i, "id_str": str(10 ** 18 + i),
+        "full_text": "tweet number %i " % i + "lorem ipsum " * 15,
+        "truncated": False, "display_text_range": [0, 200],
+        "entities": {"hashtags": [], "symbols": [], "user_mentions": [],
+                     "urls": []},
+        "source": '<a href="https://mobile.twitter.com">Twitter Web App</a>',
+        "in_reply_to_status_id": None, "in_reply_to_status_id_str": None,
+        "in_reply_to_user_id": None, "in_reply_to_user_id_str": None,
+        "in_reply_to_screen_name": None, "user": make_user(i % users),
+        "geo": None, "coordinates": None, "place": None,
+        "contributors": None, "is_quote_status": False,
+        "retweet_count": i, "favorite_count": 2 * i, "favorited": False,
+        "retweeted": False, "lang": "en",
+    } for i in range(count)]
+
+
+def measure(decode, data, timelines):
+    gc.collect()
+    tracemalloc.start()
+    kept = [decode(data) for _ in range(timelines)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    start = time.process_time()
+    for _ in range(timelines):
+        decode(data)
+    return size, time.process_time() - start
+
+
+def main(timelines=20):
+    data = json.dumps(make_timeline()).encode('utf8')
+    tweets = timelines * 200
+    print("%i timelines of 200 tweets, %i bytes each" % (timelines, len(data)))
+    decoders = []
+    for name in ('json', 'orjson', 'ujson', 'msgspec'):
+        try:
+            decoders.append(("%s dicts" % name, get_backend(name).loads))
+        except ImportError:
+            pass
+    decoders.append(("models", loads))
+    for label, decode in decoders:
+        size, cpu = measure(decode, data, timelines)
+        print("%-14s: %6.0f bytes per tweet, %5.1f us CPU per tweet"
+              % (label, size / float(tweets), cpu * 1e6 / tweets))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,34 @@
+# encoding: utf-8
+"""
+Synthetic payloads shared by the benchmarks. This module doesn't import
+`twitter`, so that benchmarks can be run against older releases.
+"""
+from __future__ import unicode_literals
+
+
+def make_user(i):
+    return {
+        "id": i, "id_str": str(i), "name": "User %i" % i,
+        "screen_name": "user%i" % i, "location": "Somewhere",
+        "description": "A description of user %i " % i + "x" * 100,
+        "url": "https://t.co/%i" % i,
+        "entities": {"description": {"urls": []}},
+        "protected": False, "followers_count": 1000 + i,
+        "friends_count": 100 + i, "listed_count": 3,
+        "created_at": "Sat Mar 03 19:06:58 +0000 2007",
+        "favourites_count": 5, "utc_offset": None, "time_zone": None,
+        "geo_enabled": False, "verified": False, "statuses_count": 4000,
+        "lang": None, "contributors_enabled": False,
+        "is_translator": False, "is_translation_enabled": False,
+        "profile_background_color": "C0DEED",
+        "profile_background_image_url": "http://abs.twimg.com/bg.png",
+        "profile_background_tile": False,
+        "profile_image_url": "http://pbs.twimg.com/profile_images/%i.jpg" % i,
+        "profile_image_url_https": "https://pbs.twimg.com/profile_images/%i.jpg" % i,
+        "profile_link_color": "1DA1F2", "profile_sidebar_border_color": "C0DEED",
+        "profile_sidebar_fill_color": "DDEEF6", "profile_text_color": "333333",
+        "profile_use_background_image": True, "has_extended_profile": False,
+        "default_profile": True, "default_profile_image": False,
+        "following": False, "follow_request_sent": False,
+        "notifications": False, "translator_type": "none",
+    }
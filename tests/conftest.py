@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # asyncio client, Python 3 syntax
+    collect_ignore.append("test_aio.py")
@@ -0,0 +1,173 @@
+# encoding: utf-8
+import asyncio
+import socket
+import urllib.error as urllib_error
+
+import pytest
+
+from twitter import (
+    AsyncTwitter, AsyncTwitterStream, TwitterHTTPError, TwitterTimeoutError)
+from twitter.aio import AsyncConnectionPool
+
+from .test_connection import start_api_server, start_resetting_server
+
+
+def test_async_calls_share_connections():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False, max_connections=2)
+        results = await asyncio.gather(*(
+            t.users.show(screen_name="user%i" % i) for i in range(6)))
+        await t.close()
+        return results
+
+    with start_api_server() as domain:
+        results = asyncio.run(main(domain))
+    assert [r["path"] for r in results] == [
+        "/1.1/users/show.json?screen_name=user%i" % i for i in range(6)]
+    # at most two connections for six calls
+    assert len(set(r["port"] for r in results)) <= 2
+    assert results[0].headers.get("Content-Type") == "application/json"
+
+
+def test_async_http_error():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False)
+        try:
+            await t.statuses.missing()
+        finally:
+            await t.close()
+
+    with start_api_server() as domain:
+        try:
+            asyncio.run(main(domain))
+        except TwitterHTTPError as e:
+            assert e.e.code == 404
+            assert e.response_data == {"errors": "nope"}
+        else:
+            assert False, "TwitterHTTPError not raised"
+
+
+def test_async_stream():
+    async def main(domain):
+        stream = AsyncTwitterStream(domain=domain, secure=False)
+        return [msg async for msg in await stream.statuses.stream()]
+
+    with start_api_server() as domain:
+        messages = asyncio.run(main(domain))
+    assert messages == [{"n": 0}, {"n": 1}, {"n": 2}, {"hangup": True}]
+
+
+def test_async_keep_alive():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False)
+        results = [await t.users.show(screen_name="user%i" % i)
+                   for i in range(3)]
+        await t.close()
+        return results
+
+    with start_api_server() as domain:
+        results = asyncio.run(main(domain))
+    assert len(set(r["port"] for r in results)) == 1
+    assert [r["count"] for r in results] == [0, 1, 2]
+
+
+def test_async_chunked_body():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False, raw=True)
+        body = await t.stream.sample()
+        # the connection is reusable after the last chunk
+        await t.users.show(screen_name="a")
+        await t.close()
+        return body
+
+    with start_api_server() as domain:
+        body = asyncio.run(main(domain))
+    assert [line for line in body.split(b"\r\n") if line] == [
+        b'{"n": 0}', b'{"n": 1}', b'{"n": 2}']
+
+
+def test_async_cancelled_call_closes_connection(monkeypatch):
+    conns = []
+    connect = AsyncConnectionPool._connect
+
+    async def _connect(self, *args):
+        conn = await connect(self, *args)
+        conns.append(conn)
+        return conn
+    monkeypatch.setattr(AsyncConnectionPool, "_connect", _connect)
+
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False)
+        try:
+            await asyncio.wait_for(t.slow(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            assert False, "TimeoutError not raised"
+        assert conns[0].writer.is_closing()
+        assert not any(t.transport._idle.values())
+        # the next call gets a new connection
+        assert (await t.users.show())["path"]
+        await t.close()
+
+    with start_api_server() as domain:
+        asyncio.run(main(domain))
+    assert len(conns) == 2
+
+
+def test_async_timeout():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False)
+        try:
+            # without a deadline, a timeout is a network error as usual
+            with pytest.raises(urllib_error.URLError) as info:
+                await t.slow(_timeout=0.1)
+            assert isinstance(info.value.reason, socket.timeout)
+            with pytest.raises(TwitterTimeoutError):
+                await t.slow(_deadline=0.1)
+        finally:
+            await t.close()
+
+    with start_api_server() as domain:
+        asyncio.run(main(domain))
+
+
+def test_async_post_not_resent():
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False)
+        try:
+            assert await t.statuses.home_timeline() == {}
+            await t.statuses.update(status="hi")
+        finally:
+            await t.close()
+
+    # reset, or closed before the status line
+    for drop in ({"reset": (2,)}, {"close": (2,)}):
+        with start_resetting_server(**drop) as (domain, received):
+            try:
+                asyncio.run(main(domain))
+            except urllib_error.URLError:
+                pass
+            else:
+                assert False, "URLError not raised"
+        assert received == ["GET", "POST"]
+
+
+def test_async_hooks():
+    traces = []
+
+    async def main(domain):
+        t = AsyncTwitter(domain=domain, secure=False, hooks=traces.append)
+        await t.users.show(screen_name="a")
+        try:
+            await t.missing()
+        except TwitterHTTPError:
+            pass
+        await t.close()
+
+    with start_api_server() as domain:
+        asyncio.run(main(domain))
+    assert [(tr.endpoint, tr.status) for tr in traces] == [
+        ("users/show", 200), ("missing", 404)]
+    assert traces[0].bytes_in > 0 and traces[0].total > 0
+    assert isinstance(traces[1].error, TwitterHTTPError)
@@ -0,0 +1,13 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from twitter.archiver import load_tweets, save_tweets
+
+
+def test_save_and_load_tweets(tmpdir):
+    path = str(tmpdir.join("archive.txt"))
+    assert load_tweets(path) == {}
+    tweets = {12: "2018-10-10 20:19:24 UTC <someone> café \U0001F600",
+              3: "2018-10-09 08:00:00 UTC <other> RT @someone: hi"}
+    save_tweets(path, tweets)
+    assert load_tweets(path) == tweets
@@ -0,0 +1,90 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import time
+
+from twitter import Twitter, TwitterHTTPError
+from twitter.transport import MemoryTransport, json_response
+
+from .test_connection import start_api_server
+
+
+def test_batch_results_in_order():
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False)
+        batch = t.batch(max_concurrency=4)
+        for i in range(20):
+            if i == 7:
+                batch.statuses.missing(_id=i)
+            else:
+                assert batch.users.show(screen_name="user%i" % i) == i
+        batch.trends._("1")()
+        assert len(batch) == 21
+        results = batch.execute()
+    assert len(batch) == 0
+    assert len(results) == 21
+    for i, res in enumerate(results[:20]):
+        if i == 7:
+            assert not res.ok
+            assert isinstance(res.error, TwitterHTTPError)
+            assert res.error.e.code == 404
+        else:
+            assert res.ok
+            assert res.response["path"] == \
+                "/1.1/users/show.json?screen_name=user%i" % i
+    assert results[20].response["path"].startswith("/1.1/trends/1.json")
+    # the batch reused a few connections rather than one per call
+    assert len(set(res.response["port"] for res in results if res.ok)) <= 4
+
+
+def rate_limited_transport(limited, reset_in=None):
+    """A MemoryTransport answering users/show with a 429 while
+    limited(n), n being the number of the request, with a reset time
+    `reset_in` seconds later if given, and recording the times of the
+    requests."""
+    times = []
+
+    def respond(req):
+        times.append(time.time())
+        if limited(len(times)):
+            headers = {}
+            if reset_in is not None:
+                headers["X-Rate-Limit-Reset"] = str(int(time.time() + reset_in))
+            return json_response({"errors": [{"code": 88}]}, 429, headers)
+        return {"n": len(times)}
+    transport = MemoryTransport()
+    transport.add("GET", "/1.1/users/show.json", respond)
+    return transport, times
+
+
+def test_batch_waits_together_on_rate_limit():
+    transport, times = rate_limited_transport(lambda n: n == 1)
+    batch = Twitter(transport=transport).batch(max_concurrency=4)
+    for i in range(8):
+        batch.users.show(screen_name="user%i" % i)
+    results = batch.execute()
+    assert all(res.ok for res in results)
+    assert len(times) == 9
+    # no call started while the workers were holding for the limit
+    hold_until = batch._hold_until
+    assert hold_until - times[0] >= 1
+    assert not [t for t in times[1:]
+                if times[0] + 0.1 < t < hold_until - 0.01]
+
+
+def test_batch_rate_limit_retries_capped():
+    # no reset time: the call waits a second before its only retry
+    transport, times = rate_limited_transport(lambda n: True)
+    batch = Twitter(transport=transport).batch(max_retries=1)
+    batch.users.show(screen_name="a")
+    res, = batch.execute()
+    assert res.error.e.code == 429
+    assert len(times) == 2
+
+    # reset an hour away: longer than max_wait, the error is returned
+    transport, times = rate_limited_transport(lambda n: True, 3600)
+    batch = Twitter(transport=transport).batch(max_wait=60)
+    batch.users.show(screen_name="a")
+    res, = batch.execute()
+    assert res.error.e.code == 429
+    assert len(times) == 1
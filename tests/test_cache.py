@@ -0,0 +1,75 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import json
+import pickle
+
+from twitter import Twitter, OAuth
+from twitter.api import TwitterDictResponse
+from twitter.cache import (
+    CachedResponse, FileCache, MemoryCache, ResponseCache)
+
+from .test_connection import start_api_server
+
+
+def test_cached_calls():
+    auth = OAuth("token", "token_secret", "consumer_key", "consumer_secret")
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, auth=auth, cache=True)
+        first = t.users.show(screen_name="a")
+        # the OAuth nonce and signature change, the cache key doesn't
+        second = t.users.show(screen_name="a")
+        assert second == first
+        assert isinstance(second, TwitterDictResponse)
+        assert second.headers.get("Content-Type") == "application/json"
+        # other parameters, other users and other endpoints aren't cached
+        assert t.users.show(screen_name="b")["count"] != first["count"]
+        other = Twitter(
+            domain=domain, secure=False, cache=t.cache,
+            auth=OAuth("other", "secret", "consumer_key", "consumer_secret"))
+        assert other.users.show(screen_name="a")["count"] != first["count"]
+        timeline = t.statuses.user_timeline()
+        assert t.statuses.user_timeline()["count"] != timeline["count"]
+
+
+def test_cache_ttls():
+    cache = ResponseCache(ttl=60, ttls={"users/show": 0})
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, cache=cache)
+        first = t.users.show(screen_name="a")
+        assert t.users.show(screen_name="a")["count"] != first["count"]
+        first = t.statuses.user_timeline()
+        assert t.statuses.user_timeline() == first
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(maxsize=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    cache.set("d", 4, -1)
+    assert cache.get("d") is None
+
+
+def test_file_cache(tmpdir):
+    cache = FileCache(str(tmpdir), maxsize=10)
+    for i in range(11):
+        cache.set("key%i" % i, CachedResponse(
+            b"\x1f\x8b%i" % i, [("Content-Type", "application/json")]), 60)
+    assert len(tmpdir.listdir()) == 9
+    for cached in (cache.get("key10"), FileCache(str(tmpdir)).get("key10")):
+        assert cached.body == b"\x1f\x8b10"
+        assert cached.headers["Content-Type"] == "application/json"
+    cache.set("expired", CachedResponse(b"", []), -1)
+    assert cache.get("expired") is None
+    # the entries are plain JSON, anything else is ignored
+    path = cache._path("key10")
+    with open(path) as f:
+        assert json.load(f)["key"] == "key10"
+    with open(path, "wb") as f:
+        f.write(pickle.dumps(CachedResponse(b"", [])))
+    assert cache.get("key10") is None
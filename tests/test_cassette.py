@@ -0,0 +1,77 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import time
+
+from twitter import Twitter, TwitterHTTPError, TwitterStream
+from twitter.cassette import Cassette, CassetteError
+from twitter.transport import make_headers
+
+from .test_connection import start_api_server
+
+
+def test_record_and_replay(tmpdir):
+    cassette = Cassette()
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, transport=cassette.recorder())
+        t.gzip = True
+        timeline = t.statuses.home_timeline(count=2)
+        posted = t.statuses.update(status="hi")
+        try:
+            t.users.missing()
+        except TwitterHTTPError as e:
+            assert e.e.code == 404
+        stream = TwitterStream(domain=domain, secure=False,
+                               transport=cassette.recorder())
+        messages = list(stream.stream.sample())
+    assert [m.get("n") for m in messages] == [0, 1, 2, None]
+    # the body was recorded gzipped, as it came
+    # Python 2 records the names lowercased
+    headers = make_headers(cassette.interactions[0]["headers"])
+    assert headers["Content-Encoding"] == "gzip"
+
+    path = str(tmpdir.join("calls.cassette.gz"))
+    cassette.save(path)
+    cassette = Cassette.load(path)
+    t = Twitter(domain=domain, secure=False, transport=cassette.player())
+    assert t.statuses.home_timeline(count=2) == timeline
+    assert t.statuses.update(status="hi") == posted
+    try:
+        t.users.missing()
+    except TwitterHTTPError as e:
+        assert e.e.code == 404
+        assert e.response_data == {"errors": "nope"}
+    else:
+        assert False, "TwitterHTTPError not raised"
+    stream = TwitterStream(domain=domain, secure=False,
+                           transport=cassette.player())
+    assert list(stream.stream.sample()) == messages
+
+    # each recorded response is used once, unless repeated
+    for call in (lambda: t.statuses.home_timeline(count=2),
+                 lambda: t.statuses.home_timeline(count=3)):
+        try:
+            call()
+        except CassetteError:
+            pass
+        else:
+            assert False, "CassetteError not raised"
+    t = Twitter(domain=domain, secure=False,
+                transport=cassette.player(repeat=True))
+    assert t.statuses.home_timeline(count=2) == timeline
+    assert t.statuses.home_timeline(count=2) == timeline
+
+
+def test_paced_replay():
+    cassette = Cassette([{
+        "method": "GET", "url": "https://api.twitter.com/1.1/burst.json",
+        "body": None, "status": 200, "ttfb": 0.1, "headers": [],
+        "chunks": [[0.0, b"[1,"], [0.2, b"2]"]]}])
+    t = Twitter(transport=cassette.player(repeat=True))
+    start = time.time()
+    assert t.burst() == [1, 2]
+    assert time.time() - start < 0.1
+    t = Twitter(transport=cassette.player(speed=1.0))
+    start = time.time()
+    assert t.burst() == [1, 2]
+    assert time.time() - start >= 0.3
@@ -0,0 +1,464 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import contextlib
+import gzip
+import io
+import itertools
+import json
+import pickle
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import pytest
+
+from twitter import (
+    Twitter, TwitterHTTPError, TwitterRawResponse, TwitterStream,
+    TwitterTimeoutError)
+from twitter.api import read_body, read_raw_body
+from twitter.connection import (
+    ConnectionPool, PooledResponse, ssl_context, tls_session_stats,
+    tls_sessions)
+from twitter.transport import MemoryResponse
+
+try:
+    import http.client as http_client
+except ImportError:
+    import httplib as http_client
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+try:
+    import http.server as BaseHTTPServer
+    import socketserver as SocketServer
+except ImportError:
+    import BaseHTTPServer
+    import SocketServer
+
+
+@contextlib.contextmanager
+def start_api_server(close_connection=False, context=None):
+    """Local keep-alive HTTP/1.1 server, over TLS with the server SSL
+    `context` if there is one, answering every GET with the
+    client port the request came from and the number of requests served
+    before, as JSON. Paths containing "/stream" get a short chunked
+    stream of JSON messages, the others a gzipped body when the client
+    accepts it; "/slow" ones take half a second to answer, "/trickle"
+    ones send their body ten bytes at a time over a second. POST
+    requests get their body back."""
+
+    counter = itertools.count()
+
+    class MyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if "/stream" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(3):
+                    chunk = json.dumps({"n": i}).encode("utf-8") + b"\r\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            if "/trickle" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", "200")
+                self.end_headers()
+                for i in range(20):
+                    self.wfile.write(b"x" * 10)
+                    self.wfile.flush()
+                    time.sleep(0.05)
+                return
+            if "/slow" in self.path:
+                time.sleep(0.5)
+            if "/missing" in self.path:
+                code, body = 404, b'{"errors": "nope"}'
+            else:
+                code = 200
+                body = json.dumps({
+                    "path": self.path,
+                    "port": self.client_address[1],
+                    "count": next(counter),
+                }).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                buf = io.BytesIO()
+                with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+                    f.write(body)
+                body = buf.getvalue()
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            if close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            data = json.dumps({
+                "path": self.path,
+                "content_type": self.headers["Content-Type"],
+                "body": body.decode("latin-1"),
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+        daemon_threads = True
+
+    httpd = Server(("127.0.0.1", 0), MyHandler)
+    if context is not None:
+        httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+    t = threading.Thread(target=httpd.serve_forever)
+    t.daemon = True
+    t.start()
+    yield "127.0.0.1:%i" % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_keep_alive_reuses_connection():
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        first = t.statuses.user_timeline(screen_name="a")
+        second = t.users.show(screen_name="b")
+        assert first["path"] == "/1.1/statuses/user_timeline.json?screen_name=a"
+        assert first["port"] == second["port"]
+        assert second.headers.get("Content-Type") == "application/json"
+
+
+def test_keep_alive_resets_timeout():
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        t.statuses.user_timeline(_timeout=5)
+        t.statuses.user_timeline()
+        (conn, _), = list(t.transport._idle.values())[0]
+        assert conn.sock.gettimeout() is None
+
+
+def test_keep_alive_reopens_closed_connection():
+    with start_api_server(close_connection=True) as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        first = t.statuses.user_timeline()
+        second = t.statuses.user_timeline()
+        assert first["port"] != second["port"]
+
+
+@contextlib.contextmanager
+def start_resetting_server(reset=(), close=()):
+    """Keep-alive server answering "{}", except to the requests whose
+    number is in `reset` or `close`: it reads them, then resets or
+    closes the connection without a status line. Yields its address
+    and the list of the requests received."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(5)
+    received = []
+
+    def serve(conn):
+        f = conn.makefile("rb")
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            length = 0
+            while True:
+                header = f.readline()
+                if header in (b"\r\n", b""):
+                    break
+                name, _, value = header.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+            f.read(length)
+            received.append(line.split()[0].decode("ascii"))
+            if len(received) in reset:
+                conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                                struct.pack("ii", 1, 0))
+                break
+            if len(received) in close:
+                break
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: application/json"
+                         b"\r\nContent-Length: 2\r\n\r\n{}")
+        conn.close()
+
+    def accept():
+        while True:
+            try:
+                conn = listener.accept()[0]
+            except socket.error:
+                return
+            thread = threading.Thread(target=serve, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    thread = threading.Thread(target=accept)
+    thread.daemon = True
+    thread.start()
+    yield "127.0.0.1:%i" % listener.getsockname()[1], received
+    listener.close()
+
+
+def test_keep_alive_retries_only_idempotent_calls():
+    with start_resetting_server(reset=(2, 4)) as (domain, received):
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        assert t.statuses.home_timeline() == {}
+        # a POST whose response is lost may have been processed
+        try:
+            t.statuses.update(status="hi")
+        except urllib_error.URLError:
+            pass
+        else:
+            assert False, "URLError not raised"
+        assert received == ["GET", "POST"]
+        # a GET is sent again on a new connection
+        assert t.statuses.home_timeline() == {}
+        assert t.statuses.home_timeline() == {}
+        assert received == ["GET", "POST", "GET", "GET", "GET"]
+    # nor when the connection is closed before the status line
+    with start_resetting_server(close=(2,)) as (domain, received):
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        assert t.statuses.home_timeline() == {}
+        try:
+            t.statuses.update(status="hi")
+        except urllib_error.URLError:
+            pass
+        else:
+            assert False, "URLError not raised"
+        assert received == ["GET", "POST"]
+
+
+def test_keep_alive_http_error():
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=True)
+        try:
+            t.missing()
+        except TwitterHTTPError as e:
+            assert e.e.code == 404
+            assert e.response_data == {"errors": "nope"}
+        else:
+            assert False, "TwitterHTTPError not raised"
+        # the connection is still usable after an error
+        assert t.statuses.user_timeline()["path"]
+
+
+def test_gzip_response():
+    with start_api_server() as domain:
+        for keep_alive in (False, True):
+            t = Twitter(domain=domain, secure=False, keep_alive=keep_alive)
+            t.gzip = True
+            res = t.statuses.user_timeline(screen_name="a")
+            assert res.headers.get("Content-Encoding") == "gzip"
+            assert res["path"].startswith("/1.1/statuses/user_timeline.json")
+            try:
+                t.missing()
+            except TwitterHTTPError as e:
+                assert e.response_data == {"errors": "nope"}
+            else:
+                assert False, "TwitterHTTPError not raised"
+
+
+def test_read_body_truncated_gzip():
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(b'{"text": "%s"}' % (b"x" * 1000))
+    data = buf.getvalue()
+    headers = {"Content-Encoding": "gzip"}
+    assert read_body(MemoryResponse(200, headers, [data[:10], data[10:]])) \
+        == b'{"text": "%s"}' % (b"x" * 1000)
+    if hasattr(zlib.decompressobj(), "eof"):
+        with pytest.raises(http_client.IncompleteRead):
+            read_body(MemoryResponse(200, headers, data[:-10]))
+
+
+def test_read_raw_body_deadline():
+    chunks = [b"a" * 10, b"b" * 10]
+    assert read_raw_body(MemoryResponse(200, {}, chunks)) == b"".join(chunks)
+    assert read_raw_body(MemoryResponse(200, {}, chunks),
+                         time.time() + 60) == b"".join(chunks)
+    # the deadline is checked between the reads of a body sent slowly
+    with pytest.raises(socket.timeout):
+        read_raw_body(MemoryResponse(200, {}, chunks), time.time() - 1)
+
+
+def test_pooled_response_read1_fallback():
+    # responses without read1(), as on Python 2
+    class Response(object):
+        status, reason, msg = 200, "OK", {}
+
+        def __init__(self):
+            self.body = io.BytesIO(b"0123456789")
+
+        def read(self, amt=None):
+            return self.body.read(amt)
+
+    released = []
+
+    class Pool(object):
+        def _put(self, key, conn, response):
+            released.append(conn)
+
+    res = PooledResponse(Pool(), "key", "conn", Response(), "url")
+    assert res.read1(4) == b"0123"
+    assert res.read1() == b"456789"
+    assert released == ["conn"]
+
+
+def test_raw_response():
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, raw=True)
+        res = t.statuses.user_timeline(screen_name="a")
+        assert isinstance(res, TwitterRawResponse)
+        assert json.loads(res.decode("utf-8"))["count"] >= 0
+        assert res.headers.get("Content-Type") == "application/json"
+        t.gzip = True
+        res = t.statuses.user_timeline()
+        assert res.headers.get("Content-Encoding") == "gzip"
+        assert "path" in json.loads(gzip.GzipFile(fileobj=io.BytesIO(res)).read().decode("utf-8"))
+        # per call switch
+        assert isinstance(t.statuses.user_timeline(_raw=False), dict)
+        t = Twitter(domain=domain, secure=False)
+        assert isinstance(t.statuses.user_timeline(_raw=True), TwitterRawResponse)
+
+
+def test_request_hooks():
+    traces = []
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=True,
+                    hooks=traces.append)
+        t.gzip = True
+        t.statuses.user_timeline(screen_name="a")
+        t.statuses.user_timeline(screen_name="a")
+        try:
+            t.missing()
+        except TwitterHTTPError:
+            pass
+        t = Twitter(domain=domain, secure=False, hooks=[traces.append])
+        t.users.show(screen_name="a")
+
+    first, second, error, unpooled = traces
+    assert first.endpoint == "statuses/user_timeline"
+    assert first.method == "GET"
+    assert first.status == 200
+    assert first.reused is False
+    assert first.dns >= 0 and first.connect >= 0 and first.tls is None
+    for phase in ("ttfb", "body", "decompress", "decode"):
+        assert getattr(first, phase) >= 0
+    assert first.bytes_in > 0 and first.total >= first.ttfb
+    assert first.retries == 0 and first.error is None
+    assert second.reused is True and second.dns is None
+    assert error.status == 404
+    assert isinstance(error.error, TwitterHTTPError)
+    assert error.as_dict()["endpoint"] == "missing"
+    assert unpooled.dns is None and unpooled.ttfb >= 0
+    assert unpooled.decompress is None and unpooled.bytes_in > 0
+
+
+def test_stream_hooks():
+    traces = []
+    with start_api_server() as domain:
+        stream = TwitterStream(domain=domain, secure=False,
+                               hooks=traces.append)
+        # the trace is made once the headers are in
+        stream.statuses.sample()
+    trace, = traces
+    assert trace.endpoint == "statuses/sample"
+    assert trace.status == 200 and trace.ttfb >= 0
+
+
+def test_deadline():
+    with start_api_server() as domain:
+        for keep_alive in (False, True):
+            t = Twitter(domain=domain, secure=False, keep_alive=keep_alive,
+                        deadline=0.2)
+            start = time.time()
+            try:
+                t.slow()
+            except TwitterTimeoutError as e:
+                assert e.uri == "1.1/slow"
+            else:
+                assert False, "TwitterTimeoutError not raised"
+            assert time.time() - start < 0.45
+            assert t.slow(_deadline=5)["path"].startswith("/1.1/slow.json")
+
+
+def test_deadline_while_reading():
+    if not hasattr(http_client.HTTPResponse, "read1"):
+        pytest.skip("no read1() before Python 3.5")
+    with start_api_server() as domain:
+        for keep_alive in (False, True):
+            t = Twitter(domain=domain, secure=False, keep_alive=keep_alive,
+                        deadline=0.3)
+            start = time.time()
+            try:
+                t.trickle()
+            except TwitterTimeoutError:
+                pass
+            else:
+                assert False, "TwitterTimeoutError not raised"
+            # not after the whole body came
+            assert time.time() - start < 0.8
+
+
+def test_pool_idle_timeout():
+    pool = ConnectionPool(maxsize=1, idle_timeout=0)
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, keep_alive=pool)
+        first = t.statuses.user_timeline()
+        second = t.statuses.user_timeline()
+        assert first["port"] != second["port"]
+
+
+def test_pool_picklability():
+    t = Twitter(keep_alive=True)
+    t2 = pickle.loads(pickle.dumps(t))
+    assert isinstance(t2.transport, ConnectionPool)
+    assert t2.transport.maxsize == t.transport.maxsize
+
+
+def test_ssl_context_cached():
+    assert ssl_context() is ssl_context(True)
+    assert ssl_context(False) is ssl_context(False)
+    assert ssl_context(False) is not ssl_context(True)
+    assert ssl_context(False).verify_mode == ssl.CERT_NONE
+
+
+def test_tls_session_resumed(tmpdir):
+    if not hasattr(ssl.SSLSocket, "session"):
+        pytest.skip("TLS sessions can't be resumed before Python 3.6")
+    cert, key = str(tmpdir.join("cert.pem")), str(tmpdir.join("key.pem"))
+    try:
+        subprocess.check_call(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+             "-days", "1", "-subj", "/CN=127.0.0.1", "-keyout", key,
+             "-out", cert], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("openssl can't make a certificate")
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    tls_sessions.clear()
+    # each response closes its connection: the second call needs a new one
+    with start_api_server(close_connection=True, context=context) as domain:
+        t = Twitter(domain=domain, keep_alive=True, verify_context=False)
+        first = t.statuses.user_timeline()
+        second = t.statuses.user_timeline()
+    assert first["port"] != second["port"]
+    assert tls_session_stats() == {"handshakes": 1, "resumed": 1}
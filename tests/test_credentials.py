@@ -0,0 +1,106 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import time
+
+try:
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urlparse as urllib_parse
+
+from twitter import OAuth, Twitter
+from twitter.credentials import CredentialPool
+from twitter.transport import MemoryTransport, json_response
+
+
+def rate_limit_headers(remaining, reset):
+    return {"X-Rate-Limit-Limit": "900", "X-Rate-Limit-Remaining":
+            str(remaining), "X-Rate-Limit-Reset": str(int(reset))}
+
+
+def test_calls_spread_by_headroom():
+    reset = time.time() + 900
+    remaining = {"a": 5, "b": 50, "c": 0}
+    used = []
+
+    def respond(req):
+        query = urllib_parse.urlsplit(req.get_full_url()).query
+        token = dict(urllib_parse.parse_qsl(query))["oauth_token"]
+        used.append(token)
+        return json_response({"token": token}, headers=rate_limit_headers(
+            remaining[token], reset))
+
+    transport = MemoryTransport()
+    transport.add("GET", "/1.1/users/show.json", respond)
+    transport.add("GET", "/1.1/followers/ids.json", respond)
+    pool = CredentialPool([OAuth(token, "secret", "key", "secret")
+                           for token in "abc"])
+    t = Twitter(auth=pool, transport=transport)
+
+    # unknown quotas first, then the one with the most calls left; the
+    # exhausted one isn't used again
+    for _ in range(6):
+        t.users.show(screen_name="jack")
+    assert used == ["a", "b", "c", "b", "b", "b"]
+    # the server's figure doesn't count the calls booked since
+    limit, left, _ = pool.schedulers[1].status("users/show")
+    assert (limit, left) == (900, 47)
+
+    # each endpoint family has its own quotas
+    del used[:]
+    t.followers.ids(screen_name="jack")
+    assert used == ["a"]
+    assert [status[2] for status in pool.status("users/show")] == [5, 47, 0]
+
+
+def test_all_exhausted():
+    pool = CredentialPool(["a", "b", "c"])
+    now = int(time.time())
+    for scheduler, reset in zip(pool.schedulers, (300, 100, 200)):
+        scheduler.update("users/show", rate_limit_headers(0, now + reset))
+    # the first to reset, for all the calls booked into its next window
+    for _ in range(4):
+        credential, booking = pool.choose("users/show", now)
+        assert credential == "b"
+        assert 100 < booking.reserve("users/show", now) < 102
+    assert pool.headroom(1, "users/show", now) == (896, 101)
+    # after their reset, they have their full quota again
+    assert pool.headroom(2, "users/show", now + 250) == (900, 0)
+
+
+def test_all_exhausted_calls_wait(monkeypatch):
+    waits = []
+    monkeypatch.setattr("twitter.credentials.sleep", waits.append)
+    resets = {"a": time.time() + 100, "b": time.time() + 200}
+    used = []
+
+    def respond(req):
+        query = urllib_parse.urlsplit(req.get_full_url()).query
+        token = dict(urllib_parse.parse_qsl(query))["oauth_token"]
+        used.append(token)
+        return json_response({}, headers=rate_limit_headers(0, resets[token]))
+
+    transport = MemoryTransport()
+    transport.add("GET", "/1.1/users/show.json", respond)
+    pool = CredentialPool([OAuth(token, "secret", "key", "secret")
+                           for token in "ab"])
+    t = Twitter(auth=pool, transport=transport)
+    for _ in range(5):
+        t.users.show(screen_name="jack")
+    # none of the calls after the quotas ran out is sent before a reset
+    assert used == ["a", "b", "a", "a", "a"]
+    assert len(waits) == 3 and all(99 < wait < 102 for wait in waits)
+
+
+def test_choose_books_the_call():
+    pool = CredentialPool(["a", "b"])
+    reset = time.time() + 900
+    pool.schedulers[0].update("users/show", rate_limit_headers(5, reset))
+    pool.schedulers[1].update("users/show", rate_limit_headers(4, reset))
+    # calls chosen at the same time don't all go to the best credential
+    first, booking = pool.choose("users/show")
+    second, _ = pool.choose("users/show")
+    assert (first, second) == ("a", "b")
+    # nor is a call not sent counted
+    booking.release()
+    assert pool.headroom(0, "users/show")[0] == 5
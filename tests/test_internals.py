@@ -1,7 +1,12 @@
 # encoding: utf-8
 from __future__ import unicode_literals
 
-from twitter.api import method_for_uri, build_uri
+import copy
+import pickle
+
+from twitter import Twitter
+from twitter.api import (
+    method_for_uri, build_uri, endpoint_template, route_for)
 from twitter.util import PY_3_OR_HIGHER, actually_bytes
 
 def test_method_for_uri__lookup():
@@ -22,6 +27,56 @@ def test_build_uri():
     uri = build_uri(["1.1", "foo", "bar"], {"foo": "asdf"})
     assert uri == "1.1/foo/bar"
 
+def test_endpoint_template():
+    assert endpoint_template(("1.1", "statuses", "user_timeline")) == \
+        "statuses/user_timeline"
+    assert endpoint_template(("2", "tweets", "_id")) == "tweets/_id"
+    assert endpoint_template(("oauth", "request_token")) == \
+        "oauth/request_token"
+
+def test_route_for():
+    route = route_for(True, 'api.twitter.com', 'json', ('1.1', 'statuses', 'destroy'))
+    assert route is route_for(True, 'api.twitter.com', 'json', ('1.1', 'statuses', 'destroy'))
+    assert route.prefix + route.path + route.suffix == \
+        'https://api.twitter.com/1.1/statuses/destroy.json'
+    kwargs = {'id': 123, 'trim_user': 1}
+    assert route.resolve(kwargs) == ('1.1/statuses/destroy/123', 'POST', False)
+    assert kwargs == {'trim_user': 1}
+    assert route.resolve({'id': 'abc'}) == ('1.1/statuses/destroy/abc', 'GET', False)
+
+    route = route_for(False, 'localhost', '', ('1.1', 'lists', '_slug', 'create'))
+    assert route.suffix == ''
+    kwargs = {'_slug': 'friends', 'name': 'x'}
+    assert route.resolve(kwargs) == ('1.1/lists/friends/create', 'POST', False)
+    assert kwargs == {'name': 'x'}
+
+    route = route_for(True, 'upload.twitter.com', 'json', ('1.1', 'media', 'metadata', 'create'))
+    assert route.resolve({}) == ('1.1/media/metadata/create', 'POST', True)
+
+
+def test_call_chain_memoized():
+    t = Twitter()
+    timeline = t.statuses.user_timeline
+    assert t.statuses.user_timeline is timeline
+    assert timeline.uriparts == ('1.1', 'statuses', 'user_timeline')
+    assert t.statuses._("x") is not t.statuses._("x")
+    assert t.statuses._("x").uriparts == ('1.1', 'statuses', 'x')
+    # children built afterwards follow the parent settings
+    t.gzip = True
+    assert t.statuses.user_timeline is not timeline
+    assert t.statuses.user_timeline.gzip
+    # children aren't pickled nor copied
+    statuses = t.statuses
+    t2 = copy.copy(t)
+    t2.raw = True
+    assert t2.statuses.raw and not t.statuses.raw
+    # nor forgotten by the original when the copy forgets its own
+    assert t.statuses is statuses
+    t3 = pickle.loads(pickle.dumps(t))
+    assert 'statuses' not in t3.__dict__
+    assert t3.statuses.user_timeline.uriparts == timeline.uriparts
+
+
 def test_actually_bytes():
     out_type = str
     if PY_3_OR_HIGHER:
@@ -0,0 +1,93 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import pickle
+import warnings
+
+import pytest
+
+from twitter import Twitter
+from twitter.json_backend import AUTO_ORDER, JSONBackend, get_backend
+from twitter.stream import JsonDecoder
+
+from .test_connection import start_api_server
+
+BACKENDS = []
+for name in ('json', 'orjson', 'ujson', 'msgspec'):
+    try:
+        BACKENDS.append(get_backend(name))
+    except ImportError:
+        pass
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda b: b.name)
+def test_backend_loads(backend):
+    data = '{"id": 1234567890123456789, "text": "café", "a": [1.5, null]}'
+    expected = {"id": 1234567890123456789, "text": "café", "a": [1.5, None]}
+    assert backend.loads(data) == expected
+    assert backend.loads(bytearray(data.encode('utf8'))) == expected
+    with pytest.raises(ValueError):
+        backend.loads('{"id": ')
+
+
+def test_backend_selection(monkeypatch):
+    assert get_backend('json') is get_backend('json')
+    monkeypatch.setenv('TWITTER_JSON_BACKEND', 'json')
+    assert get_backend().name == 'json'
+    monkeypatch.setenv('TWITTER_JSON_BACKEND', 'not-installed')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        assert get_backend().name == 'json'
+    assert 'TWITTER_JSON_BACKEND=not-installed' in str(caught[0].message)
+    monkeypatch.delenv('TWITTER_JSON_BACKEND')
+    installed = [backend.name for backend in BACKENDS]
+    assert get_backend().name == [
+        name for name in AUTO_ORDER if name in installed][0]
+    with pytest.raises(ValueError):
+        get_backend('yaml')
+    t = Twitter(json_backend='json')
+    assert t.statuses.json_backend is get_backend('json')
+    assert pickle.loads(pickle.dumps(t)).json_backend is get_backend('json')
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda b: b.name)
+def test_stream_decoder(backend):
+    decoder = JsonDecoder(backend)
+    assert decoder.decode('{"n": 1}\r\n{"n"') == [{"n": 1}]
+    assert decoder.decode(': 2}') == [{"n": 2}]
+    assert decoder.decode('\r\n\r\n{"n": 3}{"n": 4}\r\n{"n": 5') == [
+        {"n": 3}, {"n": 4}]
+    assert decoder.decode('}\r\n') == [{"n": 5}]
+
+
+@pytest.mark.parametrize('name', ['json', 'counting'])
+def test_stream_decoder_large_message(name):
+    # the partial message isn't parsed again for each piece of it
+    calls = []
+
+    def counting(decode):
+        def run(data):
+            calls.append(len(data))
+            return decode(data)
+        return run
+    if name == 'json':
+        decoder = JsonDecoder(get_backend('json'))
+        decoder.raw_decode = counting(decoder.raw_decode)
+    else:
+        decoder = JsonDecoder(JSONBackend(name, counting(
+            get_backend('json').loads)))
+    message = '{"a": [%s]}\r\n' % ', '.join(['"%s"' % ('x' * 50)] * 2000)
+    messages = []
+    for i in range(0, len(message), 100):
+        messages.extend(decoder.decode(message[i:i + 100]))
+    assert messages == [{"a": ["x" * 50] * 2000}]
+    assert len(calls) <= 3
+
+
+@pytest.mark.parametrize('backend', BACKENDS, ids=lambda b: b.name)
+def test_api_responses(backend):
+    with start_api_server() as domain:
+        t = Twitter(domain=domain, secure=False, json_backend=backend)
+        res = t.statuses.user_timeline(screen_name="a")
+        assert res["path"] == "/1.1/statuses/user_timeline.json?screen_name=a"
+        assert res.headers.get("Content-Type") == "application/json"
@@ -0,0 +1,114 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import threading
+
+import pytest
+
+from twitter import Twitter
+from twitter.api import TwitterCall
+
+from .test_retry import http_error
+
+USERS = dict((str(i), {"id": i, "id_str": str(i), "screen_name": "User%i" % i})
+             for i in range(1, 300))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake_call(self, **kwargs):
+        calls.append((self.uriparts[1:], kwargs))
+        if "fail" in kwargs.get("id", ""):
+            raise http_error(500)
+        if self.uriparts[1:] == ("statuses", "lookup"):
+            return [{"id": int(i), "id_str": i, "text": "tweet %s" % i}
+                    for i in kwargs["id"].split(",") if i in USERS]
+        if "user_id" in kwargs:
+            ids = kwargs["user_id"].split(",")
+        else:
+            ids = [n[len("user"):] for n in kwargs["screen_name"].split(",")]
+        found = [USERS[i] for i in ids if i in USERS]
+        if not found:
+            raise http_error(404)
+        return found
+
+    monkeypatch.setattr(TwitterCall, "__call__", fake_call)
+    return calls
+
+
+def test_lookup_batcher_window(calls):
+    lookups = Twitter().lookup_batcher(window=0.5, include_entities="false")
+    futures = []
+
+    def ask(i):
+        futures.append((i, lookups.get_user(i)))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(1, 11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    missing = lookups.get_user(1000)
+    by_name = lookups.get_user_by_name("USER3")
+    status = lookups.get_status(5)
+    for i, future in futures:
+        assert future.result(timeout=5)["id"] == i
+    assert missing.result(timeout=5) is None
+    assert by_name.result(timeout=5)["id"] == 3
+    assert status.result(timeout=5)["text"] == "tweet 5"
+    lookups.close()
+    users_calls = [kw for parts, kw in calls if "user_id" in kw]
+    assert len(users_calls) == 1
+    assert sorted(users_calls[0]["user_id"].split(","), key=int) == \
+        [str(i) for i in range(1, 11)] + ["1000"]
+    assert users_calls[0]["include_entities"] == "false"
+    assert len(calls) == 3
+
+
+def test_lookup_batcher_full_batch(calls):
+    with Twitter().lookup_batcher(window=60) as lookups:
+        futures = [lookups.get_user(i) for i in range(1, 251)]
+        # two full batches went without waiting for the window
+        assert [f.result(timeout=5)["id"] for f in futures[:200]] == \
+            list(range(1, 201))
+        assert not futures[-1].done()
+    assert futures[-1].result(timeout=5)["id"] == 250
+    assert [len(kw["user_id"].split(",")) for _, kw in calls] == [100, 100, 50]
+
+
+def test_lookup_batcher_errors(calls):
+    with Twitter().lookup_batcher() as lookups:
+        nobody = lookups.get_user(1000)
+        failed = lookups.get_status("fail")
+    assert nobody.result(timeout=5) is None
+    with pytest.raises(Exception) as info:
+        failed.result(timeout=5)
+    assert info.value.e.code == 500
+
+
+def test_lookup_batcher_max_concurrency(monkeypatch):
+    running = []
+    peak = []
+    release = threading.Event()
+
+    def slow_call(self, **kwargs):
+        running.append(1)
+        peak.append(len(running))
+        release.wait(5)
+        running.pop()
+        return []
+
+    monkeypatch.setattr(TwitterCall, "__call__", slow_call)
+    lookups = Twitter().lookup_batcher(window=60, max_concurrency=2)
+    lookups.max_batch = 1
+    futures = [lookups.get_user(i) for i in range(10)]
+    assert len(lookups._workers) == 2
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == [None] * 10
+    assert max(peak) <= 2
+    lookups.close()
+    for worker in lookups._workers:
+        worker.join(5)
+        assert not worker.is_alive()
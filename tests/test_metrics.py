@@ -0,0 +1,85 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import os
+
+try:
+    import urllib.request as urllib_request
+except ImportError:
+    import urllib2 as urllib_request
+
+from twitter.metrics import Metrics
+from twitter.trace import RequestTrace
+
+
+def trace(endpoint, status, total, retries=0, stream=False, **attrs):
+    t = RequestTrace(endpoint, "GET", retries, bytes_out=10)
+    t.status = status
+    t.total = total
+    t.stream = stream
+    t.bytes_in = 100
+    for k, v in attrs.items():
+        setattr(t, k, v)
+    return t
+
+
+def record(metrics, t):
+    metrics.request_started(t)
+    metrics(t)
+
+
+def test_metrics_exposition():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    record(metrics, trace("users/show", 200, 0.05, rate_limit_remaining=899))
+    record(metrics, trace("users/show", 429, 0.5))
+    record(metrics, trace("users/show", 200, 2.0, retries=1))
+    record(metrics, trace('odd"name', None, 0.01))
+    metrics.request_started(trace("users/show", None, 0))
+    for _ in range(2):
+        t = trace("statuses/filter", 200, 0.2, stream=True)
+        record(metrics, t)
+        metrics.stream_message(t)
+    text = metrics.exposition()
+    lines = text.splitlines()
+    assert text.endswith("# EOF\n")
+    assert "# TYPE twitter_requests counter" in lines
+    for line in [
+            'twitter_requests_total{endpoint="users/show",method="GET",code="200"} 2',
+            'twitter_requests_total{endpoint="users/show",method="GET",code="429"} 1',
+            'twitter_requests_total{endpoint="odd\\"name",method="GET",code="error"} 1',
+            'twitter_request_duration_seconds_bucket{endpoint="users/show",le="0.1"} 1',
+            'twitter_request_duration_seconds_bucket{endpoint="users/show",le="1.0"} 2',
+            'twitter_request_duration_seconds_bucket{endpoint="users/show",le="+Inf"} 3',
+            'twitter_request_duration_seconds_count{endpoint="users/show"} 3',
+            'twitter_request_duration_seconds_sum{endpoint="users/show"} 2.55',
+            'twitter_requests_in_flight{endpoint="users/show"} 1',
+            'twitter_request_retries_total{endpoint="users/show"} 1',
+            'twitter_rate_limited_total{endpoint="users/show"} 1',
+            'twitter_rate_limit_remaining{endpoint="users/show"} 899',
+            'twitter_sent_bytes_total{endpoint="users/show"} 30',
+            'twitter_received_bytes_total{endpoint="users/show"} 300',
+            'twitter_stream_messages_total{endpoint="statuses/filter"} 2',
+            'twitter_stream_connections_total{endpoint="statuses/filter"} 2',
+            'twitter_stream_reconnects_total{endpoint="statuses/filter"} 1']:
+        assert line in lines, line
+
+
+def test_metrics_export(tmpdir):
+    metrics = Metrics()
+    record(metrics, trace("users/show", 200, 0.05))
+    path = str(tmpdir.join("twitter.prom"))
+    metrics.write(path)
+    with open(path, "rb") as f:
+        assert f.read().decode("utf-8") == metrics.exposition()
+    assert os.listdir(str(tmpdir)) == ["twitter.prom"]
+
+    server = metrics.serve()
+    try:
+        url = "http://127.0.0.1:%d/metrics" % server.server_address[1]
+        res = urllib_request.urlopen(url)
+        assert res.headers["Content-Type"].startswith(
+            "application/openmetrics-text")
+        assert res.read().decode("utf-8") == metrics.exposition()
+    finally:
+        server.shutdown()
+        server.server_close()
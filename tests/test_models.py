@@ -0,0 +1,63 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import copy
+import json
+import pickle
+
+import pytest
+
+from twitter.api import wrap_response
+from twitter.models import Entities, Tweet, User, loads
+
+USER = {"id": 12, "id_str": "12", "screen_name": "jack", "name": "jack",
+        "followers_count": 10, "profile_image_url": "http://x/y.png"}
+
+TIMELINE = [{
+    "id": i, "created_at": "Wed Oct 10 20:19:24 +0000 2018",
+    "full_text": "hello %i" % i, "user": USER, "possibly_sensitive": False,
+    "entities": {"hashtags": [], "urls": [], "user_mentions": [
+        {"screen_name": "other", "id": 13}]},
+} for i in range(3)]
+TIMELINE[2]["retweeted_status"] = dict(TIMELINE[0])
+
+
+def test_loads_models():
+    tweets = loads(json.dumps(TIMELINE).encode('utf8'))
+    assert [type(t) for t in tweets] == [Tweet] * 3
+    assert isinstance(tweets[0].user, User)
+    assert isinstance(tweets[0]['entities'], Entities)
+    # mentions aren't full users
+    assert tweets[0].entities.user_mentions[0] == {"screen_name": "other", "id": 13}
+    # authors are shared
+    assert tweets[0].user is tweets[1].user is tweets[2].retweeted_status.user
+    assert tweets[0].to_dict() == TIMELINE[0]
+    assert tweets == TIMELINE
+
+
+def test_model_dict_access():
+    tweet = loads(json.dumps(TIMELINE[2]))
+    assert tweet['user']['screen_name'] == "jack"
+    assert tweet['possibly_sensitive'] is False
+    assert tweet.get('retweeted_status')['id'] == 0
+    assert 'retweeted_status' in tweet
+    assert 'quoted_status' not in tweet
+    assert tweet.get('quoted_status') is None
+    with pytest.raises(KeyError):
+        tweet['text']
+    tweet['user']['screen_name'] = "jack2"
+    tweet['extra'] = 1
+    assert tweet.user.screen_name == "jack2"
+    assert set(tweet) == set(TIMELINE[2]) | set(['extra'])
+    for copied in (pickle.loads(pickle.dumps(tweet)), copy.deepcopy(tweet)):
+        assert copied == tweet
+        # nested models come back as models
+        assert copied.user.screen_name == "jack2"
+        assert copied.retweeted_status.user.screen_name
+        assert copied.entities.hashtags == tweet.entities.hashtags
+
+
+def test_model_response_headers():
+    headers = {"X-Rate-Limit-Remaining": "5"}
+    tweet = wrap_response(loads(json.dumps(TIMELINE[0])), headers)
+    assert tweet.rate_limit_remaining == 5
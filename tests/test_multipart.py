@@ -0,0 +1,96 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import base64
+import io
+import mmap
+import os
+import tempfile
+
+import pytest
+
+from twitter import Twitter
+from twitter import multipart
+from twitter.multipart import MultipartBody
+from twitter.util import PY_3_OR_HIGHER
+
+from .test_connection import start_api_server
+
+MEDIA = bytes(bytearray(range(256))) * 1001
+
+
+def expected_body(media, base64_encoded=False, name=b'media'):
+    lines = [b'--###Python-Twitter###',
+             b'Content-Disposition: form-data; name="' + name + b'"',
+             b'Content-Type: application/octet-stream']
+    if base64_encoded:
+        lines.append(b'Content-Transfer-Encoding: base64')
+    lines += [b'', media,
+              b'--###Python-Twitter###',
+              b'Content-Disposition: form-data; name="status"',
+              b'Content-Type: text/plain;charset=utf-8',
+              b'', 'PTT ★'.encode('utf-8'),
+              b'--###Python-Twitter###--', b'', b'']
+    return b'\r\n'.join(lines)
+
+
+def test_multipart_sources(monkeypatch):
+    monkeypatch.setattr(multipart, 'BLOCK_SIZE', 3 * 1000)
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'skipped' + MEDIA)
+        with open(path, 'rb') as f:
+            f.read(7)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            sources = [MEDIA, bytearray(MEDIA), memoryview(MEDIA),
+                       io.BytesIO(MEDIA), f]
+            if PY_3_OR_HIGHER:
+                # Python 2 mmaps have no buffer interface
+                sources.append(memoryview(mapped)[7:])
+            for media in sources:
+                for encode in (False, True):
+                    if media is f:
+                        # files are read from their current position
+                        f.seek(7)
+                    elif isinstance(media, io.BytesIO):
+                        media.seek(0)
+                    body = MultipartBody()
+                    body.add_media('media', media, encode_base64=encode)
+                    body.add_field('status', 'PTT ★')
+                    expected = expected_body(
+                        base64.b64encode(MEDIA) if encode else MEDIA, encode)
+                    # twice, as when the request is sent again
+                    for _ in range(2):
+                        data = b''.join(bytes(chunk) for chunk in body)
+                        assert data == expected
+                    assert len(body) == len(expected)
+    finally:
+        os.remove(path)
+
+
+def test_media_upload_from_file():
+    Path = pytest.importorskip("pathlib").Path
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MEDIA)
+        with start_api_server() as domain:
+            for keep_alive in (False, True):
+                t = Twitter(domain=domain, secure=False, keep_alive=keep_alive)
+                res = t.media.upload(media=Path(path), status='PTT ★')
+                assert res["path"].startswith("/1.1/media/upload.json")
+                assert res["body"].encode("latin-1") == expected_body(MEDIA)
+                # a string is the media itself, even if a file has its name
+                res = t.media.upload(media=path, status='PTT ★')
+                assert res["body"].encode("latin-1") == expected_body(
+                    path.encode("utf-8"))
+                assert res["content_type"] == \
+                    "multipart/form-data; boundary=###Python-Twitter###"
+                with open(path, 'rb') as f:
+                    res = t.statuses.update_with_media(
+                        **{"media[]": f, "status": 'PTT ★'})
+                assert res["body"].encode("latin-1") == expected_body(
+                    base64.b64encode(MEDIA), True, b'media[]')
+    finally:
+        os.remove(path)
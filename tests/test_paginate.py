@@ -0,0 +1,117 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import threading
+
+from twitter import Twitter
+from twitter.api import TwitterCall
+from twitter.paginate import iter_pages, paginate
+
+TWEETS = [{"id": i} for i in range(100, 0, -1)]
+
+
+class Timeline(object):
+    """Fake max_id paged endpoint, pages overlapping by one tweet."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, count=20, max_id=None, **kwargs):
+        self.calls.append((max_id, threading.current_thread()))
+        tweets = [t for t in TWEETS if max_id is None or t["id"] <= max_id + 1]
+        return tweets[:count]
+
+
+def followers(cursor=-1, **kwargs):
+    pages = {-1: ([1, 2, 3], 7), 7: ([], 8), 8: ([4], 9), 9: ([5], 0)}
+    ids, next_cursor = pages[cursor]
+    return {"ids": ids, "next_cursor": next_cursor}
+
+
+def test_paginate_max_id():
+    timeline = Timeline()
+    tweets = list(paginate(timeline, {"count": 30}))
+    assert [t["id"] for t in tweets] == list(range(100, 0, -1))
+    assert [max_id for max_id, _ in timeline.calls] == [None, 70, 41, 12, 0]
+    # the next pages were fetched in the background
+    assert timeline.calls[1][1] is not threading.current_thread()
+
+
+def test_paginate_budget():
+    timeline = Timeline()
+    tweets = list(paginate(timeline, {"count": 30}, max_items=45))
+    assert [t["id"] for t in tweets] == list(range(100, 55, -1))
+    assert len(timeline.calls) == 2
+    timeline = Timeline()
+    assert len(list(iter_pages(timeline, {"count": 30}, max_pages=2))) == 2
+    assert len(timeline.calls) == 2
+    timeline = Timeline()
+    pages = list(iter_pages(timeline, {"count": 30}, prefetch=False))
+    assert len(pages) == 5
+    assert set(thread for _, thread in timeline.calls) == set(
+        [threading.current_thread()])
+
+
+def test_paginate_cursor():
+    assert list(paginate(followers, {"screen_name": "a"})) == [1, 2, 3, 4, 5]
+    assert list(paginate(followers, {}, max_items=2)) == [1, 2]
+    pages = list(iter_pages(followers, {}))
+    assert [p["next_cursor"] for p in pages] == [7, 8, 9, 0]
+
+
+def test_paginate_single_page():
+    # items without ids and no cursor: no next page to ask for
+    page = {"results": [{"name": "a"}, {"name": "b"}]}
+    assert list(paginate(lambda **kwargs: page, {})) == page["results"]
+    assert list(paginate(lambda **kwargs: ["a", "b"], {})) == ["a", "b"]
+
+
+def test_paginate_since_id():
+    timeline = Timeline()
+    tweets = list(paginate(timeline, {"count": 30, "since_id": 50}))
+    # the endpoint doesn't filter here, paging stops past since_id
+    assert [t["id"] for t in tweets] == list(range(100, 41, -1))
+    assert [max_id for max_id, _ in timeline.calls] == [None, 70]
+
+
+def test_paginate_next_token():
+    pages = {
+        None: {"data": [{"id": "3"}, {"id": "2"}],
+               "meta": {"next_token": "b"}},
+        "b": {"data": [{"id": "1"}], "meta": {"result_count": 1}},
+    }
+    calls = []
+
+    def search(pagination_token=None, **kwargs):
+        calls.append(pagination_token)
+        return pages[pagination_token]
+
+    tweets = list(paginate(search, {"query": "a"}))
+    assert [t["id"] for t in tweets] == ["3", "2", "1"]
+    assert calls == [None, "b"]
+
+
+def test_paginate_string_ids():
+    # last page of direct_messages/events/list: no cursor, string ids
+    page = {"events": [{"id": "9"}, {"id": "8"}]}
+    calls = []
+
+    def events(**kwargs):
+        calls.append(kwargs)
+        return page
+
+    assert list(paginate(events, {})) == page["events"]
+    assert calls == [{}]
+
+
+def test_twitter_call_paginate(monkeypatch):
+    t = Twitter()
+    seen = []
+
+    def fake_call(self, **kwargs):
+        seen.append(self.uriparts)
+        return followers(**kwargs)
+
+    monkeypatch.setattr(TwitterCall, "__call__", fake_call)
+    assert list(t.followers.ids.paginate(screen_name="a")) == [1, 2, 3, 4, 5]
+    assert seen[0] == ("1.1", "followers", "ids")
@@ -0,0 +1,78 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import time
+
+from twitter.ratelimit import RateLimitScheduler, WINDOW
+
+
+def headers(remaining, reset, limit=900):
+    return {
+        'X-Rate-Limit-Remaining': str(remaining),
+        'X-Rate-Limit-Reset': str(reset),
+        'X-Rate-Limit-Limit': str(limit),
+    }
+
+
+def test_unknown_endpoint_does_not_wait():
+    scheduler = RateLimitScheduler()
+    assert scheduler.reserve("users/show", now=1000) == 0
+    assert scheduler.status("users/show") is None
+
+
+def test_waits_for_reset_when_exhausted():
+    scheduler = RateLimitScheduler(margin=1)
+    scheduler.update("users/show", headers(2, 1600, limit=3))
+    assert scheduler.reserve("users/show", now=1000) == 0
+    assert scheduler.reserve("users/show", now=1000) == 0
+    # third call of the window: wait for the reset
+    assert scheduler.reserve("users/show", now=1000) == 601
+    # the next two go into that new window too, so they wait for it as
+    # well; the following one is pushed to the window after
+    assert scheduler.reserve("users/show", now=1000) == 601
+    assert scheduler.reserve("users/show", now=1000) == 601
+    assert scheduler.reserve("users/show", now=1000) == 601 + WINDOW + 1
+    # once the window started, its calls don't wait
+    scheduler = RateLimitScheduler(margin=1)
+    scheduler.update("users/show", headers(0, 1600))
+    assert [scheduler.reserve("users/show", now=1000)
+            for _ in range(4)] == [601, 601, 601, 601]
+    assert scheduler.reserve("users/show", now=1700) == 0
+    # a late answer from the exhausted window changes nothing
+    scheduler.update("users/show", headers(0, 1600))
+    assert scheduler.status("users/show") == (900, 895, 1601 + WINDOW)
+    # other endpoints are not affected
+    assert scheduler.reserve("followers/ids", now=1000) == 0
+
+
+def test_in_flight_calls_are_kept():
+    scheduler = RateLimitScheduler()
+    scheduler.update("users/show", headers(10, 1600))
+    for _ in range(5):
+        scheduler.reserve("users/show", now=1000)
+    # a late answer sent before those five calls were counted
+    scheduler.update("users/show", headers(9, 1600))
+    assert scheduler.status("users/show") == (900, 5, 1600)
+    # a new window
+    scheduler.update("users/show", headers(899, 2500))
+    assert scheduler.status("users/show") == (900, 899, 2500)
+
+
+def test_pacing():
+    scheduler = RateLimitScheduler(pace=True)
+    scheduler.update("users/show", headers(3, 1300))
+    delays = [scheduler.reserve("users/show", now=1000) for _ in range(3)]
+    assert delays == [0, 100, 200]
+
+
+def test_acquire_deadline():
+    scheduler = RateLimitScheduler()
+    now = time.time()
+    scheduler.update("users/show", {
+        "X-Rate-Limit-Limit": "1", "X-Rate-Limit-Remaining": "0",
+        "X-Rate-Limit-Reset": str(int(now) + 600)})
+    assert scheduler.acquire("users/show", deadline=now + 10) is False
+    # the abandoned call isn't booked
+    assert scheduler.status("users/show")[1] == 1
+    assert scheduler.acquire("users/show", deadline=now + 10) is False
+    assert scheduler.status("users/show")[1] == 1
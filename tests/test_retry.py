@@ -0,0 +1,164 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from email.utils import formatdate
+from io import BytesIO
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+import pytest
+
+import twitter.api
+from twitter import Twitter, TwitterHTTPError, TwitterTimeoutError
+from twitter.api import TwitterCall
+from twitter.retry import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy, retry_after)
+
+
+def http_error(code, headers=None):
+    e = urllib_error.HTTPError(
+        "https://api.twitter.com/1.1/x.json", code, "", headers or {},
+        BytesIO(b""))
+    return TwitterHTTPError(e, "x", "json", "")
+
+
+def test_retry_delays():
+    policy = RetryPolicy(max_retries=10, max_time=None, base=1, cap=5,
+                         failure_threshold=0)
+    state = policy.start("api.twitter.com")
+    previous = 1
+    for _ in range(10):
+        wait = state.failed(http_error(503))
+        assert 1 <= wait <= min(5, previous * 3)
+        previous = wait
+    with pytest.raises(TwitterHTTPError):
+        state.failed(http_error(503))
+
+    state = policy.start("api.twitter.com")
+    assert state.failed(http_error(503, {"Retry-After": "7"})) == 7
+    assert 0 < state.failed(http_error(
+        429, {"X-Rate-Limit-Reset": str(int(state.started) + 60)})) <= 61
+    with pytest.raises(TwitterHTTPError):
+        state.failed(http_error(404))
+    assert state.retries == 2
+
+
+def test_retry_after_date():
+    now = 1000000000
+    assert retry_after({"Retry-After": formatdate(now + 30)}, now) == 30
+    assert retry_after({"Retry-After": "soon"}, now) is None
+    assert retry_after({}, now) is None
+
+
+def test_retry_max_time():
+    policy = RetryPolicy(max_time=10, failure_threshold=0)
+    state = policy.start("api.twitter.com")
+    with pytest.raises(TwitterHTTPError):
+        state.failed(http_error(503, {"Retry-After": "11"}))
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, ttl=10)
+    for _ in range(4):
+        budget.deposit(now=100)
+    assert [budget.withdraw(now=101) for _ in range(3)] == [True, True, False]
+    # the calls and retries of the window are forgotten after ttl
+    budget.deposit(now=112)
+    assert [budget.withdraw(now=112) for _ in range(2)] == [True, False]
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker("api.twitter.com", failure_threshold=2,
+                             reset_timeout=10)
+    breaker.failure(now=100)
+    breaker.check(now=100)
+    breaker.failure(now=100)
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.check(now=105)
+    assert info.value.retry_in == 5
+    # one probe goes through after the timeout, not two
+    breaker.check(now=110)
+    with pytest.raises(CircuitOpenError):
+        breaker.check(now=111)
+    breaker.success()
+    breaker.check(now=111)
+    assert breaker.state == "closed"
+
+
+def test_twitter_retry_policy(monkeypatch):
+    errors = [http_error(503), IOError("reset"), http_error(502)]
+    calls = []
+    waits = []
+
+    def fake_handle_response(self, req, uri, arg_data, _timeout=None,
+                             _retries=0):
+        calls.append(_retries)
+        if errors:
+            raise errors.pop(0)
+        return {"ok": True}
+
+    monkeypatch.setattr(TwitterCall, "_handle_response", fake_handle_response)
+    monkeypatch.setattr(twitter.api, "sleep", waits.append)
+    policy = RetryPolicy(failure_threshold=4)
+    t = Twitter(retry=policy)
+    assert t.statuses.home_timeline() == {"ok": True}
+    assert calls == [0, 1, 2, 3]
+    assert len(waits) == 3
+
+    # a tweet isn't posted again after a failure which may come after it
+    del calls[:]
+    errors[:] = [IOError("reset")]
+    with pytest.raises(IOError):
+        t.statuses.update(status="once")
+    assert calls == [0]
+
+    # three failures in a row open the circuit of the host
+    t = Twitter(retry=RetryPolicy(max_retries=0, failure_threshold=3))
+    errors[:] = [http_error(503)] * 3
+    for _ in range(3):
+        with pytest.raises(TwitterHTTPError):
+            t.statuses.home_timeline()
+    del calls[:]
+    with pytest.raises(CircuitOpenError):
+        t.statuses.home_timeline()
+    assert calls == []
+
+
+def test_retry_deadline(monkeypatch):
+    calls = []
+    waits = []
+
+    def fake_handle_response(self, req, uri, arg_data, _timeout=None,
+                             _retries=0):
+        calls.append(_retries)
+        raise http_error(503, {"Retry-After": "2"})
+
+    monkeypatch.setattr(TwitterCall, "_handle_response", fake_handle_response)
+    monkeypatch.setattr(twitter.api, "sleep", waits.append)
+    for retry in (True, RetryPolicy()):
+        del calls[:]
+        t = Twitter(retry=retry, deadline=1)
+        # the next attempt would start after the deadline: give up now
+        with pytest.raises(TwitterTimeoutError):
+            t.statuses.home_timeline()
+        assert calls == [0] and waits == []
+
+
+def test_retry_non_idempotent():
+    policy = RetryPolicy(failure_threshold=0)
+    state = policy.start("api.twitter.com", "POST")
+    # the server may have handled the call before failing
+    for error in (IOError("reset"), http_error(500), http_error(503)):
+        with pytest.raises(type(error)):
+            state.failed(error)
+    # it says it didn't
+    assert state.failed(http_error(503, {"Retry-After": "3"})) == 3
+    assert state.failed(http_error(429, {"Retry-After": "4"})) == 4
+    state = RetryPolicy(failure_threshold=0, retry_methods=None).start(
+        "api.twitter.com", "POST")
+    assert state.failed(IOError("reset")) >= 1
+    assert policy.start("api.twitter.com", "DELETE").failed(
+        http_error(500)) >= 1
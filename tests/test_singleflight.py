@@ -0,0 +1,76 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import pytest
+
+from twitter import OAuth, Twitter, TwitterTimeoutError
+from twitter.api import TwitterCall
+
+
+def test_single_flight(monkeypatch):
+    sent = []
+    release = threading.Event()
+
+    def fake_handle_response(self, req, uri, arg_data, _timeout=None,
+                             _retries=0):
+        sent.append(req.get_full_url())
+        release.wait()
+        return {"url": req.get_full_url()}
+
+    monkeypatch.setattr(TwitterCall, "_handle_response", fake_handle_response)
+    t = Twitter(auth=OAuth("tok", "tok_secret", "con", "con_secret"),
+                single_flight=True)
+    results = []
+
+    def call(**kwargs):
+        results.append(t.users.show(**kwargs))
+
+    threads = [threading.Thread(target=call, kwargs={"screen_name": "a"})
+               for _ in range(5)]
+    threads.append(threading.Thread(target=call, kwargs={"screen_name": "b"}))
+    for thread in threads:
+        thread.start()
+    while t.single_flight.coalesced < 4 or len(sent) < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(sent) == 2
+    a = [r for r in results if "screen_name=a" in r["url"]]
+    assert len(a) == 5 and all(r is a[0] for r in a)
+    assert t.single_flight.coalesced == 4
+    # the calls which aren't running at the same time aren't coalesced
+    t.users.show(screen_name="a")
+    assert len(sent) == 3
+    # nor are POST calls
+    t.statuses.update(status="hello")
+    t.statuses.update(status="hello")
+    assert len(sent) == 5
+
+
+def test_single_flight_deadline(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def fake_handle_response(self, req, uri, arg_data, _timeout=None,
+                             _retries=0):
+        started.set()
+        release.wait()
+        return {"ok": True}
+
+    monkeypatch.setattr(TwitterCall, "_handle_response", fake_handle_response)
+    t = Twitter(single_flight=True)
+    leader = threading.Thread(target=t.users.show, kwargs={"screen_name": "a"})
+    leader.start()
+    started.wait()
+    # the caller waiting for the leader's call gives up at its deadline
+    start = time.time()
+    with pytest.raises(TwitterTimeoutError):
+        t.users.show(screen_name="a", _deadline=0.2)
+    assert 0.1 < time.time() - start < 2
+    release.set()
+    leader.join()
@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import gzip
+import io
+import json
+
+try:
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urlparse as urllib_parse
+
+from twitter import Twitter, TwitterHTTPError, TwitterStream
+from twitter.connection import ConnectionPool
+from twitter.transport import MemoryResponse, MemoryTransport
+
+from .test_connection import start_api_server
+
+
+def test_memory_transport():
+    transport = MemoryTransport()
+    transport.add("GET", "/1.1/users/show.json", {"id": 12})
+
+    def echo(req):
+        query = urllib_parse.urlsplit(req.get_full_url()).query
+        return {"method": req.get_method(), "query": query,
+                "body": req.data.decode("utf-8")}
+    transport.add("POST", "/1.1/statuses/update.json", echo)
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(b'[1, 2]')
+    transport.add("GET", "/1.1/gzipped.json", MemoryResponse(
+        200, {"Content-Type": "application/json",
+              "Content-Encoding": "gzip"}, buf.getvalue()))
+
+    t = Twitter(transport=transport)
+    res = t.users.show(screen_name="jack")
+    assert res == {"id": 12}
+    assert res.headers.get("Content-Type").startswith("application/json")
+    res = t.statuses.update(status="hi")
+    assert res == {"method": "POST", "query": "", "body": "status=hi"}
+    # canned responses can be read again
+    assert t.gzipped() == t.gzipped() == [1, 2]
+    try:
+        t.users.missing()
+    except TwitterHTTPError as e:
+        assert e.e.code == 404
+        assert e.response_data["errors"][0]["code"] == 34
+    else:
+        assert False, "TwitterHTTPError not raised"
+    assert [req.get_method() for req in transport.requests] == \
+        ["GET", "POST", "GET", "GET", "GET"]
+    assert t.transport is transport
+
+
+def test_memory_transport_stream():
+    transport = MemoryTransport()
+    messages = [json.dumps({"n": i}).encode("utf-8") + b"\r\n"
+                for i in range(3)]
+    # a message split between two reads
+    chunks = [messages[0], messages[1][:4], messages[1][4:] + messages[2]]
+    transport.add("GET", "/1.1/statuses/sample.json",
+                  MemoryResponse(200, {}, chunks))
+    stream = TwitterStream(transport=transport)
+    assert [m.get("n") for m in stream.statuses.sample()] == [0, 1, 2, None]
+
+
+def test_pooled_stream():
+    with start_api_server() as domain:
+        stream = TwitterStream(domain=domain, secure=False,
+                               transport=ConnectionPool())
+        messages = list(stream.stream.sample())
+    assert [m.get("n") for m in messages] == [0, 1, 2, None]
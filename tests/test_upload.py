@@ -0,0 +1,169 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+from twitter import Twitter, TwitterHTTPError, TwitterTimeoutError
+from twitter.upload import MediaUpload
+
+try:
+    import http.server as BaseHTTPServer
+    import socketserver as SocketServer
+    from urllib.parse import parse_qsl, urlsplit
+except ImportError:
+    import BaseHTTPServer
+    import SocketServer
+    from urlparse import parse_qsl, urlsplit
+
+
+def parse_multipart(body, content_type):
+    boundary = content_type.split("boundary=")[1].encode("latin-1")
+    fields = {}
+    for part in body.split(b"--" + boundary)[1:-1]:
+        head, _, content = part[2:-2].partition(b"\r\n\r\n")
+        name = head.split(b'name="')[1].split(b'"')[0].decode("utf-8")
+        fields[name] = content
+    return fields
+
+
+@contextlib.contextmanager
+def start_upload_server(fail=None):
+    """Stand-in for the chunked upload endpoint of upload.twitter.com.
+    `fail` maps segment indexes to the list of status codes to answer
+    the next APPENDs of those segments with."""
+    fail = fail or {}
+    server_state = {"inits": 0, "appends": [], "segments": {}, "status": 0}
+
+    class MyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, code, data=None):
+            body = json.dumps(data).encode("utf-8") if data is not None else b""
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            params = dict(parse_qsl(urlsplit(self.path).query))
+            assert params["command"] == "STATUS"
+            server_state["status"] += 1
+            self.reply(200, {"media_id_string": params["media_id"],
+                             "processing_info": {"state": "succeeded"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            content_type = self.headers["Content-Type"]
+            if content_type.startswith("multipart/"):
+                fields = parse_multipart(body, content_type)
+                params = dict((k, v.decode("utf-8")) for k, v in fields.items()
+                              if k != "media")
+            else:
+                params = dict(parse_qsl(body.decode("utf-8")))
+            command = params["command"]
+            if command == "INIT":
+                server_state["inits"] += 1
+                server_state["total_bytes"] = int(params["total_bytes"])
+                server_state["media_category"] = params["media_category"]
+                self.reply(202, {"media_id_string": "710511363345354753",
+                                 "expires_after_secs": 86400})
+            elif command == "APPEND":
+                index = int(params["segment_index"])
+                server_state["appends"].append(index)
+                if fail.get(index):
+                    self.reply(fail[index].pop(0), {"errors": "failed"})
+                    return
+                server_state["segments"][index] = fields["media"]
+                self.reply(204)
+            elif command == "FINALIZE":
+                data = b"".join(server_state["segments"][i] for i in
+                                sorted(server_state["segments"]))
+                server_state["data"] = data
+                self.reply(201, {
+                    "media_id_string": params["media_id"], "size": len(data),
+                    "processing_info": {"state": "pending",
+                                        "check_after_secs": 0}})
+
+        def log_message(self, *args):
+            pass
+
+    class Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+        daemon_threads = True
+
+    httpd = Server(("127.0.0.1", 0), MyHandler)
+    t = threading.Thread(target=httpd.serve_forever)
+    t.daemon = True
+    t.start()
+    yield "127.0.0.1:%i" % httpd.server_address[1], server_state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def video():
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    with os.fdopen(fd, "wb") as f:
+        f.write(os.urandom(10000))
+    yield path
+    os.remove(path)
+    if os.path.exists(path + ".twupload"):
+        os.remove(path + ".twupload")
+
+
+def test_upload_media(video, monkeypatch):
+    monkeypatch.setattr("twitter.upload.sleep", lambda delay: None)
+    with start_upload_server(fail={2: [503]}) as (domain, server):
+        t = Twitter(domain=domain, secure=False)
+        res = t.upload_media(video, segment_size=1024, max_concurrency=3)
+    assert res["media_id_string"] == "710511363345354753"
+    assert res["processing_info"]["state"] == "succeeded"
+    with open(video, "rb") as f:
+        assert server["data"] == f.read()
+    assert server["media_category"] == "tweet_video"
+    assert sorted(server["appends"]) == sorted(list(range(10)) + [2])
+    assert server["status"] == 1
+    assert not os.path.exists(video + ".twupload")
+
+
+def test_upload_media_resume(video):
+    with start_upload_server(fail={4: [400]}) as (domain, server):
+        t = Twitter(domain=domain, secure=False)
+        with pytest.raises(TwitterHTTPError):
+            t.upload_media(video, segment_size=1024, max_concurrency=1)
+        with open(video + ".twupload") as f:
+            assert json.load(f)["done"] == [0, 1, 2, 3]
+        res = t.upload_media(video, segment_size=1024, max_concurrency=2)
+    assert res["processing_info"]["state"] == "succeeded"
+    assert server["inits"] == 1
+    assert sorted(server["appends"]) == sorted(list(range(10)) + [4])
+    with open(video, "rb") as f:
+        assert server["data"] == f.read()
+
+
+def test_upload_media_wait_timeout(video, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("twitter.upload.time", lambda: now[0])
+    monkeypatch.setattr("twitter.upload.sleep",
+                        lambda delay: now.__setitem__(0, now[0] + delay))
+    pending = {"processing_info": {"state": "in_progress",
+                                   "check_after_secs": 5}}
+
+    class Media(object):
+        def upload(self, **kwargs):
+            return pending
+
+    class FakeTwitter(object):
+        media = Media()
+
+    upload = MediaUpload(FakeTwitter(), video)
+    upload.state = {"media_id": "42"}
+    with pytest.raises(TwitterTimeoutError):
+        upload.wait(pending, timeout=12)
+    assert now[0] == 1010.0
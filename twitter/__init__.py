@@ -8,7 +8,9 @@ Twitter-enabled applications.
 
 from textwrap import dedent
 
-from .api import Twitter, TwitterError, TwitterHTTPError, TwitterResponse
+from .api import (
+    Twitter, TwitterError, TwitterHTTPError, TwitterRawResponse,
+    TwitterResponse, TwitterTimeoutError)
 from .auth import NoAuth, UserPassAuth
 from .oauth import (
     OAuth, read_token_file, write_token_file,
@@ -18,6 +20,10 @@ from .oauth2 import (
     __doc__ as oauth2_doc)
 from .stream import TwitterStream
 from .oauth_dance import oauth_dance, oauth2_dance
+from .util import PY_3_OR_HIGHER
+
+if PY_3_OR_HIGHER:
+    from .aio import AsyncTwitter, AsyncTwitterStream
 
 __doc__ = __doc__ or ""
 
@@ -75,9 +81,14 @@ __all__ = [
     "Twitter",
     "TwitterError",
     "TwitterHTTPError",
+    "TwitterRawResponse",
     "TwitterResponse",
     "TwitterStream",
+    "TwitterTimeoutError",
     "UserPassAuth",
     "write_bearer_token_file",
     "write_token_file",
     ]
+
+if PY_3_OR_HIGHER:
+    __all__ += ["AsyncTwitter", "AsyncTwitterStream"]
@@ -0,0 +1,635 @@
+# encoding: utf-8
+"""
+asyncio flavours of the Twitter and TwitterStream classes (Python 3 only).
+
+`AsyncTwitter` is used exactly like `Twitter`, except that calling an
+API method returns an awaitable. Requests run on the event loop over a
+bounded pool of keep-alive connections, so hundreds of independent
+calls can be in flight at once without a thread each::
+
+    import asyncio
+    from twitter import AsyncTwitter, OAuth
+
+    async def main():
+        t = AsyncTwitter(auth=OAuth(
+            token, token_secret, consumer_key, consumer_secret))
+        timelines = await asyncio.gather(*(
+            t.statuses.user_timeline(screen_name=name)
+            for name in screen_names))
+        await t.close()
+
+    asyncio.run(main())
+
+`AsyncTwitterStream` mirrors `TwitterStream`: awaiting a call connects
+to the stream and returns an asynchronous iterator::
+
+    stream = AsyncTwitterStream(auth=OAuth(...))
+    async for tweet in await stream.statuses.filter(track="python"):
+        # ...do something with this tweet...
+
+Authentication objects, error types (`TwitterHTTPError`...) and the
+special `_id`, `_json`, `_method`, `_timeout` arguments all work the
+same as with the blocking classes.
+"""
+
+import asyncio
+import codecs
+import socket
+import time
+from collections import deque
+from io import BytesIO
+
+import http.client as http_client
+import urllib.error as urllib_error
+import urllib.parse as urllib_parse
+
+from .api import (
+    TwitterCall, TwitterError, TwitterHTTPError, TwitterTimeoutError,
+    _DEFAULT, _is_timeout, decompress_body, endpoint_template,
+    release_booking, time_left, wrap_raw_response, wrap_response)
+from .auth import NoAuth
+from .connection import IDEMPOTENT_METHODS, USER_AGENT, ssl_context
+from .cache import ResponseCache
+from .ratelimit import RateLimitScheduler
+from .trace import RequestTrace, body_length, clock, notify
+from .stream import (
+    HttpChunkDecoder, JsonDecoder, Timer, Timeout, Hangup, DecodeError,
+    HeartbeatTimeout, MIN_SOCK_TIMEOUT, MAX_SOCK_TIMEOUT, HEARTBEAT_TIMEOUT)
+
+READ_SIZE = 65536
+HEADERS_LIMIT = 1 << 20
+
+
+class AsyncResponse(object):
+    """
+    A response read by an `AsyncConnectionPool`. For regular calls the
+    body has already been read; for streams it is left on `reader`.
+    """
+
+    def __init__(self, status, reason, headers, url, reader=None,
+                 writer=None):
+        self.code = self.status = status
+        self.reason = self.msg = reason
+        self.headers = headers
+        self.url = url
+        self.reader = reader
+        self.writer = writer
+        self.body = b''
+
+    def info(self):
+        return self.headers
+
+    def read(self):
+        return self.body
+
+    @property
+    def chunked(self):
+        return 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+class _Connection(object):
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.time()
+
+    @property
+    def stale(self):
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+
+def _request_head(req, host):
+    parts = urllib_parse.urlsplit(req.get_full_url())
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    headers = {}
+    for k, v in req.header_items():
+        if isinstance(k, bytes):
+            k = k.decode('latin-1')
+        if isinstance(v, bytes):
+            v = v.decode('latin-1')
+        headers[k.capitalize()] = v
+    if req.data is not None:
+        headers.setdefault('Content-type', 'application/x-www-form-urlencoded')
+        headers['Content-length'] = str(len(req.data))
+    headers.setdefault('User-agent', USER_AGENT)
+    headers.setdefault('Accept-encoding', 'identity')
+    headers['Host'] = host
+    lines = ["%s %s HTTP/1.1" % (req.get_method(), path)]
+    lines.extend("%s: %s" % item for item in headers.items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _send_request(writer, req, host):
+    writer.write(_request_head(req, host))
+    body = req.data
+    if isinstance(body, (bytes, bytearray)):
+        writer.write(body)
+    elif body is not None:
+        # a MultipartBody, sent block by block
+        for chunk in body:
+            writer.write(chunk)
+            await writer.drain()
+    await writer.drain()
+
+
+async def _read_head(reader):
+    """Read the status line and the headers of a response."""
+    while True:
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, _, header_lines = head.partition(b'\r\n')
+        version, status, reason = (
+            status_line.decode('latin-1').split(' ', 2) + [''])[:3]
+        status = int(status)
+        headers = http_client.parse_headers(BytesIO(header_lines))
+        if status != 100:
+            return version, status, reason.strip(), headers
+
+
+async def _read_chunked(reader):
+    parts = []
+    while True:
+        line = await reader.readline()
+        size = int(line.split(b';', 1)[0].strip(), 16)
+        if size == 0:
+            # skip the trailers
+            while line not in (b'\r\n', b'\n', b''):
+                line = await reader.readline()
+            return b''.join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+class AsyncConnectionPool(object):
+    """
+    A bounded pool of keep-alive connections for an event loop.
+
+    At most `maxsize` requests are in flight at the same time, further
+    calls wait for a free slot. Idle connections are kept per host and
+    reused for `idle_timeout` seconds.
+    """
+
+    def __init__(self, maxsize=100, idle_timeout=60.0):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._loop = None
+        self._idle = {}
+        self._semaphore = None
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize, 'idle_timeout': self.idle_timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _check_loop(self):
+        # asyncio objects are bound to the loop they were created in.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._idle = {}
+            self._semaphore = asyncio.Semaphore(self.maxsize)
+
+    def _get(self, key):
+        idle = self._idle.get(key)
+        now = time.time()
+        while idle:
+            conn = idle.pop()
+            if not conn.stale and now - conn.last_used < self.idle_timeout:
+                return conn
+            conn.close()
+        return None
+
+    def _put(self, key, conn):
+        conn.last_used = time.time()
+        self._idle.setdefault(key, deque()).append(conn)
+
+    async def _connect(self, scheme, host, port, context):
+        if scheme == 'https':
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=context or ssl_context(),
+                server_hostname=host, limit=HEADERS_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit=HEADERS_LIMIT)
+        return _Connection(reader, writer)
+
+    @staticmethod
+    def _key(req):
+        parts = urllib_parse.urlsplit(req.get_full_url())
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return (parts.scheme, parts.hostname, port), parts.netloc
+
+    async def urlopen(self, req, timeout=None, context=None):
+        """
+        Send a `urllib` `Request` and read its response. HTTP errors are
+        raised as `HTTPError` and network errors, timeouts included, as
+        `URLError`, as urllib does.
+        """
+        self._check_loop()
+        async with self._semaphore:
+            if timeout:
+                try:
+                    return await asyncio.wait_for(
+                        self._urlopen(req, context), timeout)
+                except asyncio.TimeoutError:
+                    raise urllib_error.URLError(socket.timeout("timed out"))
+            return await self._urlopen(req, context)
+
+    async def _urlopen(self, req, context):
+        key, host = self._key(req)
+        conn = self._get(key)
+        while True:
+            reused = conn is not None
+            if not reused:
+                try:
+                    conn = await self._connect(key[0], key[1], key[2], context)
+                except OSError as e:
+                    raise urllib_error.URLError(e)
+            written = False
+            try:
+                await _send_request(conn.writer, req, host)
+                written = True
+                version, status, reason, headers = await _read_head(conn.reader)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                # The server may have dropped the connection while it
+                # was idle: retry once on a brand new one, unless the
+                # request may have been processed and can't be sent
+                # twice.
+                if reused and (not written
+                               or req.get_method() in IDEMPOTENT_METHODS):
+                    conn = None
+                    continue
+                raise urllib_error.URLError(e)
+            except BaseException:
+                # cancelled or timed out: the connection is in an
+                # unknown state
+                conn.close()
+                raise
+            break
+
+        handle = AsyncResponse(status, reason, headers, req.get_full_url())
+        try:
+            if req.get_method() == 'HEAD' or status in (204, 304):
+                pass
+            elif handle.chunked:
+                handle.body = await _read_chunked(conn.reader)
+            elif headers.get('Content-Length') is not None:
+                handle.body = await conn.reader.readexactly(
+                    int(headers['Content-Length']))
+            else:
+                handle.body = await conn.reader.read()
+        except asyncio.IncompleteReadError as e:
+            conn.close()
+            raise http_client.IncompleteRead(e.partial)
+        except BaseException:
+            conn.close()
+            raise
+
+        connection = headers.get('Connection', '').lower()
+        if connection == 'close' or (
+                version == 'HTTP/1.0' and connection != 'keep-alive'):
+            conn.close()
+        else:
+            self._put(key, conn)
+
+        if not 200 <= status < 300:
+            raise urllib_error.HTTPError(
+                handle.url, status, reason, headers, BytesIO(handle.body))
+        return handle
+
+    async def open_stream(self, req, context=None):
+        """
+        Send a request on a dedicated connection and return the response
+        right after its headers, leaving the body on its `reader`.
+        """
+        key, host = self._key(req)
+        try:
+            conn = await self._connect(key[0], key[1], key[2], context)
+        except OSError as e:
+            raise urllib_error.URLError(e)
+        try:
+            await _send_request(conn.writer, req, host)
+            version, status, reason, headers = await _read_head(conn.reader)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            conn.close()
+            raise urllib_error.URLError(e)
+        except BaseException:
+            conn.close()
+            raise
+        handle = AsyncResponse(
+            status, reason, headers, req.get_full_url(),
+            conn.reader, conn.writer)
+        if not 200 <= status < 300:
+            try:
+                handle.body = await conn.reader.read()
+            finally:
+                handle.close()
+            raise urllib_error.HTTPError(
+                handle.url, status, reason, headers, BytesIO(handle.body))
+        return handle
+
+    async def close(self):
+        """Close all the idle connections."""
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class AsyncTwitterCall(TwitterCall):
+
+    async def _handle_response(self, req, uri, arg_data, _timeout=None,
+                               _retries=0):
+        cache_key, cache_ttl, cached = self._cache_lookup(req)
+        if cached is not None:
+            release_booking(req)
+            return self._decode_body(
+                cached.body, cached.headers, uri, arg_data)
+        try:
+            time_left(req, uri)
+        except TwitterTimeoutError:
+            release_booking(req)
+            raise
+        if not self.hooks:
+            return await self._request(
+                req, uri, arg_data, _timeout, cache_key, cache_ttl)
+        trace = RequestTrace(
+            endpoint_template(self.uriparts), req.get_method(), _retries,
+            body_length(req.data))
+        notify(self.hooks, 'request_started', trace)
+        try:
+            return await self._request(
+                req, uri, arg_data, _timeout, cache_key, cache_ttl, trace)
+        except Exception as e:
+            trace.error = e
+            raise
+        finally:
+            trace.done()
+            for hook in self.hooks:
+                hook(trace)
+
+    async def _request(self, req, uri, arg_data, _timeout=None,
+                       cache_key=None, cache_ttl=None, trace=None):
+        deadline = getattr(req, 'deadline', None)
+        rate_limit = getattr(req, 'rate_limit', None) or self.rate_limit
+        if rate_limit is not None:
+            family = endpoint_template(self.uriparts)
+            delay = rate_limit.reserve(family)
+            if delay > 0:
+                try:
+                    delay = self._wait_before_retry(req, uri, delay)
+                except TwitterTimeoutError:
+                    rate_limit.cancel(family)
+                    raise
+                await asyncio.sleep(delay)
+        if deadline is not None:
+            left = time_left(req, uri)
+            _timeout = min(_timeout, left) if _timeout else left
+        start = clock()
+        try:
+            handle = await self.transport.urlopen(
+                req, _timeout, ssl_context(self.verify_context))
+            if rate_limit is not None:
+                rate_limit.update(family, handle.headers)
+            if trace is not None:
+                # the pool reads the whole body with the headers
+                trace.body = clock() - start
+                trace.response(handle.status, handle.headers)
+                trace.bytes_in = len(handle.body)
+        except urllib_error.HTTPError as e:
+            if rate_limit is not None:
+                rate_limit.update(family, e.headers)
+            if trace is not None:
+                trace.response(e.code, e.headers)
+            if (e.code == 304):
+                return wrap_raw_response(b'', e.headers) if self.raw else []
+            else:
+                raise TwitterHTTPError(e, uri, self.format, arg_data)
+        except urllib_error.URLError as e:
+            if deadline is not None and _is_timeout(e):
+                raise TwitterTimeoutError(uri, deadline)
+            raise
+        if handle.headers['Content-Type'] in ['image/jpeg', 'image/png']:
+            return handle
+        if self.raw:
+            if cache_key is not None:
+                self.cache.set(
+                    cache_key, decompress_body(handle.body, handle.headers),
+                    handle.headers, cache_ttl)
+            return wrap_raw_response(handle.body, handle.headers)
+        start = clock()
+        body = decompress_body(handle.body, handle.headers)
+        if trace is not None:
+            trace.decompress = clock() - start
+            start = clock()
+        res = self._decode_body(body, handle.headers, uri, arg_data)
+        if trace is not None:
+            trace.decode = clock() - start
+        if cache_key is not None:
+            self.cache.set(cache_key, body, handle.headers, cache_ttl)
+        return res
+
+    async def _handle_response_with_retry(self, req, uri, arg_data, _timeout=None):
+        if not isinstance(self.retry, (bool, int)):
+            state = self.retry.start(self.domain, req.get_method())
+            while True:
+                try:
+                    state.check()
+                except TwitterError:
+                    # CircuitOpenError: not sent
+                    release_booking(req)
+                    raise
+                try:
+                    res = await self._handle_response(
+                        req, uri, arg_data, _timeout, state.retries)
+                except TwitterTimeoutError:
+                    raise
+                except (TwitterError, OSError) as e:
+                    await asyncio.sleep(self._wait_before_retry(
+                        req, uri, state.failed(e)))
+                else:
+                    state.succeeded()
+                    return res
+        delay = 1
+        retry = self.retry
+        retries = 0
+        while retry:
+            try:
+                return await self._handle_response(
+                    req, uri, arg_data, _timeout, retries)
+            except TwitterTimeoutError:
+                raise
+            except TwitterError as e:
+                retries += 1
+                retry, wait, delay = self._retry_wait(e, retry, delay)
+                await asyncio.sleep(self._wait_before_retry(req, uri, wait))
+
+
+class AsyncTwitter(AsyncTwitterCall):
+    """
+    The asyncio version of the `Twitter` class: API calls return
+    awaitables instead of blocking. See `twitter.aio` for examples.
+    """
+
+    def __init__(
+            self, format="json",
+            domain="api.twitter.com", secure=True, auth=None,
+            api_version=_DEFAULT, retry=False, verify_context=True,
+            max_connections=100, rate_limit=False, cache=None, raw=False,
+            json_backend=None, model=False, deadline=None, hooks=None):
+        """
+        Create a new asyncio twitter API connector.
+
+        The arguments are the same as for `Twitter` (rate limit waits
+        don't block the event loop). The traces given to the `hooks`
+        have no connection phases: their `body` phase covers the whole
+        exchange with the server. `max_connections` bounds the number
+        of requests in flight at the same time; the connections are kept
+        alive and shared by all the calls made through this object. Call
+        `close()` when you are done with it.
+        """
+        if not auth:
+            auth = NoAuth()
+
+        if (format not in ("json", "xml", "")):
+            raise ValueError("Unknown data format '%s'" % (format))
+
+        if api_version is _DEFAULT:
+            api_version = '1.1'
+
+        uriparts = ()
+        if api_version:
+            uriparts += (str(api_version),)
+
+        if rate_limit is True:
+            rate_limit = RateLimitScheduler()
+
+        if cache is True:
+            cache = ResponseCache()
+
+        TwitterCall.__init__(
+            self, auth=auth, format=format, domain=domain,
+            callable_cls=AsyncTwitterCall,
+            secure=secure, uriparts=uriparts, retry=retry,
+            verify_context=verify_context,
+            transport=AsyncConnectionPool(max_connections),
+            rate_limit=rate_limit or None, cache=cache or None, raw=raw,
+            json_backend=json_backend, model=model, deadline=deadline,
+            hooks=hooks)
+
+    async def close(self):
+        """Close the idle connections of this object."""
+        await self.transport.close()
+
+
+async def _iter_stream(handle, block, timeout, heartbeat_timeout, json_backend=None):
+    timeout_token = Timeout
+    if timeout and timeout > 0:
+        timeout = float(timeout)
+    elif not (block or timeout):
+        timeout_token = None
+        timeout = MIN_SOCK_TIMEOUT
+    else:
+        timeout = None
+    if heartbeat_timeout and heartbeat_timeout > 0:
+        heartbeat_timeout = float(heartbeat_timeout)
+    else:
+        heartbeat_timeout = HEARTBEAT_TIMEOUT
+    sock_timeout = min(t for t in (timeout, heartbeat_timeout, MAX_SOCK_TIMEOUT)
+                       if t is not None)
+
+    headers = handle.headers
+    chunk_decoder = HttpChunkDecoder() if handle.chunked else None
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    json_decoder = JsonDecoder(json_backend)
+    timer = Timer(timeout)
+    heartbeat_timer = Timer(heartbeat_timeout)
+
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    handle.reader.read(READ_SIZE), sock_timeout)
+            except asyncio.TimeoutError:
+                data = b''
+            except OSError:
+                yield Hangup
+                break
+            if not data and handle.reader.at_eof():
+                yield Hangup
+                break
+            if chunk_decoder is not None:
+                dechunked_data, end_of_stream, decode_error = chunk_decoder.decode(data)
+            else:
+                dechunked_data, end_of_stream, decode_error = data, False, False
+            unicode_data = utf8_decoder.decode(dechunked_data)
+            json_data = json_decoder.decode(unicode_data)
+
+            for json_obj in json_data:
+                yield wrap_response(json_obj, headers)
+
+            if dechunked_data:
+                heartbeat_timer.reset()
+            if json_data:
+                timer.reset()
+
+            if end_of_stream:
+                yield Hangup
+                break
+            if decode_error:
+                yield DecodeError
+                break
+            if heartbeat_timer.expired():
+                yield HeartbeatTimeout
+                break
+            if timer.expired():
+                yield timeout_token
+    finally:
+        handle.close()
+
+
+class AsyncTwitterStream(AsyncTwitterCall):
+    """
+    The asyncio version of the `TwitterStream` class. Awaiting a call
+    opens the stream and returns an asynchronous iterator yielding the
+    same objects and special tokens (hangup, timeout...) as
+    `TwitterStream` does.
+    """
+
+    def __init__(self, domain="stream.twitter.com", secure=True, auth=None,
+                 api_version='1.1', block=True, timeout=None,
+                 heartbeat_timeout=90.0, verify_context=True, json_backend=None):
+        uriparts = (str(api_version),)
+
+        class AsyncTwitterStreamCall(AsyncTwitterCall):
+            async def _handle_response(self, req, uri, arg_data, _timeout=None,
+                                       _retries=0):
+                try:
+                    handle = await self.transport.open_stream(
+                        req, ssl_context(self.verify_context))
+                except urllib_error.HTTPError as e:
+                    raise TwitterHTTPError(e, uri, 'json', arg_data)
+                return _iter_stream(
+                    handle, block, _timeout or timeout, heartbeat_timeout,
+                    self.json_backend)
+
+        TwitterCall.__init__(
+            self, auth=auth, format="json", domain=domain,
+            callable_cls=AsyncTwitterStreamCall,
+            secure=secure, uriparts=uriparts, timeout=timeout, gzip=False,
+            retry=False, verify_context=verify_context,
+            transport=AsyncConnectionPool(), json_backend=json_backend)
+
+__all__ = ["AsyncTwitter", "AsyncTwitterStream"]
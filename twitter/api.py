@@ -4,21 +4,10 @@ from __future__ import unicode_literals, print_function
 from .util import PY_3_OR_HIGHER, actually_bytes
 
 try:
-    import ssl
-except ImportError:
-    _HAVE_SSL = False
-else:
-    _HAVE_SSL = True
-
-try:
-    import urllib.request as urllib_request
     import urllib.error as urllib_error
 except ImportError:
-    import urllib2 as urllib_request
     import urllib2 as urllib_error
 
-import certifi
-
 try:
     from cStringIO import StringIO
 except ImportError:
@@ -26,10 +15,22 @@ except ImportError:
 
 from .twitter_globals import POST_ACTIONS
 from .auth import NoAuth
-
+from .credentials import CredentialPool
+from .connection import ConnectionPool, ssl_context
+from .ratelimit import RateLimitScheduler
+from .cache import ResponseCache
+from .json_backend import get_backend
+from .multipart import MultipartBody
+from .singleflight import FlightTimeout, SingleFlight
+from .transport import URLLIB, Request
+from .trace import RequestTrace, as_hooks, body_length, clock, notify
+
+import copy
 import re
+import socket
 import sys
 import gzip
+import zlib
 from time import sleep, time
 
 try:
@@ -42,11 +43,6 @@ try:
 except ImportError:
     import simplejson as json
 
-try:
-    from json.decoder import JSONDecodeError
-except ImportError:
-    JSONDecodeError = ValueError
-
 
 class _DEFAULT(object):
     pass
@@ -103,6 +99,49 @@ class TwitterHTTPError(TwitterError):
                     self.response_data))
 
 
+class TwitterTimeoutError(TwitterError):
+    """
+    Exception raised when a call can't be completed before its deadline
+    (see the `deadline` parameter of `Twitter`).
+    """
+
+    def __init__(self, uri, deadline):
+        self.uri = uri
+        self.deadline = deadline
+        super(TwitterTimeoutError, self).__init__(
+            "Deadline exceeded for URL: %s" % (uri,))
+
+
+def time_left(req, uri=None):
+    """
+    Return the number of seconds left before the deadline of req, None
+    if it has none, or raise a TwitterTimeoutError if it is past.
+    """
+    deadline = getattr(req, 'deadline', None)
+    if deadline is None:
+        return None
+    left = deadline - time()
+    if left <= 0:
+        raise TwitterTimeoutError(uri, deadline)
+    return left
+
+
+def release_booking(req):
+    """
+    Give back the call booked for req with a `CredentialPool` when it
+    isn't sent (see `twitter.credentials.Booking`).
+    """
+    booking = getattr(req, 'rate_limit', None)
+    if booking is not None:
+        booking.release()
+
+
+def _is_timeout(e):
+    if isinstance(e, urllib_error.URLError):
+        e = e.reason
+    return isinstance(e, socket.timeout)
+
+
 class TwitterResponse(object):
     """
     Response from a twitter request. Behaves like a list or a string
@@ -114,6 +153,8 @@ class TwitterResponse(object):
     `response.headers.get('h')` to retrieve a header.
     """
 
+    __slots__ = ()
+
     @property
     def rate_limit_remaining(self):
         """
@@ -144,6 +185,20 @@ class TwitterListResponse(list, TwitterResponse):
     pass
 
 
+class TwitterRawResponse(bytes, TwitterResponse):
+    """
+    Undecoded body of a response, returned by calls made in raw mode.
+    It is still gzipped when the `Content-Encoding` header says so.
+    """
+    pass
+
+
+def wrap_raw_response(body, headers):
+    res = TwitterRawResponse(body)
+    res.headers = headers
+    return res
+
+
 def wrap_response(response, headers):
     response_typ = type(response)
     if response_typ is dict:
@@ -152,6 +207,9 @@ def wrap_response(response, headers):
     elif response_typ is list:
         res = TwitterListResponse(response)
         res.headers = headers
+    elif isinstance(response, TwitterResponse):
+        res = response
+        res.headers = headers
     else:
         res = response
     return res
@@ -190,12 +248,175 @@ def build_uri(orig_uriparts, kwargs):
     return uri
 
 
+class Route(object):
+    """
+    What a call to an endpoint needs from its uriparts and settings,
+    worked out once: the URL prefix and suffix, the HTTP method and the
+    position of the `_`-prefixed placeholders.
+    """
+
+    def __init__(self, secure, domain, format, uriparts):
+        self.uriparts = uriparts
+        self.placeholders = any(part.startswith("_") for part in uriparts)
+        self.path = '/'.join(uriparts)
+        self.prefix = "http%s://%s/" % ('s' if secure else '', domain)
+        self.suffix = '.' + format if format else ''
+        self.method = method_for_uri(self.path)
+        self.metadata = "media/metadata/create" in self.path
+
+    def resolve(self, kwargs):
+        """
+        Return the URI, default method and whether the call is a media
+        metadata one. Like `build_uri`, modifies kwargs.
+        """
+        if self.placeholders:
+            uri = build_uri(self.uriparts, kwargs)
+            return uri, method_for_uri(uri), "media/metadata/create" in uri
+        id = kwargs.pop('id', None)
+        if not id:
+            return self.path, self.method, self.metadata
+        uri = "%s/%s" % (self.path, id)
+        # a numeric id never changes the method, see POST_ACTIONS_RE
+        if str(id).isdigit():
+            return uri, self.method, self.metadata
+        return uri, method_for_uri(uri), "media/metadata/create" in uri
+
+
+MAX_ROUTES = 10000
+_routes = {}
+
+
+def route_for(secure, domain, format, uriparts):
+    key = (secure, domain, format, uriparts)
+    route = _routes.get(key)
+    if route is None:
+        if len(_routes) >= MAX_ROUTES:
+            # dynamic uriparts could otherwise make it grow forever
+            _routes.clear()
+        route = _routes[key] = Route(secure, domain, format, uriparts)
+    return route
+
+
+READ_SIZE = 65536
+
+
+def _body_reader(handle, deadline):
+    """
+    The method reading the chunks of the body of `handle`: read1() when
+    there is a deadline and it has one, as a buffered read() may wait
+    for a whole chunk of a slowly sent body before the deadline is
+    checked again.
+    """
+    if deadline is None:
+        return handle.read
+    return getattr(handle, 'read1', None) or handle.read
+
+
+def read_body(handle, trace=None, deadline=None):
+    """
+    Read the body of a response into a single bytearray, decompressing
+    it on the fly when it is gzipped, so that neither the compressed
+    body nor intermediate copies of it are ever held in memory. The
+    time spent goes to the `body` and `decompress` phases of `trace`.
+    A socket.timeout is raised if the `deadline` (a `time()`) passes,
+    an IncompleteRead if the gzipped body is cut short.
+    """
+    if handle.headers.get('Content-Encoding') == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompress = decompressor.decompress
+    else:
+        decompressor = decompress = None
+    if trace is not None:
+        start = clock()
+        if decompress is not None:
+            decompress = trace.timed_decompress(decompress)
+    read = _body_reader(handle, deadline)
+    body = bytearray()
+    while True:
+        try:
+            chunk = read(READ_SIZE)
+        except http_client.IncompleteRead as e:
+            # Even if we don't get all the bytes we should have there
+            # may be a complete response in e.partial
+            chunk = e.partial
+            if chunk:
+                body += decompress(chunk) if decompress else chunk
+            break
+        if not chunk:
+            break
+        body += decompress(chunk) if decompress else chunk
+        if deadline is not None and time() > deadline:
+            raise socket.timeout("deadline exceeded while reading")
+    if decompressor is not None:
+        body += decompressor.flush()
+        # zlib objects have no eof attribute before Python 3.3
+        if not getattr(decompressor, 'eof', True):
+            raise http_client.IncompleteRead(bytes(body))
+    if trace is not None:
+        trace.body = clock() - start - (trace.decompress or 0)
+        if decompress is None:
+            trace.bytes_in = len(body)
+    return body
+
+
+def read_raw_body(handle, deadline=None):
+    """
+    Read the body of a response as it was sent. A socket.timeout is
+    raised if the `deadline` (a `time()`) passes.
+    """
+    if deadline is None:
+        try:
+            return handle.read()
+        except http_client.IncompleteRead as e:
+            return e.partial
+    read = _body_reader(handle, deadline)
+    body = bytearray()
+    while True:
+        try:
+            chunk = read(READ_SIZE)
+        except http_client.IncompleteRead as e:
+            body += e.partial
+            break
+        if not chunk:
+            break
+        body += chunk
+        if time() > deadline:
+            raise socket.timeout("deadline exceeded while reading")
+    return bytes(body)
+
+
+def decompress_body(data, headers):
+    """
+    Return the body data of a response, decompressed if it was gzipped.
+    """
+    if headers.get('Content-Encoding') == 'gzip':
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+
+VERSION_RE = re.compile(r'\d+(\.\d+)?$')
+
+
+def endpoint_template(uriparts):
+    """
+    Name the endpoint called through uriparts, without the API version
+    and before any interpolation, e.g. "statuses/user_timeline".
+    """
+    uriparts = tuple(str(part) for part in uriparts)
+    if uriparts and VERSION_RE.match(uriparts[0]):
+        uriparts = uriparts[1:]
+    return '/'.join(uriparts)
+
+
 class TwitterCall(object):
     TWITTER_UNAVAILABLE_WAIT = 30  # delay after HTTP codes 502, 503 or 504
 
     def __init__(
             self, auth, format, domain, callable_cls, uri="",
-            uriparts=None, secure=True, timeout=None, gzip=False, retry=False, verify_context=True):
+            uriparts=None, secure=True, timeout=None, gzip=False, retry=False, verify_context=True,
+            transport=None, rate_limit=None, cache=None, raw=False,
+            json_backend=None, model=False, hooks=(), single_flight=None,
+            deadline=None):
         self.auth = auth
         self.format = format
         self.domain = domain
@@ -207,6 +428,15 @@ class TwitterCall(object):
         self.gzip = gzip
         self.retry = retry
         self.verify_context = verify_context
+        self.transport = transport
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.raw = raw
+        self.json_backend = get_backend(json_backend)
+        self.model = model
+        self.hooks = as_hooks(hooks)
+        self.single_flight = single_flight
+        self.deadline = deadline
 
     def __getattr__(self, k):
 
@@ -219,24 +449,59 @@ class TwitterCall(object):
         if k.startswith('__'):
             raise AttributeError
 
-        def extend_call(arg):
-            return self.callable_cls(
-                auth=self.auth, format=self.format, domain=self.domain,
-                callable_cls=self.callable_cls, timeout=self.timeout,
-                secure=self.secure, gzip=self.gzip, retry=self.retry,
-                uriparts=self.uriparts + (arg,), verify_context=self.verify_context)
-
         if k == "_":
-            return extend_call
-        else:
-            return extend_call(k)
+            return self._extend_call
+
+        # Keep the child in the instance dict: the next access to it finds
+        # it there without calling __getattr__ nor building it again.
+        child = self._extend_call(k)
+        self.__dict__[k] = child
+        self.__dict__.setdefault('_children', []).append(k)
+        return child
+
+    def _extend_call(self, arg):
+        return self.callable_cls(
+            auth=self.auth, format=self.format, domain=self.domain,
+            callable_cls=self.callable_cls, timeout=self.timeout,
+            secure=self.secure, gzip=self.gzip, retry=self.retry,
+            uriparts=self.uriparts + (arg,), verify_context=self.verify_context,
+            transport=self.transport, rate_limit=self.rate_limit,
+            cache=self.cache,
+            raw=self.raw, json_backend=self.json_backend,
+            model=self.model, hooks=self.hooks,
+            single_flight=self.single_flight, deadline=self.deadline)
+
+    def __setattr__(self, k, v):
+        # The memoized children copied the former settings: forget them.
+        children = self.__dict__.get('_children')
+        if children:
+            for name in children:
+                self.__dict__.pop(name, None)
+            # a new list: copies of this object share the old one
+            self.__dict__['_children'] = []
+        object.__setattr__(self, k, v)
+
+    def __getstate__(self):
+        children = self.__dict__.get('_children') or ()
+        return dict(
+            (k, v) for k, v in self.__dict__.items()
+            if k != '_children' and k not in children)
 
     def __call__(self, **kwargs):
         kwargs = dict(kwargs)
-        uri = build_uri(self.uriparts, kwargs)
+
+        # An _raw argument switches raw mode on or off for this call only
+        _raw = kwargs.pop('_raw', None)
+        if _raw is not None and bool(_raw) != self.raw:
+            call = copy.copy(self)
+            call.raw = bool(_raw)
+            return call(**kwargs)
+
+        route = route_for(self.secure, self.domain, self.format, self.uriparts)
+        uri, default_method, metadata = route.resolve(kwargs)
 
         # Shortcut call arguments for special json arguments case
-        if "media/metadata/create" in uri:
+        if metadata:
             media_id = kwargs.pop('media_id', None)
             alt_text = kwargs.pop('alt_text', kwargs.pop('text', None))
             if media_id and alt_text:
@@ -246,8 +511,7 @@ class TwitterCall(object):
                 }
                 return self.__call__(_json=jsondata, **kwargs)
 
-        method = kwargs.pop('_method', None) or method_for_uri(uri)
-        domain = self.domain
+        method = kwargs.pop('_method', None) or default_method
 
         # If an _id kwarg is present, this is treated as id as a CGI
         # param.
@@ -258,14 +522,11 @@ class TwitterCall(object):
         # If an _timeout is specified in kwargs, use it
         _timeout = kwargs.pop('_timeout', None)
 
-        secure_str = ''
-        if self.secure:
-            secure_str = 's'
-        dot = ""
-        if self.format:
-            dot = "."
-        url_base = "http%s://%s/%s%s%s" % (
-            secure_str, domain, uri, dot, self.format)
+        # The whole call, retries included, must be over within
+        # _deadline seconds
+        _deadline = kwargs.pop('_deadline', None) or self.deadline
+
+        url_base = route.prefix + uri + route.suffix
 
         # Check if argument tells whether img is already base64 encoded
         b64_convert = not kwargs.pop("_base64", False)
@@ -281,8 +542,6 @@ class TwitterCall(object):
         elif 'media[]' in kwargs:
             mediafield = 'media[]'
             media = kwargs.pop('media[]')
-            if b64_convert:
-                media = base64.b64encode(media)
             media_raw = False
 
         # Catch media arguments that are not accepted through multipart
@@ -305,149 +564,317 @@ class TwitterCall(object):
             body = actually_bytes(json.dumps(jsondata))
             headers['Content-Type'] = 'application/json; charset=UTF-8'
 
-        if self.auth:
-            headers.update(self.auth.generate_headers())
+        # Identical GET calls running at the same time share one request,
+        # whatever their OAuth nonce and signature
+        flight_key = None
+        if (self.single_flight is not None and method == 'GET'
+                and media is None and not jsondata):
+            flight_key = (
+                self.auth, url_base, self.raw, self.model, _timeout,
+                tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+        # A CredentialPool signs each call with the credential with the
+        # most headroom, and books it with that credential's rate limit
+        auth = self.auth
+        rate_limit = None
+        if isinstance(auth, CredentialPool):
+            auth, rate_limit = auth.choose(endpoint_template(self.uriparts))
+
+        if auth:
+            headers.update(auth.generate_headers())
             # Use urlencoded oauth args with no params when sending media
             # via multipart and send it directly via uri even for post
-            url_args = {} if media or jsondata else kwargs
+            url_args = {} if media is not None or jsondata else kwargs
             if method == "PUT" and _id:
                 # the two PUT method APIs both require uri id parameter
                 url_args['id'] = _id
-            arg_data = self.auth.encode_params(
+            arg_data = auth.encode_params(
                 url_base, method, url_args)
-            if method == 'GET' or media or jsondata:
+            if method == 'GET' or media is not None or jsondata:
                 url_base += '?' + arg_data
             else:
                 body = arg_data.encode('utf-8')
 
-        # Handle query as multipart when sending media
-        if media:
-            BOUNDARY = b"###Python-Twitter###"
-            bod = []
-            bod.append(b'--' + BOUNDARY)
-            bod.append(
-                b'Content-Disposition: form-data; name="'
-                + actually_bytes(mediafield)
-                + b'"')
-            bod.append(b'Content-Type: application/octet-stream')
-            if not media_raw:
-                bod.append(b'Content-Transfer-Encoding: base64')
-            bod.append(b'')
-            bod.append(actually_bytes(media))
+        # Handle query as multipart when sending media, which is read
+        # and sent block by block
+        if media is not None:
+            body = MultipartBody()
+            body.add_media(
+                mediafield, media,
+                encode_base64=not media_raw and b64_convert,
+                base64_encoded=not media_raw)
             for k, v in kwargs.items():
-                k = actually_bytes(k)
-                v = actually_bytes(v)
-                bod.append(b'--' + BOUNDARY)
-                bod.append(b'Content-Disposition: form-data; name="' + k + b'"')
-                bod.append(b'Content-Type: text/plain;charset=utf-8')
-                bod.append(b'')
-                bod.append(v)
-            bod.append(b'--' + BOUNDARY + b'--')
-            bod.append(b'')
-            bod.append(b'')
-            body = b'\r\n'.join(bod)
-            # print(body.decode('utf-8', errors='ignore'))
-            headers['Content-Type'] = \
-                b'multipart/form-data; boundary=' + BOUNDARY
+                body.add_field(k, v)
+            headers['Content-Type'] = body.content_type
+            headers['Content-Length'] = str(len(body))
 
             if not PY_3_OR_HIGHER:
+                # httplib can't send an iterable body
+                body = b''.join(body)
                 url_base = url_base.encode("utf-8")
                 for k in headers:
                     headers[actually_bytes(k)] = actually_bytes(headers.pop(k))
 
-        req = urllib_request.Request(url_base, data=body, headers=headers)
-        # Horrible hack, the python2/urllib2 version of request doesn't
-        # take a method parameter, but we can overwrite the class
-        # get_method() function to a lambda function that always returns
-        # the method we want...
-        # https://stackoverflow.com/questions/111945/is-there-any-way-to-do-http-put-in-python/111988#111988
         if not PY_3_OR_HIGHER:
             method = method.encode('utf-8')
-        req.get_method = lambda: method
+        req = Request(url_base, data=body, headers=headers, method=method)
+        req.deadline = time() + _deadline if _deadline else None
+        req.rate_limit = rate_limit
 
         if self.retry:
-            return self._handle_response_with_retry(req, uri, arg_data, _timeout)
+            send = self._handle_response_with_retry
         else:
-            return self._handle_response(req, uri, arg_data, _timeout)
+            send = self._handle_response
+        if flight_key is not None:
+            try:
+                return self.single_flight.do(
+                    flight_key, send, req, uri, arg_data, _timeout,
+                    deadline=req.deadline)
+            except FlightTimeout:
+                raise TwitterTimeoutError(uri, req.deadline)
+            finally:
+                # not sent when another identical call answered it
+                release_booking(req)
+        return send(req, uri, arg_data, _timeout)
+
+    def iter_pages(self, _max_pages=None, _prefetch=True, **kwargs):
+        """
+        Call this endpoint with `kwargs` and yield its pages of results,
+        following its `cursor` or `max_id`. See `twitter.paginate`.
+        """
+        from .paginate import iter_pages
+        return iter_pages(self, kwargs, _max_pages, _prefetch)
+
+    def paginate(self, _max_items=None, _max_pages=None, _prefetch=True,
+                 **kwargs):
+        """
+        Call this endpoint with `kwargs` and yield the items of all its
+        pages of results, once each. See `twitter.paginate`.
+        """
+        from .paginate import paginate
+        return paginate(self, kwargs, _max_items, _max_pages, _prefetch)
 
-    def _handle_response(self, req, uri, arg_data, _timeout=None):
-        kwargs = {}
-        if _timeout:
-            kwargs['timeout'] = _timeout
+    def _open(self, req, _timeout=None, context=None, trace=None):
+        """
+        Send the request with the transport, urllib if there is none.
+        """
+        transport = self.transport if self.transport is not None else URLLIB
+        return transport.urlopen(
+            req, timeout=_timeout, context=context, trace=trace)
+
+    def _cache_lookup(self, req):
+        """
+        Return the cache key and TTL of req, and its cached response if
+        there is one. The key is None when req isn't to be cached.
+        """
+        if self.cache is None or req.get_method() != 'GET':
+            return None, None, None
+        ttl = self.cache.ttl_for(endpoint_template(self.uriparts))
+        if not ttl:
+            return None, None, None
+        key = self.cache.key(req)
+        return key, ttl, self.cache.get(key)
+
+    def _handle_response(self, req, uri, arg_data, _timeout=None, _retries=0):
+        cache_key, cache_ttl, cached = self._cache_lookup(req)
+        if cached is not None:
+            release_booking(req)
+            return self._decode_body(
+                cached.body, cached.headers, uri, arg_data)
         try:
-            context = None
-            if _HAVE_SSL:
-                if not self.verify_context:
-                    context = ssl._create_unverified_context()
-                else:
-                    context = ssl.create_default_context()
-                    context.load_verify_locations(cafile=certifi.where())
-            kwargs['context'] = context
-            handle = urllib_request.urlopen(req, **kwargs)
+            time_left(req, uri)
+        except TwitterTimeoutError:
+            release_booking(req)
+            raise
+        if not self.hooks:
+            return self._request(
+                req, uri, arg_data, _timeout, cache_key, cache_ttl)
+        return self._traced(
+            self._request, req, _retries,
+            uri, arg_data, _timeout, cache_key, cache_ttl)
+
+    def _traced(self, send, req, retries, *args):
+        """
+        Return send(req, *args, trace=trace), then hand the trace of the
+        request to the hooks.
+        """
+        trace = RequestTrace(
+            endpoint_template(self.uriparts), req.get_method(), retries,
+            body_length(req.data))
+        notify(self.hooks, 'request_started', trace)
+        try:
+            return send(req, *args, trace=trace)
+        except Exception as e:
+            trace.error = e
+            raise
+        finally:
+            trace.done()
+            for hook in self.hooks:
+                hook(trace)
+
+    def _request(self, req, uri, arg_data, _timeout=None, cache_key=None,
+                 cache_ttl=None, trace=None):
+        """
+        Send the request and return the decoded response, storing it in
+        the cache under `cache_key` for `cache_ttl` seconds if given.
+        """
+        deadline = getattr(req, 'deadline', None)
+        rate_limit = getattr(req, 'rate_limit', None) or self.rate_limit
+        if rate_limit is not None:
+            family = endpoint_template(self.uriparts)
+            if not rate_limit.acquire(family, deadline):
+                raise TwitterTimeoutError(uri, deadline)
+        if deadline is not None:
+            left = time_left(req, uri)
+            _timeout = min(_timeout, left) if _timeout else left
+        try:
+            handle = self._open(
+                req, _timeout, ssl_context(self.verify_context), trace)
+            if rate_limit is not None:
+                rate_limit.update(family, handle.headers)
+            if trace is not None:
+                trace.response(handle.getcode(), handle.headers)
             if handle.headers['Content-Type'] in ['image/jpeg', 'image/png']:
                 return handle
-            try:
-                data = handle.read()
-            except http_client.IncompleteRead as e:
-                # Even if we don't get all the bytes we should have there
-                # may be a complete response in e.partial
-                data = e.partial
-            if handle.info().get('Content-Encoding') == 'gzip':
-                # Handle gzip decompression
-                buf = StringIO(data)
-                f = gzip.GzipFile(fileobj=buf)
-                data = f.read()
-            if len(data) == 0:
-                return wrap_response({}, handle.headers)
-            elif "json" == self.format:
-                try:
-                    res = json.loads(data.decode('utf8'))
-                except JSONDecodeError as e:
-                    # it seems like the data received was incomplete
-                    # and we should catch it to allow retries
-                    raise TwitterError("Incomplete JSON data collected for %s (%s): %s)" % (uri, arg_data, e))
-                return wrap_response(res, handle.headers)
+            if self.raw:
+                start = clock()
+                data = read_raw_body(handle, deadline)
+                if trace is not None:
+                    trace.body = clock() - start
+                    trace.bytes_in = len(data)
+                if cache_key is not None:
+                    self.cache.set(
+                        cache_key, decompress_body(data, handle.headers),
+                        handle.headers, cache_ttl)
+                return wrap_raw_response(data, handle.headers)
+            body = read_body(handle, trace, deadline)
+            if trace is None:
+                res = self._decode_body(body, handle.headers, uri, arg_data)
             else:
-                return wrap_response(
-                    data.decode('utf8'), handle.headers)
+                start = clock()
+                res = self._decode_body(body, handle.headers, uri, arg_data)
+                trace.decode = clock() - start
+            if cache_key is not None:
+                self.cache.set(cache_key, bytes(body), handle.headers, cache_ttl)
+            return res
         except urllib_error.HTTPError as e:
+            if rate_limit is not None:
+                rate_limit.update(family, e.headers)
+            if trace is not None:
+                trace.response(e.code, e.headers)
             if (e.code == 304):
-                return []
+                return wrap_raw_response(b'', e.headers) if self.raw else []
             else:
                 raise TwitterHTTPError(e, uri, self.format, arg_data)
+        except (urllib_error.URLError, socket.timeout) as e:
+            if deadline is not None and _is_timeout(e):
+                raise TwitterTimeoutError(uri, deadline)
+            raise
+
+    def _decode_body(self, body, headers, uri, arg_data):
+        """
+        Turn the decompressed body of a successful response into the
+        returned object.
+        """
+        if self.raw:
+            return wrap_raw_response(body, headers)
+        if len(body) == 0:
+            return wrap_response({}, headers)
+        elif "json" == self.format:
+            try:
+                if self.model:
+                    from .models import loads
+                    res = loads(body)
+                else:
+                    res = self.json_backend.loads(body)
+            except ValueError as e:
+                # it seems like the data received was incomplete
+                # and we should catch it to allow retries
+                raise TwitterError("Incomplete JSON data collected for %s (%s): %s)" % (uri, arg_data, e))
+            return wrap_response(res, headers)
+        else:
+            return wrap_response(
+                body.decode('utf8'), headers)
 
     def _handle_response_with_retry(self, req, uri, arg_data, _timeout=None):
+        if not isinstance(self.retry, (bool, int)):
+            return self._handle_response_with_policy(
+                req, uri, arg_data, _timeout)
         delay = 1
         retry = self.retry
+        retries = 0
         while retry:
             try:
-                return self._handle_response(req, uri, arg_data, _timeout)
-            except TwitterHTTPError as e:
-                if e.e.code == 429:
-                    # API rate limit reached
-                    reset = int(e.e.headers.get('X-Rate-Limit-Reset', time() + 30))
-                    delay = int(reset - time() + 2)  # add some extra margin
-                    if delay <= 0:
-                        delay = self.TWITTER_UNAVAILABLE_WAIT
-                    print("API rate limit reached; waiting for %ds..." % delay, file=sys.stderr)
-                elif e.e.code in (502, 503, 504):
+                return self._handle_response(
+                    req, uri, arg_data, _timeout, retries)
+            except TwitterTimeoutError:
+                raise
+            except TwitterError as e:
+                retries += 1
+                retry, wait, delay = self._retry_wait(e, retry, delay)
+                sleep(self._wait_before_retry(req, uri, wait))
+
+    def _handle_response_with_policy(self, req, uri, arg_data, _timeout=None):
+        """Retry as the `twitter.retry.RetryPolicy` in self.retry says."""
+        state = self.retry.start(self.domain, req.get_method())
+        while True:
+            try:
+                state.check()
+            except TwitterError:
+                # CircuitOpenError: not sent
+                release_booking(req)
+                raise
+            try:
+                res = self._handle_response(
+                    req, uri, arg_data, _timeout, state.retries)
+            except TwitterTimeoutError:
+                raise
+            except (TwitterError, IOError) as e:
+                sleep(self._wait_before_retry(req, uri, state.failed(e)))
+            else:
+                state.succeeded()
+                return res
+
+    def _wait_before_retry(self, req, uri, wait):
+        """
+        Return wait, the time to wait before trying req again, or raise
+        a TwitterTimeoutError if its deadline would be past by then.
+        """
+        left = time_left(req, uri)
+        if left is not None and wait >= left:
+            raise TwitterTimeoutError(uri, req.deadline)
+        return wait
+
+    def _retry_wait(self, e, retry, delay):
+        """
+        Decide what to do after the TwitterError e, raised while handling
+        it. Re-raise it if the call can't be retried, otherwise return the
+        retries left, the time to wait and the delay to use next time.
+        """
+        if isinstance(e, TwitterHTTPError):
+            if e.e.code == 429:
+                # API rate limit reached
+                reset = int(e.e.headers.get('X-Rate-Limit-Reset', time() + 30))
+                delay = int(reset - time() + 2)  # add some extra margin
+                if delay <= 0:
                     delay = self.TWITTER_UNAVAILABLE_WAIT
-                    print("Service unavailable; waiting for %ds..." % delay, file=sys.stderr)
-                else:
+                print("API rate limit reached; waiting for %ds..." % delay, file=sys.stderr)
+            elif e.e.code in (502, 503, 504):
+                delay = self.TWITTER_UNAVAILABLE_WAIT
+                print("Service unavailable; waiting for %ds..." % delay, file=sys.stderr)
+            else:
+                raise
+            if isinstance(retry, int) and not isinstance(retry, bool):
+                if retry <= 0:
                     raise
-                if isinstance(retry, int) and not isinstance(retry, bool):
-                    if retry <= 0:
-                        raise
-                    retry -= 1
-                sleep(delay)
-            except TwitterError as e:
-                if isinstance(retry, int) and not isinstance(retry, bool):
-                    if retry <= 0:
-                        raise
-                    retry -= 1
-                print("There was a problem dialoguing with the API; waiting for %ds..." % delay, file=sys.stderr)
-                sleep(delay)
-                delay *= 2
+                retry -= 1
+            return retry, delay, delay
+        if isinstance(retry, int) and not isinstance(retry, bool):
+            if retry <= 0:
+                raise
+            retry -= 1
+        print("There was a problem dialoguing with the API; waiting for %ds..." % delay, file=sys.stderr)
+        return retry, delay, delay * 2
 
 
 class Twitter(TwitterCall):
@@ -504,6 +931,13 @@ class Twitter(TwitterCall):
             screen_name=','.join(A_LIST_OF_100_SCREEN_NAMES), \
             _timeout=1)
 
+        # Run many calls concurrently, the results come back in order
+        # with either a response or the error raised by each call:
+        batch = t.batch(max_concurrency=8)
+        for name in A_LIST_OF_SCREEN_NAMES:
+            batch.users.show(screen_name=name)
+        users = [res.response for res in batch.execute() if res.ok]
+
         # Overriding Method: GET/POST
         # you should not need to use this method as this library properly
         # detects whether GET or POST should be used, Nevertheless
@@ -520,6 +954,10 @@ class Twitter(TwitterCall):
             auth=OAuth(token, token_secret, consumer_key, consumer_secret))
         id_img1 = t_upload.media.upload(media=imagedata)["media_id_string"]
         id_img2 = t_upload.media.upload(media=imagedata)["media_id_string"]
+        # - media can also be a file object or a pathlib.Path, read as it
+        #   is sent:
+        with open("example.gif", "rb") as imagefile:
+            id_img3 = t_upload.media.upload(media=imagefile)["media_id_string"]
 
         # - finally send your tweet with the list of media ids:
         t.statuses.update(status="PTT ★", media_ids=",".join([id_img1, id_img2]))
@@ -578,7 +1016,10 @@ class Twitter(TwitterCall):
     def __init__(
             self, format="json",
             domain="api.twitter.com", secure=True, auth=None,
-            api_version=_DEFAULT, retry=False, verify_context=True):
+            api_version=_DEFAULT, retry=False, verify_context=True,
+            keep_alive=False, rate_limit=False, cache=None, raw=False,
+            json_backend=None, model=False, hooks=None, single_flight=False,
+            deadline=None, transport=None):
         """
         Create a new twitter API connector.
 
@@ -589,6 +1030,9 @@ class Twitter(TwitterCall):
             twitter = Twitter(auth=OAuth(
                     token, token_secret, consumer_key, consumer_secret))
 
+        Pass a `twitter.credentials.CredentialPool` to spread the calls
+        over several credentials, by the calls each has left.
+
 
         `domain` lets you change the domain you are connecting. By
         default it's `api.twitter.com`.
@@ -602,7 +1046,70 @@ class Twitter(TwitterCall):
         If `retry` is True, API rate limits will automatically be
         handled by waiting until the next reset, as indicated by
         the X-Rate-Limit-Reset HTTP header. If retry is an integer,
-        it defines the number of retries attempted.
+        it defines the number of retries attempted. Pass a
+        `twitter.retry.RetryPolicy` for jittered backoff, retry budgets
+        and circuit breakers.
+
+        If `keep_alive` is True, connections to the API servers are kept
+        open and reused by the following calls instead of doing a new
+        TCP and TLS handshake for each one. All the calls made through
+        this object share the same `twitter.connection.ConnectionPool`;
+        you can also pass your own pool instance to tune it or to share
+        it between several Twitter objects.
+
+        `transport` sends the requests instead of `urlopen` or the pool
+        of `keep_alive`, e.g. a `twitter.transport.MemoryTransport`
+        answering canned responses. See `twitter.transport`.
+
+        If `rate_limit` is True, the X-Rate-Limit-* headers of every
+        response are tracked per endpoint and calls wait for the next
+        rate limit window when the current one is exhausted, rather than
+        getting a 429 error. Pass a `twitter.ratelimit.RateLimitScheduler`
+        to tune it or to share it between Twitter objects using the same
+        credentials.
+
+        If `cache` is True, the responses of a few idempotent GET
+        endpoints which are called again and again (users/show,
+        lists/list, trends/place...) are reused for a few minutes rather
+        than requested again. Pass a `twitter.cache.ResponseCache` to
+        choose the endpoints, their TTL and the storage (memory or disk).
+
+        If `raw` is True, calls return the body of the responses as
+        received, in a `TwitterRawResponse` (bytes with the `headers` and
+        rate limit attributes of the other responses) without decoding
+        it, which is useful to store responses as they are. Pass `_raw`
+        to a call to switch raw mode on or off for that call only.
+
+        `json_backend` names the library decoding the responses: "orjson",
+        "ujson", "msgspec" or "json" (the standard library). By default
+        it is taken from the TWITTER_JSON_BACKEND environment variable,
+        or else the fastest one installed is used. See
+        `twitter.json_backend`.
+
+        If `model` is True, tweets and users are decoded into the compact
+        `twitter.models.Tweet` and `twitter.models.User` objects, which
+        behave like the dicts they replace but take much less memory.
+
+        `hooks` is a function, or a list of functions, called with a
+        `twitter.trace.RequestTrace` after each request, telling its
+        status, sizes, rate limit headers and the time spent in each of
+        its phases (DNS, connect, TLS, first byte, body, decompression,
+        decoding). See `twitter.trace`.
+
+        If `single_flight` is True, identical GET calls made by several
+        threads at the same time share a single request and its response
+        rather than each sending its own. Pass a
+        `twitter.singleflight.SingleFlight` to share it between objects.
+        See `twitter.singleflight`.
+
+        `deadline` is the default number of seconds each call has to
+        complete, including connecting, reading and decompressing the
+        response, the waits for the rate limit or for an identical call
+        (see `single_flight`) and all the retries. A call that can't be
+        completed in time raises a `TwitterTimeoutError`, as soon as it
+        is known. Pass `_deadline` to a call to give it another budget.
+        The DNS lookup isn't bounded: getaddrinfo() ignores the socket
+        timeout, so a slow resolver can make a call overrun its deadline.
         """
         if not auth:
             auth = NoAuth()
@@ -617,11 +1124,99 @@ class Twitter(TwitterCall):
         if api_version:
             uriparts += (str(api_version),)
 
+        if transport is None:
+            if keep_alive is True:
+                transport = ConnectionPool()
+            else:
+                transport = keep_alive or None
+
+        if rate_limit is True:
+            rate_limit = RateLimitScheduler()
+
+        if cache is True:
+            cache = ResponseCache()
+
+        if single_flight is True:
+            single_flight = SingleFlight()
+
         TwitterCall.__init__(
             self, auth=auth, format=format, domain=domain,
             callable_cls=TwitterCall,
             secure=secure, uriparts=uriparts, retry=retry,
-            verify_context=verify_context)
+            verify_context=verify_context, transport=transport,
+            rate_limit=rate_limit or None, cache=cache or None, raw=raw,
+            json_backend=json_backend, model=model, hooks=hooks,
+            single_flight=single_flight or None, deadline=deadline)
 
+    def batch(self, max_concurrency=8, wait_on_rate_limit=True,
+              max_retries=5, max_wait=15 * 60):
+        """
+        Return a `twitter.batch.Batch` to record many calls and run them
+        concurrently on `max_concurrency` threads::
+
+            batch = t.batch(max_concurrency=8)
+            for name in screen_names:
+                batch.users.show(screen_name=name)
+            results = batch.execute()
+
+        The calls share the connections of this object when it was
+        created with `keep_alive` or a `transport`, otherwise the batch uses a
+        pool of its own. A rate limited call is tried again at most
+        `max_retries` times, waiting at most `max_wait` seconds.
+        """
+        from .batch import Batch
+        twitter = self
+        if self.transport is None:
+            twitter = copy.copy(self)
+            twitter.transport = ConnectionPool(maxsize=max_concurrency)
+        return Batch(twitter, max_concurrency, wait_on_rate_limit,
+                     max_retries, max_wait)
+
+    def lookup_batcher(self, window=0.01, max_concurrency=4, **params):
+        """
+        Return a `twitter.lookup.LookupBatcher` gathering the users and
+        tweets asked for by id during `window` seconds, by any thread,
+        into users/lookup and statuses/lookup calls of up to 100 ids::
+
+            lookups = t.lookup_batcher()
+            future = lookups.get_user(783214)
+            print(future.result()["screen_name"])
+
+        At most `max_concurrency` lookup calls are made at the same
+        time. `params` are passed to every lookup call.
+        """
+        from .lookup import LookupBatcher
+        return LookupBatcher(
+            self, window, max_concurrency=max_concurrency, **params)
 
-__all__ = ["Twitter", "TwitterError", "TwitterHTTPError", "TwitterResponse"]
+    def upload_media(self, path, media_type=None, media_category=None,
+                     segment_size=None, max_concurrency=4, retries=3,
+                     state_path=None, wait=True, wait_timeout=None):
+        """
+        Upload the media file at `path` with the chunked upload commands
+        and return the final response, holding its `media_id_string`.
+        To be called on an upload.twitter.com client::
+
+            t_upload = Twitter(domain='upload.twitter.com', auth=...)
+            media_id = t_upload.upload_media("video.mp4")["media_id_string"]
+
+        Segments are sent `max_concurrency` at a time and retried on
+        failure; an interrupted upload resumes where it stopped. The
+        processing of the media is waited for, at most `wait_timeout`
+        seconds, unless `wait` is False. See `twitter.upload`.
+        """
+        from .upload import MediaUpload, SEGMENT_SIZE
+        twitter = self
+        if self.transport is None:
+            twitter = copy.copy(self)
+            twitter.transport = ConnectionPool(maxsize=max_concurrency)
+        return MediaUpload(
+            twitter, path, media_type=media_type,
+            media_category=media_category,
+            segment_size=segment_size or SEGMENT_SIZE,
+            max_concurrency=max_concurrency, retries=retries,
+            state_path=state_path).run(wait, wait_timeout)
+
+
+__all__ = ["Twitter", "TwitterError", "TwitterHTTPError", "TwitterRawResponse",
+           "TwitterResponse", "TwitterTimeoutError"]
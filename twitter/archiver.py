@@ -32,6 +32,7 @@ AUTHENTICATION
 from __future__ import print_function
 
 import functools
+import io
 import os
 import sys
 import time as _time
@@ -97,7 +98,7 @@ def parse_args(args, options):
 def load_tweets(filename):
     """Load tweets from file into dict, see save_tweets()."""
     try:
-        archive = open(filename,"r")
+        archive = io.open(filename, "r", encoding="utf-8")
     except IOError: # no archive (yet)
         return {}
 
@@ -105,9 +106,9 @@ def load_tweets(filename):
     for line in archive.readlines():
         try:
             tid, text = line.strip().split(" ", 1)
-            tweets[int(tid)] = text.decode("utf-8")
+            tweets[int(tid)] = text
         except Exception as e:
-            err("loading tweet %s failed due to %s" % (line, unicode(e)))
+            err("loading tweet %s failed due to %s" % (line, e))
 
     archive.close()
     return tweets
@@ -128,16 +129,16 @@ def save_tweets(filename, tweets):
         return
 
     try:
-        archive = open(filename,"w")
+        archive = io.open(filename, "w", encoding="utf-8")
     except IOError as e:
         err("Cannot save tweets: %s" % str(e))
         return
 
     for k in sorted(tweets.keys()):
         try:
-            archive.write("%i %s\n" % (k, tweets[k].encode('utf-8')))
+            archive.write(u"%i %s\n" % (k, tweets[k]))
         except Exception as ex:
-            err("archiving tweet %s failed due to %s" % (k, unicode(ex)))
+            err("archiving tweet %s failed due to %s" % (k, ex))
 
     archive.close()
 
@@ -0,0 +1,181 @@
+# encoding: utf-8
+"""
+Run many API calls concurrently on a pool of worker threads.
+
+A `Batch` is obtained from a `Twitter` object and is used like it,
+except that calls are only recorded; `execute()` then runs them and
+returns one `BatchResult` per call, in the order they were added::
+
+    t = Twitter(auth=OAuth(...), keep_alive=True)
+    batch = t.batch(max_concurrency=8)
+    for name in screen_names:
+        batch.users.show(screen_name=name)
+    for result in batch.execute():
+        if result.ok:
+            print(result.response["id"])
+        else:
+            print(result.error)
+
+Calls go through the usual `Twitter` machinery, so they use its auth,
+connections and retry settings. When a call gets rate limited (HTTP
+429), the other workers stop starting new calls until the limit resets
+and the call is tried again, instead of every thread hitting the limit
+on its own. A call is tried at most `max_retries` more times, and not
+at all when the limit resets more than `max_wait` seconds later: its
+result is then the last 429 error.
+"""
+from __future__ import unicode_literals
+
+import threading
+from time import sleep, time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .api import TwitterHTTPError
+
+# Length of a rate limit window, the longest wait for a reset.
+RATE_LIMIT_WINDOW = 15 * 60
+
+
+class BatchResult(object):
+    """
+    Outcome of a call run by a `Batch`: `response` holds the decoded
+    response when the call succeeded (`ok`), `error` holds the exception
+    raised otherwise (usually a `TwitterHTTPError`).
+    """
+
+    def __init__(self, call, kwargs):
+        self.call = call
+        self.kwargs = kwargs
+        self.response = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<BatchResult ok %s>" % '/'.join(self.call.uriparts)
+        return "<BatchResult error %r>" % (self.error,)
+
+
+class _BatchCall(object):
+    """Records calls made on a TwitterCall into a Batch."""
+
+    def __init__(self, batch, call):
+        self._batch = batch
+        self._call = call
+
+    def __getattr__(self, k):
+        if k.startswith('__'):
+            raise AttributeError
+        if k == "_":
+            return lambda arg: _BatchCall(self._batch, self._call._(arg))
+        return _BatchCall(self._batch, getattr(self._call, k))
+
+    def __call__(self, **kwargs):
+        return self._batch.add(self._call, **kwargs)
+
+
+class Batch(object):
+    """
+    A list of API calls to run concurrently with at most
+    `max_concurrency` of them in flight. See `twitter.batch`.
+    """
+
+    def __init__(self, twitter, max_concurrency=8, wait_on_rate_limit=True,
+                 max_retries=5, max_wait=RATE_LIMIT_WINDOW):
+        self._twitter = twitter
+        self.max_concurrency = max_concurrency
+        self.wait_on_rate_limit = wait_on_rate_limit
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self._calls = []
+        self._lock = threading.Lock()
+        self._hold_until = 0
+
+    def __getattr__(self, k):
+        if k.startswith('_'):
+            raise AttributeError(k)
+        return _BatchCall(self, getattr(self._twitter, k))
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, call, **kwargs):
+        """
+        Record a call of the TwitterCall `call` with `kwargs`, and return
+        its position in the results.
+        """
+        self._calls.append(BatchResult(call, kwargs))
+        return len(self._calls) - 1
+
+    def _wait_for_rate_limit(self):
+        while True:
+            delay = self._hold_until - time()
+            if delay <= 0:
+                return
+            sleep(delay)
+
+    def _run(self, result):
+        retries = 0
+        while True:
+            self._wait_for_rate_limit()
+            try:
+                result.response = result.call(**result.kwargs)
+                result.error = None
+                return
+            except TwitterHTTPError as e:
+                result.error = e
+                if not (self.wait_on_rate_limit and e.e.code == 429):
+                    return
+                if retries >= self.max_retries:
+                    return
+                retries += 1
+                try:
+                    reset = int(e.e.headers.get('X-Rate-Limit-Reset'))
+                except (TypeError, ValueError):
+                    reset = 0
+                now = time()
+                hold_until = max(reset + 1, now + 1)
+                if hold_until - now > self.max_wait:
+                    return
+                with self._lock:
+                    self._hold_until = max(self._hold_until, hold_until)
+            except Exception as e:
+                result.error = e
+                return
+
+    def _worker(self, todo):
+        while True:
+            try:
+                result = todo.get_nowait()
+            except queue.Empty:
+                return
+            self._run(result)
+
+    def execute(self):
+        """
+        Run the recorded calls and return their `BatchResult`, in the
+        order the calls were added. The batch is empty afterwards.
+        """
+        calls, self._calls = self._calls, []
+        todo = queue.Queue()
+        for result in calls:
+            todo.put(result)
+        workers = [
+            threading.Thread(target=self._worker, args=(todo,))
+            for _ in range(min(self.max_concurrency, len(calls)))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return calls
+
+
+__all__ = ["Batch", "BatchResult"]
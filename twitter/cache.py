@@ -0,0 +1,285 @@
+# encoding: utf-8
+"""
+Response cache for idempotent GET calls.
+
+Many calls (users.show, lists.list, trends.place...) return data which
+doesn't change from one minute to the next, yet programs repeat them
+over and over, spending rate limit quota and latency each time. A
+`ResponseCache` keeps the raw responses of such calls for a while::
+
+    t = Twitter(auth=OAuth(...), cache=True)
+
+    # or with your own settings, shared between processes through disk
+    cache = ResponseCache(
+        backend=FileCache(os.path.expanduser("~/.cache/twitter")),
+        ttl=60, ttls={"users/show": 3600})
+    t = Twitter(auth=OAuth(...), cache=cache)
+
+Entries are keyed on the HTTP method, the URL and the parameters of the
+call, including the OAuth token but without the per-request OAuth
+nonce, timestamp and signature, so different users never share them.
+Cached calls still return `TwitterDictResponse`/`TwitterListResponse`
+objects, with the headers of the original response.
+"""
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from time import time
+
+try:
+    import http.client as http_client
+except ImportError:
+    import httplib as http_client
+
+try:
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urlparse as urllib_parse
+
+from .util import actually_bytes
+
+# Seconds during which the responses of these endpoints are reused when
+# the cache is enabled with `cache=True`.
+DEFAULT_TTLS = {
+    'application/rate_limit_status': 10,
+    'lists/list': 300,
+    'trends/place': 300,
+    'users/show': 300,
+}
+
+# Parameters which change with every request, whatever the call.
+VOLATILE_PARAMS = ('oauth_nonce', 'oauth_signature', 'oauth_timestamp')
+
+
+def headers_from_items(items):
+    """Rebuild an HTTPMessage, as found on responses, from header items."""
+    raw = ''.join('%s: %s\r\n' % item for item in items) + '\r\n'
+    try:
+        parse_headers = http_client.parse_headers
+    except AttributeError:
+        from StringIO import StringIO
+        return http_client.HTTPMessage(StringIO(raw))
+    from io import BytesIO
+    return parse_headers(BytesIO(raw.encode('latin-1')))
+
+
+class CachedResponse(object):
+    """The raw body and header items of a cached response."""
+
+    def __init__(self, body, header_items):
+        self.body = body
+        self.header_items = header_items
+
+    @property
+    def headers(self):
+        return headers_from_items(self.header_items)
+
+
+class MemoryCache(object):
+    """
+    In-memory cache backend keeping the `maxsize` most recently used
+    entries.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time():
+                del self._entries[key]
+                return None
+            # move to the most recently used end
+            del self._entries[key]
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time() + ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(object):
+    """
+    On-disk cache backend, one file per entry in `directory`, which can
+    be shared by several processes. When there are more than `maxsize`
+    entries the least recently used ones are removed.
+
+    The entries, `CachedResponse` objects, are stored as JSON, so that
+    reading a file planted in the directory can't run any code.
+    """
+
+    SUFFIX = '.twcache'
+
+    def __init__(self, directory, maxsize=10000):
+        self.directory = directory
+        self.maxsize = maxsize
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._count = len(self._files())
+
+    def _files(self):
+        return [name for name in os.listdir(self.directory)
+                if name.endswith(self.SUFFIX)]
+
+    def _path(self, key):
+        name = hashlib.sha1(actually_bytes(key)).hexdigest()
+        return os.path.join(self.directory, name + self.SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+            if entry['key'] != key:
+                return None
+            expires = float(entry['expires'])
+            value = CachedResponse(
+                base64.b64decode(entry['body']),
+                list(entry['headers'].items()))
+        except (IOError, OSError, ValueError, TypeError, KeyError,
+                AttributeError):
+            return None
+        if expires < time():
+            self._remove(path)
+            return None
+        try:
+            # the modification time tells which entries were used last
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        entry = {
+            'key': key,
+            'expires': time() + ttl,
+            'body': base64.b64encode(bytes(value.body)).decode('ascii'),
+            'headers': dict(value.header_items),
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(entry).encode('utf-8'))
+        existed = os.path.exists(path)
+        getattr(os, 'replace', os.rename)(tmp, path)
+        if not existed:
+            with self._lock:
+                self._count += 1
+                evict = self._count > self.maxsize
+            if evict:
+                self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        paths = [os.path.join(self.directory, name) for name in self._files()]
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        mtimes.sort()
+        # make some room rather than evicting on every new entry
+        excess = len(mtimes) - int(self.maxsize * 0.9)
+        for _, path in mtimes[:max(excess, 0)]:
+            self._remove(path)
+        with self._lock:
+            self._count = len(mtimes) - max(excess, 0)
+
+    def clear(self):
+        for name in self._files():
+            self._remove(os.path.join(self.directory, name))
+        with self._lock:
+            self._count = 0
+
+
+class ResponseCache(object):
+    """
+    Decides which calls are cached, for how long, and stores their
+    responses in `backend` (a `MemoryCache` by default).
+
+    `ttls` maps endpoint names ("users/show"...) to the number of seconds
+    their responses are reused; `ttl` applies to the other GET endpoints
+    and is None by default, meaning they aren't cached.
+    """
+
+    def __init__(self, backend=None, ttl=None, ttls=None):
+        if backend is None:
+            backend = MemoryCache()
+        if ttls is None:
+            ttls = DEFAULT_TTLS
+        self.backend = backend
+        self.ttl = ttl
+        self.ttls = dict(ttls)
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.ttl)
+
+    def key(self, req):
+        """
+        Cache key of a `urllib` `Request`: method, URL and parameters
+        without the volatile OAuth ones, plus the Authorization header
+        for auth schemes which use it.
+        """
+        parts = urllib_parse.urlsplit(req.get_full_url())
+        query = '&'.join(sorted(
+            param for param in parts.query.split('&')
+            if param and param.split('=', 1)[0] not in VOLATILE_PARAMS))
+        key = '%s %s://%s%s?%s' % (
+            req.get_method(), parts.scheme, parts.netloc, parts.path, query)
+        authorization = req.get_header('Authorization')
+        if authorization:
+            key += ' ' + hashlib.sha1(
+                actually_bytes(authorization)).hexdigest()
+        return key
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, body, headers, ttl):
+        """
+        Store the response to the request of the given key; `body` must
+        have been decompressed already.
+        """
+        header_items = [
+            (k, v) for k, v in headers.items()
+            if k.lower() not in ('content-encoding', 'content-length')]
+        self.backend.set(key, CachedResponse(body, header_items), ttl)
+
+
+__all__ = ["FileCache", "MemoryCache", "ResponseCache"]
@@ -0,0 +1,306 @@
+# encoding: utf-8
+"""
+Recording of real API traffic into a cassette, and its replay offline.
+
+A `Cassette` records the exchanges of the `Twitter` and `TwitterStream`
+objects given its `recorder()` as transport (see `twitter.transport`):
+the status, headers and body of each response, as it was received
+(still gzipped, when it was) and read by pieces, with the time each
+piece came in::
+
+    cassette = Cassette()
+    t = Twitter(auth=OAuth(...), transport=cassette.recorder())
+    t.statuses.home_timeline(count=200)
+    cassette.save("home.cassette.gz")
+
+Its `player()` then answers the same calls, without any network::
+
+    cassette = Cassette.load("home.cassette.gz")
+    t = Twitter(transport=cassette.player())
+    t.statuses.home_timeline(count=200)
+
+By default the responses are replayed at full speed. With `speed=1.0`
+they take the time they took when recorded (the time to the headers,
+and between the pieces of the body, which for a stream are its bursts
+of messages); `speed=2.0` replays them twice as fast.
+
+A call is answered by the responses recorded for the same method, URL
+path and parameters, in the order they were recorded; the OAuth
+parameters, which change every time, are left out of the cassette.
+Once they are all used, the call fails with a `CassetteError`, unless
+the player is told to `repeat` them. Files whose name ends in ".gz" are
+gzipped.
+"""
+from __future__ import unicode_literals
+
+import base64
+import gzip
+import json
+import threading
+import time
+from io import BytesIO
+
+try:
+    import urllib.error as urllib_error
+    import urllib.parse as urllib_parse
+    from urllib.parse import urlencode
+except ImportError:
+    import urllib2 as urllib_error
+    import urlparse as urllib_parse
+    from urllib import urlencode
+
+from .api import TwitterError
+from .trace import clock
+from .transport import URLLIB, MemoryResponse
+
+VERSION = 1
+
+
+class CassetteError(TwitterError):
+    """Raised when a cassette has no response for a request."""
+
+
+def _params(query):
+    """The parameters of a query string but the OAuth ones, sorted."""
+    return sorted((k, v) for k, v in urllib_parse.parse_qsl(
+        query, keep_blank_values=True) if not k.startswith('oauth_'))
+
+
+def request_key(req):
+    """
+    Return the (method, url, body) of `req` telling which recorded
+    responses answer it: its URL and form body without OAuth parameters.
+    Other bodies (media, JSON) are left out.
+    """
+    parts = urllib_parse.urlsplit(req.get_full_url())
+    url = urllib_parse.urlunsplit(
+        (parts.scheme, parts.netloc, parts.path,
+         urlencode(_params(parts.query)), ''))
+    body = None
+    content_type = req.get_header('Content-type', '')
+    if req.data and (not content_type
+                     or content_type.startswith('application/x-www-form')):
+        try:
+            body = urlencode(_params(bytes(req.data).decode('utf-8')))
+        except UnicodeDecodeError:
+            pass
+    return req.get_method(), url, body
+
+
+class Cassette(object):
+    """
+    Recorded exchanges, in `interactions`. Each is a dict of the request
+    `method`, `url` and `body` (see `request_key`), the response `status`
+    and `headers` (a list of (name, value) pairs), `ttfb`, the seconds
+    until the headers came, and `chunks`, the pieces of the body as
+    [seconds after the headers, bytes].
+    """
+
+    def __init__(self, interactions=None):
+        self._lock = threading.Lock()
+        self.interactions = list(interactions or ())
+
+    def recorder(self, transport=None):
+        """Return a transport recording into this cassette the exchanges
+        of `transport` (urllib by default)."""
+        return RecordingTransport(self, transport)
+
+    def player(self, speed=None, repeat=False):
+        """Return a transport replaying this cassette."""
+        return ReplayTransport(self, speed, repeat)
+
+    def add(self, interaction):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def dumps(self):
+        """Return the cassette as JSON."""
+        with self._lock:
+            interactions = [
+                dict(interaction, chunks=[
+                    [round(offset, 6), base64.b64encode(data).decode('ascii')]
+                    for offset, data in list(interaction['chunks'])])
+                for interaction in self.interactions]
+        return json.dumps({'version': VERSION, 'interactions': interactions},
+                          separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, text):
+        """Return the cassette whose JSON is `text`."""
+        cassette = json.loads(text)
+        if cassette.get('version') != VERSION:
+            raise CassetteError(
+                "Unknown cassette version %r" % cassette.get('version'))
+        interactions = cassette['interactions']
+        for interaction in interactions:
+            interaction['chunks'] = [
+                [offset, base64.b64decode(data)]
+                for offset, data in interaction['chunks']]
+        return cls(interactions)
+
+    def save(self, path):
+        data = self.dumps().encode('utf-8')
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wb') as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            return cls.loads(f.read().decode('utf-8'))
+
+
+class RecordingResponse(object):
+    """A response whose body is recorded into an interaction as it is
+    read."""
+
+    def __init__(self, handle, chunks):
+        self._handle = handle
+        self._chunks = chunks
+        self._start = clock()
+        self.url = getattr(handle, 'url', None)
+        self.code = self.status = handle.getcode()
+        self.reason = self.msg = getattr(handle, 'reason', None)
+        self.headers = handle.headers
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def _record(self, data):
+        if data:
+            self._chunks.append([clock() - self._start, bytes(data)])
+        return data
+
+    def read(self, amt=None):
+        if amt is None:
+            return self._record(self._handle.read())
+        return self._record(self._handle.read(amt))
+
+    def read1(self, amt=-1):
+        read1 = getattr(self._handle, 'read1', None)
+        if read1 is None:
+            return self.read(None if amt is None or amt < 0 else amt)
+        return self._record(read1(amt))
+
+    def close(self):
+        self._handle.close()
+
+
+class RecordingTransport(object):
+    """Sends the requests with another transport and records them into
+    a `Cassette`."""
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport or URLLIB
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        method, url, body = request_key(req)
+        interaction = {'method': method, 'url': url, 'body': body,
+                       'chunks': []}
+        start = clock()
+        try:
+            handle = self.transport.urlopen(
+                req, timeout=timeout, context=context, trace=trace)
+        except urllib_error.HTTPError as e:
+            data = e.read()
+            interaction.update(
+                status=e.code, headers=list(e.headers.items()),
+                ttfb=clock() - start)
+            interaction['chunks'].append([0.0, data])
+            self.cassette.add(interaction)
+            raise urllib_error.HTTPError(
+                e.geturl(), e.code, e.msg, e.headers, BytesIO(data))
+        interaction.update(
+            status=handle.getcode(), headers=list(handle.headers.items()),
+            ttfb=clock() - start)
+        # added now, so that a stream is saved with the messages
+        # received so far
+        self.cassette.add(interaction)
+        return RecordingResponse(handle, interaction['chunks'])
+
+
+class ReplayResponse(MemoryResponse):
+    """A recorded response, whose pieces come at the recorded times
+    divided by `speed`, or at once if `speed` is None."""
+
+    def __init__(self, status, headers, chunks, url=None, speed=None):
+        MemoryResponse.__init__(
+            self, status, headers, [data for _, data in chunks if data], url)
+        self._offsets = [offset for offset, data in chunks if data]
+        self._speed = speed
+        self._start = clock()
+
+    def _wait(self, offset):
+        delay = self._start + offset / self._speed - clock()
+        if delay > 0:
+            time.sleep(delay)
+
+    def read(self, amt=None):
+        if amt is None and self._speed and self._offsets:
+            self._wait(self._offsets[-1])
+            self._offsets = []
+        return MemoryResponse.read(self, amt)
+
+    def read1(self, amt=-1):
+        # An offset is popped when its chunk starts being read: as many
+        # offsets as chunks left means the next one is a new chunk.
+        if (self._speed and self._chunks
+                and len(self._offsets) == len(self._chunks)):
+            self._wait(self._offsets.pop(0))
+        return MemoryResponse.read1(self, amt)
+
+
+class ReplayTransport(object):
+    """Answers the requests with the responses of a `Cassette`. See
+    `twitter.cassette`."""
+
+    def __init__(self, cassette, speed=None, repeat=False):
+        self.speed = speed
+        self.repeat = repeat
+        self._lock = threading.Lock()
+        self._recorded = {}
+        self._used = {}
+        for interaction in cassette.interactions:
+            key = (interaction['method'], interaction['url'],
+                   interaction['body'])
+            self._recorded.setdefault(key, []).append(interaction)
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        key = request_key(req)
+        url = req.get_full_url()
+        with self._lock:
+            recorded = self._recorded.get(key, ())
+            used = self._used.get(key, 0)
+            if used >= len(recorded) and self.repeat and recorded:
+                used = 0
+            if used >= len(recorded):
+                raise CassetteError(
+                    "No %sresponse recorded for %s %s" % (
+                        "more " if recorded else "", key[0], key[1]))
+            self._used[key] = used + 1
+        interaction = recorded[used]
+        ttfb = interaction['ttfb'] / self.speed if self.speed else 0.0
+        if ttfb:
+            time.sleep(ttfb)
+        if trace is not None:
+            trace.ttfb = ttfb
+        response = ReplayResponse(
+            interaction['status'], interaction['headers'],
+            interaction['chunks'], url, self.speed)
+        if not 200 <= response.code < 300:
+            raise urllib_error.HTTPError(
+                url, response.code, response.reason, response.headers,
+                BytesIO(response.read()))
+        return response
+
+
+__all__ = ["Cassette", "CassetteError", "RecordingTransport",
+           "ReplayTransport"]
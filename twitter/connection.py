@@ -0,0 +1,451 @@
+# encoding: utf-8
+"""
+Persistent HTTP connections for the Twitter API classes.
+
+A `ConnectionPool` keeps a few `http.client` connections open per host
+(api.twitter.com, upload.twitter.com...) so that consecutive API calls
+don't pay for a fresh TCP and TLS handshake every time. It is shared
+by every `TwitterCall` derived from the same `Twitter` object::
+
+    t = Twitter(auth=OAuth(...), keep_alive=True)
+
+The pool mimics `urlopen`: it takes a `urllib` `Request`, raises
+`HTTPError` for non-2xx statuses and `URLError` when the server can't
+be reached, so the rest of the API code doesn't have to care which one
+is in use.
+
+SSL contexts are expensive to build (the whole CA bundle gets parsed),
+so `ssl_context` keeps one per `verify_context` setting for the whole
+process. Pooled HTTPS connections also remember the TLS session of
+each host and resume it when they reconnect, which skips the full
+handshake; `tls_session_stats()` tells how often that worked.
+
+The connections of the pool time the DNS lookup, TCP connect and TLS
+handshake of their `connect()`, which `urlopen` passes on, with the
+time to the first byte of the response, to the `twitter.trace`
+`RequestTrace` it is given.
+"""
+from __future__ import unicode_literals
+
+import select
+import socket
+import threading
+from collections import deque
+from io import BytesIO
+from time import time
+
+try:
+    import ssl
+except ImportError:
+    _HAVE_SSL = False
+    _HAVE_TLS_SESSIONS = False
+else:
+    _HAVE_SSL = True
+    _HAVE_TLS_SESSIONS = hasattr(ssl, 'SSLSession')
+
+import certifi
+
+from .trace import clock
+
+try:
+    import http.client as http_client
+except ImportError:
+    import httplib as http_client
+
+try:
+    import urllib.request as urllib_request
+    import urllib.error as urllib_error
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urllib2 as urllib_request
+    import urllib2 as urllib_error
+    import urlparse as urllib_parse
+
+USER_AGENT = "Python-urllib/%s" % urllib_request.__version__
+
+# Methods whose requests can be sent again if their response is lost.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
+
+def ssl_context(verify_context=True):
+    """
+    Return the process-wide SSL context for the given `verify_context`
+    setting, creating it on first use. Returns None without SSL support.
+    """
+    if not _HAVE_SSL:
+        return None
+    verify_context = bool(verify_context)
+    context = _ssl_contexts.get(verify_context)
+    if context is None:
+        with _ssl_contexts_lock:
+            context = _ssl_contexts.get(verify_context)
+            if context is None:
+                if not verify_context:
+                    context = ssl._create_unverified_context()
+                else:
+                    context = ssl.create_default_context()
+                    context.load_verify_locations(cafile=certifi.where())
+                _ssl_contexts[verify_context] = context
+    return context
+
+
+class TLSSessionCache(object):
+    """
+    Last TLS session seen for each (context, host, port), so that new
+    connections to the same server can resume it, with counters of
+    full handshakes and resumed sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.handshakes = 0
+        self.resumed = 0
+
+    def get(self, key):
+        return self._sessions.get(key)
+
+    def store(self, key, sock):
+        session = getattr(sock, 'session', None)
+        if session is not None:
+            with self._lock:
+                self._sessions[key] = session
+
+    def handshake_done(self, key, sock):
+        with self._lock:
+            if sock.session_reused:
+                self.resumed += 1
+            else:
+                self.handshakes += 1
+        self.store(key, sock)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self.handshakes = self.resumed = 0
+
+
+tls_sessions = TLSSessionCache()
+
+
+def tls_session_stats():
+    """
+    Return the number of full TLS handshakes and of resumed sessions
+    done by pooled connections since the process started, as a dict.
+    """
+    return {'handshakes': tls_sessions.handshakes,
+            'resumed': tls_sessions.resumed}
+
+
+def _timed_connect(conn):
+    """
+    Open the socket of the HTTP connection `conn` like its `connect()`
+    does, keeping the time of the DNS lookup and of the TCP connect in
+    its `timings`.
+    """
+    start = clock()
+    infos = socket.getaddrinfo(conn.host, conn.port, 0, socket.SOCK_STREAM)
+    resolved = clock()
+    error = socket.error("getaddrinfo returned an empty list")
+    for info in infos:
+        try:
+            conn.sock = socket.create_connection(
+                info[4][:2], conn.timeout, conn.source_address)
+            break
+        except socket.error as e:
+            error = e
+    else:
+        raise error
+    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    conn.timings = {'dns': resolved - start, 'connect': clock() - resolved}
+    if conn._tunnel_host:
+        conn._tunnel()
+
+
+class HTTPConnection(http_client.HTTPConnection):
+    """HTTPConnection timing its DNS lookup and TCP connect."""
+
+    timings = None
+
+    def connect(self):
+        _timed_connect(self)
+
+
+if _HAVE_TLS_SESSIONS:
+    class HTTPSConnection(http_client.HTTPSConnection):
+        """
+        HTTPSConnection resuming the last TLS session of its host, and
+        timing its DNS lookup, TCP connect and TLS handshake.
+        """
+
+        timings = None
+
+        def _tls_session_key(self):
+            return (self._context, self._tunnel_host or self.host, self.port)
+
+        def connect(self):
+            _timed_connect(self)
+            key = self._tls_session_key()
+            start = clock()
+            self.sock = self._context.wrap_socket(
+                self.sock, server_hostname=key[1],
+                session=tls_sessions.get(key))
+            self.timings['tls'] = clock() - start
+            tls_sessions.handshake_done(key, self.sock)
+
+        def getresponse(self):
+            # TLS 1.3 servers send their session tickets after the
+            # handshake, so the session is only worth saving once the
+            # response headers went through.
+            sock = self.sock
+            response = http_client.HTTPSConnection.getresponse(self)
+            if sock is not None:
+                tls_sessions.store(self._tls_session_key(), sock)
+            return response
+else:
+    HTTPSConnection = http_client.HTTPSConnection
+
+
+def _is_stale(conn):
+    """
+    A pooled connection is stale when its socket is gone or readable:
+    an idle HTTP connection has nothing to say, so readable means the
+    server closed it (or sent garbage we can't make sense of).
+    """
+    sock = conn.sock
+    if sock is None:
+        return True
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (ValueError, select.error, socket.error):
+        return True
+
+
+class PooledResponse(object):
+    """
+    File-like response handed out by `ConnectionPool.urlopen`.
+
+    It offers the subset of the `urlopen` handle interface used by the
+    API classes (`read`, `headers`, `info()`, `code`...). The underlying
+    connection goes back to the pool as soon as the body has been read
+    entirely; call `close()` to drop it if you stop reading early.
+    """
+
+    def __init__(self, pool, key, conn, response, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.code = self.status = response.status
+        self.reason = self.msg = response.reason
+        self.headers = response.msg
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def read(self, amt=None):
+        try:
+            if amt is None:
+                data = self._response.read()
+            else:
+                data = self._response.read(amt)
+        except Exception:
+            self.close()
+            raise
+        if amt is None or not data:
+            self.release()
+        return data
+
+    def read1(self, amt=-1):
+        """Read what is available of the body, up to amt bytes."""
+        read1 = getattr(self._response, 'read1', None)
+        if read1 is None:
+            # Python 2 responses have no read1()
+            return self.read(None if amt is None or amt < 0 else amt)
+        try:
+            data = read1(amt)
+        except Exception:
+            self.close()
+            raise
+        if not data:
+            self.release()
+        return data
+
+    def release(self):
+        """Give the connection back to the pool."""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._put(self._key, conn, self._response)
+
+    def close(self):
+        """Close the connection instead of giving it back to the pool."""
+        conn, self._conn = self._conn, None
+        self._response.close()
+        if conn is not None:
+            conn.close()
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of persistent HTTP(S) connections, per host.
+
+    `maxsize` is the number of idle connections kept open for each
+    (scheme, host, port); extra connections are simply closed once
+    their response has been read. Connections which stayed idle for
+    more than `idle_timeout` seconds, or which the server has closed
+    in the meantime, are discarded instead of being reused.
+
+    Note that connections are made directly to the target host: the
+    `http_proxy`/`https_proxy` environment variables honoured by
+    `urlopen` are not used.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60.0):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def __getstate__(self):
+        # Sockets and locks can't be pickled, the copy starts empty.
+        return {'maxsize': self.maxsize, 'idle_timeout': self.idle_timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _get(self, key):
+        """Pop a live idle connection for key, or return None."""
+        now = time()
+        with self._lock:
+            idle = self._idle.get(key)
+            if not idle:
+                return None
+            # Oldest connections sit on the left, evict the expired ones.
+            while idle and now - idle[0][1] >= self.idle_timeout:
+                idle.popleft()[0].close()
+            while idle:
+                conn = idle.pop()[0]
+                if not _is_stale(conn):
+                    return conn
+                conn.close()
+        return None
+
+    def _put(self, key, conn, response):
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.maxsize:
+                idle.append((conn, time()))
+                return
+        conn.close()
+
+    def clear(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    def _new_conn(self, scheme, host, port, timeout, context):
+        if timeout is None:
+            timeout = socket._GLOBAL_DEFAULT_TIMEOUT
+        if scheme == 'https':
+            if context is None:
+                context = ssl_context()
+            return HTTPSConnection(
+                host, port, timeout=timeout, context=context)
+        return HTTPConnection(host, port, timeout=timeout)
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        """
+        Send a `urllib` `Request` over a pooled connection and return a
+        `PooledResponse`. HTTP errors are raised as `HTTPError` and
+        network errors as `URLError`, like `urlopen` does. The timings
+        of the connection and of the response headers go to `trace`, a
+        `twitter.trace.RequestTrace`, when there is one.
+        """
+        url = req.get_full_url()
+        parts = urllib_parse.urlsplit(url)
+        scheme = parts.scheme
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        method = req.get_method()
+        body = req.data
+        headers = dict(req.header_items())
+        # native strings: on Python 2 httplib joins the headers with the
+        # body, which may not be ASCII
+        if body is not None and 'Content-type' not in headers:
+            headers[str('Content-type')] = str(
+                'application/x-www-form-urlencoded')
+        headers.setdefault(str('User-agent'), str(USER_AGENT))
+
+        conn = self._get(key)
+        while True:
+            reused = conn is not None
+            if not reused:
+                conn = self._new_conn(
+                    scheme, parts.hostname, port, timeout, context)
+            else:
+                # the timeout of the previous call may still be set
+                conn.sock.settimeout(
+                    socket.getdefaulttimeout() if timeout is None else timeout)
+            written = False
+            try:
+                if not reused:
+                    conn.connect()
+                sent = clock()
+                conn.request(method, path, body, headers)
+                written = True
+                response = conn.getresponse()
+            except socket.timeout as e:
+                conn.close()
+                raise urllib_error.URLError(e)
+            except (http_client.BadStatusLine, socket.error) as e:
+                conn.close()
+                # The server may have dropped the connection while it
+                # was idle: retry once on a brand new one, unless the
+                # request may have been processed and can't be sent
+                # twice.
+                if reused and (not written or method in IDEMPOTENT_METHODS):
+                    conn = None
+                    continue
+                raise urllib_error.URLError(e)
+            break
+
+        if trace is not None:
+            trace.ttfb = clock() - sent
+            trace.reused = reused
+            timings = getattr(conn, 'timings', None)
+            if not reused and timings:
+                for phase, duration in timings.items():
+                    setattr(trace, phase, duration)
+        handle = PooledResponse(self, key, conn, response, url)
+        if not 200 <= handle.code < 300:
+            try:
+                data = handle.read()
+            except http_client.IncompleteRead as e:
+                data = e.partial
+            raise urllib_error.HTTPError(
+                url, handle.code, handle.reason, handle.headers,
+                BytesIO(data))
+        return handle
+
+
+__all__ = ["ConnectionPool", "ssl_context", "tls_session_stats"]
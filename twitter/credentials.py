@@ -0,0 +1,153 @@
+# encoding: utf-8
+"""
+Calls spread over several credentials, by rate limit headroom.
+
+Rate limits apply per user token (or per app, for app-only OAuth2
+bearer tokens). A program holding several authorized tokens can make as
+many more calls when it spreads them over all of them. A
+`CredentialPool` is an `auth` signing each call with one of its
+credentials::
+
+    pool = CredentialPool([OAuth(token, token_secret, ...)
+                           for token, token_secret in tokens])
+    t = Twitter(auth=pool)
+
+Each credential has its own `twitter.ratelimit.RateLimitScheduler`,
+filled from the X-Rate-Limit-* headers of the responses to its calls. A
+call goes to the credential which can send it the soonest, and among
+those to the one with the most calls left for its endpoint family
+(statuses/user_timeline, followers/ids...), least recently used first
+when they are even; credentials not used for that endpoint yet are
+assumed to have their full quota. The call is booked with the
+credential as it is chosen, so that threads calling at the same time
+spread over the credentials. An exhausted credential isn't used for
+the endpoint again before its window resets, and when they are all
+exhausted the calls wait for the first of them to reset, instead of
+getting a 429 error.
+
+The pool replaces the `rate_limit` option of `Twitter`, and can be
+shared between several `Twitter` objects, or threads.
+"""
+from __future__ import unicode_literals
+
+import itertools
+import threading
+from time import sleep, time
+
+from .ratelimit import RateLimitScheduler
+
+
+class Booking(object):
+    """
+    A call booked with the `RateLimitScheduler` of a credential by
+    `CredentialPool.choose`, standing in for the scheduler during the
+    call: its first `reserve` or `acquire` gives the time booked, the
+    next ones (for retries) book again. `release` gives the booking
+    back if the call wasn't sent (answered from the cache...).
+    """
+
+    def __init__(self, scheduler, family, send_at):
+        self.scheduler = scheduler
+        self.family = family
+        self.send_at = send_at
+
+    def reserve(self, family, now=None):
+        now = time() if now is None else now
+        send_at, self.send_at = self.send_at, None
+        if send_at is None:
+            return self.scheduler.reserve(family, now)
+        return max(0, send_at - now)
+
+    def acquire(self, family, deadline=None):
+        """See `RateLimitScheduler.acquire`."""
+        now = time()
+        delay = self.reserve(family, now)
+        if delay > 0:
+            if deadline is not None and now + delay > deadline:
+                self.cancel(family)
+                return False
+            sleep(delay)
+        return True
+
+    def cancel(self, family):
+        self.scheduler.cancel(family)
+
+    def release(self):
+        if self.send_at is not None:
+            self.send_at = None
+            self.scheduler.cancel(self.family)
+
+    def update(self, family, headers):
+        self.scheduler.update(family, headers)
+
+    def status(self, family):
+        return self.scheduler.status(family)
+
+
+class CredentialPool(object):
+    """
+    The credentials (`OAuth`, `OAuth2`...) to spread the calls over,
+    with the rate limit of each. See `twitter.credentials`.
+
+    `margin` is the number of seconds waited after the announced reset
+    time of a window, as for `RateLimitScheduler`.
+    """
+
+    def __init__(self, credentials, margin=1.0):
+        self.credentials = list(credentials)
+        if not self.credentials:
+            raise ValueError("A CredentialPool needs credentials")
+        self.margin = margin
+        self.schedulers = [RateLimitScheduler(margin=margin)
+                           for _ in self.credentials]
+        self._lock = threading.Lock()
+        self._last_used = [0] * len(self.credentials)
+        self._counter = itertools.count(1)
+
+    def __getstate__(self):
+        return {'credentials': self.credentials, 'margin': self.margin}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def headroom(self, index, family, now=None):
+        """
+        Return the number of calls to the endpoint `family` the credential
+        at `index` has left, and the number of seconds before it can send
+        the next one.
+        """
+        remaining, wait = self.schedulers[index].peek(family, now)
+        return (float('inf') if remaining is None else remaining), wait
+
+    def choose(self, family, now=None):
+        """
+        Book a call to the endpoint `family` with the best credential
+        and return that credential, to sign the call with, and the
+        `Booking` of the call, to use as its `RateLimitScheduler`.
+        """
+        now = time() if now is None else now
+        with self._lock:
+            def key(index):
+                remaining, wait = self.headroom(index, family, now)
+                return (wait, -remaining, self._last_used[index])
+            index = min(range(len(self.credentials)), key=key)
+            self._last_used[index] = next(self._counter)
+            scheduler = self.schedulers[index]
+            delay = scheduler.reserve(family, now)
+        return self.credentials[index], Booking(
+            scheduler, family, now + delay)
+
+    def status(self, family):
+        """
+        Return the (credential, limit, remaining, reset) of each
+        credential called for the endpoint `family`.
+        """
+        result = []
+        for credential, scheduler in zip(self.credentials, self.schedulers):
+            status = scheduler.status(family)
+            if status is not None:
+                result.append((credential,) + status)
+        return result
+
+
+__all__ = ["Booking", "CredentialPool"]
@@ -0,0 +1,128 @@
+# encoding: utf-8
+"""
+Choice of the library decoding the JSON responses and stream messages.
+
+The stdlib `json` module is slow compared to the C libraries orjson,
+ujson and msgspec. When one of them is installed it is used instead,
+unless told otherwise::
+
+    t = Twitter(auth=OAuth(...), json_backend="json")
+
+or, for the whole program, through the environment::
+
+    TWITTER_JSON_BACKEND=ujson python my_stream_consumer.py
+
+The backends all return plain dicts and lists, so the responses are the
+usual `TwitterDictResponse`/`TwitterListResponse` objects whatever the
+backend.
+"""
+from __future__ import unicode_literals
+
+import os
+import threading
+import warnings
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+ENV_VAR = 'TWITTER_JSON_BACKEND'
+
+# Backends tried, in order, when none is asked for.
+AUTO_ORDER = ('orjson', 'ujson', 'msgspec', 'json')
+
+
+def _stdlib_loads(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf8')
+    return json.loads(data)
+
+
+def _import_loads(name):
+    if name == 'json':
+        return _stdlib_loads
+    if name == 'orjson':
+        import orjson
+        return orjson.loads
+    if name == 'ujson':
+        import ujson
+
+        def loads(data):
+            if isinstance(data, bytearray):
+                data = bytes(data)
+            return ujson.loads(data)
+        return loads
+    if name == 'msgspec':
+        import msgspec
+        decode = msgspec.json.Decoder().decode
+
+        def loads(data):
+            try:
+                return decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e))
+        return loads
+    raise ValueError("Unknown JSON backend '%s'" % (name,))
+
+
+class JSONBackend(object):
+    """
+    A JSON library: `loads` decodes UTF-8 bytes or text and raises a
+    ValueError on invalid input.
+    """
+
+    def __init__(self, name, loads):
+        self.name = name
+        self.loads = loads
+
+    def __reduce__(self):
+        return get_backend, (self.name,)
+
+    def __repr__(self):
+        return "<JSONBackend %s>" % self.name
+
+
+_backends = {}
+_lock = threading.RLock()
+
+
+def get_backend(name=None):
+    """
+    Return the `JSONBackend` called `name` ("orjson", "ujson",
+    "msgspec" or "json"), or the one named by the TWITTER_JSON_BACKEND
+    environment variable when `name` is None. "auto", the default, is
+    the first of them which is installed. A `JSONBackend` instance is
+    returned as is. A backend named by the environment variable which
+    isn't installed is replaced by "json", with a warning.
+    """
+    if isinstance(name, JSONBackend):
+        return name
+    if name is None:
+        name = os.environ.get(ENV_VAR) or 'auto'
+        if name not in _backends:
+            try:
+                return get_backend(name)
+            except (ImportError, ValueError) as e:
+                # a program shouldn't break on a machine without it
+                warnings.warn("%s=%s can't be used (%s), using json instead"
+                              % (ENV_VAR, name, e), RuntimeWarning)
+                return get_backend('json')
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+    with _lock:
+        if name == 'auto':
+            for candidate in AUTO_ORDER:
+                try:
+                    backend = get_backend(candidate)
+                    break
+                except ImportError:
+                    pass
+        else:
+            backend = JSONBackend(name, _import_loads(name))
+        _backends[name] = backend
+    return backend
+
+
+__all__ = ["JSONBackend", "get_backend"]
@@ -0,0 +1,227 @@
+# encoding: utf-8
+"""
+Users and tweets looked up by id, 100 at a time, whoever asks for them.
+
+users/lookup and statuses/lookup return up to 100 users or tweets per
+call, but code resolving ids one by one, here and there, rarely has
+them at hand all together. A `LookupBatcher` collects the ids asked
+for by any number of callers (threads) during a short `window`, or
+until 100 of them are waiting, and sends a single lookup call for all
+of them. Each caller gets a future of its user or tweet::
+
+    lookups = t.lookup_batcher(window=0.01)
+    futures = [lookups.get_user(user_id) for user_id in user_ids]
+    names = [f.result()["screen_name"] for f in futures]
+
+The result of a future is None when the user or tweet doesn't exist (or
+is protected, suspended, deleted...). When the lookup call fails, the
+futures of all its ids raise its error. At most `max_concurrency`
+lookup calls are made at the same time, by a pool of worker threads;
+the other batches wait for their turn.
+"""
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+from time import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    class Future(object):
+        """The subset of `concurrent.futures.Future` used here."""
+
+        def __init__(self):
+            self._done = threading.Event()
+            self._result = None
+            self._exception = None
+
+        def done(self):
+            return self._done.is_set()
+
+        def set_result(self, result):
+            self._result = result
+            self._done.set()
+
+        def set_exception(self, exception):
+            self._exception = exception
+            self._done.set()
+
+        def exception(self, timeout=None):
+            if not self._done.wait(timeout):
+                raise RuntimeError("Future not done after %ss" % timeout)
+            return self._exception
+
+        def result(self, timeout=None):
+            exception = self.exception(timeout)
+            if exception is not None:
+                raise exception
+            return self._result
+
+from .api import TwitterHTTPError
+
+MAX_BATCH = 100
+
+# endpoint, parameter and key of the items of each kind of lookup
+KINDS = {
+    'user_id': (('users', 'lookup'), 'user_id', 'id_str'),
+    'screen_name': (('users', 'lookup'), 'screen_name', 'screen_name'),
+    'status': (('statuses', 'lookup'), 'id', 'id_str'),
+}
+
+
+def _item_key(item, field):
+    try:
+        key = item[field]
+    except KeyError:
+        key = item['id']
+    key = '%s' % (key,)
+    return key.lower() if field == 'screen_name' else key
+
+
+class LookupBatcher(object):
+    """
+    Collects the ids to look up and looks them up together with the
+    `twitter` object, `max_concurrency` calls at a time. `params` are
+    added to every lookup call, e.g. `tweet_mode="extended"`. See
+    `twitter.lookup`.
+    """
+
+    def __init__(self, twitter, window=0.01, max_batch=MAX_BATCH,
+                 max_concurrency=4, **params):
+        self.twitter = twitter
+        self.window = window
+        self.max_batch = max_batch
+        self.max_concurrency = max_concurrency
+        self.params = params
+        self.calls = 0
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._since = {}
+        self._thread = None
+        self._closed = False
+        self._batches = queue.Queue()
+        self._workers = []
+
+    def get_user(self, user_id):
+        """Return a future of the user with id `user_id`."""
+        return self._add('user_id', '%s' % (user_id,))
+
+    def get_user_by_name(self, screen_name):
+        """Return a future of the user called `screen_name`."""
+        return self._add('screen_name', screen_name.lower())
+
+    def get_status(self, status_id):
+        """Return a future of the tweet with id `status_id`."""
+        return self._add('status', '%s' % (status_id,))
+
+    def _add(self, kind, key):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("LookupBatcher closed")
+            pending = self._pending.get(kind)
+            if pending is None:
+                pending = self._pending[kind] = OrderedDict()
+                self._since[kind] = time()
+            pending.setdefault(key, []).append(future)
+            if len(pending) >= self.max_batch:
+                self._dispatch(kind)
+            elif self._thread is None:
+                self._thread = threading.Thread(target=self._timer)
+                self._thread.daemon = True
+                self._thread.start()
+            else:
+                self._cond.notify()
+        return future
+
+    def _timer(self):
+        """Dispatch the batches whose window is over."""
+        with self._cond:
+            while not self._closed:
+                now = time()
+                deadline = None
+                for kind, since in list(self._since.items()):
+                    if since + self.window <= now:
+                        self._dispatch(kind)
+                    elif deadline is None or since + self.window < deadline:
+                        deadline = since + self.window
+                self._cond.wait(None if deadline is None else deadline - now)
+
+    def _dispatch(self, kind):
+        """Hand the ids of `kind` waiting to the worker threads."""
+        batch = self._pending.pop(kind)
+        del self._since[kind]
+        self.calls += 1
+        self._batches.put((kind, batch))
+        if len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(target=self._worker)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker(self):
+        """Look up batches until close() says there will be no more."""
+        while True:
+            job = self._batches.get()
+            if job is None:
+                return
+            self._lookup(*job)
+
+    def _lookup(self, kind, batch):
+        uriparts, param, field = KINDS[kind]
+        call = self.twitter
+        for part in uriparts:
+            call = getattr(call, part)
+        kwargs = dict(self.params)
+        kwargs[param] = ','.join(batch)
+        try:
+            items = call(**kwargs)
+        except TwitterHTTPError as e:
+            if e.e.code != 404:
+                return self._fail(batch, e)
+            # none of them exists
+            items = []
+        except Exception as e:
+            return self._fail(batch, e)
+        found = dict((_item_key(item, field), item) for item in items)
+        for key, futures in batch.items():
+            for future in futures:
+                future.set_result(found.get(key))
+
+    def _fail(self, batch, error):
+        for futures in batch.values():
+            for future in futures:
+                future.set_exception(error)
+
+    def flush(self):
+        """Look up the ids waiting now, without waiting for the window."""
+        with self._cond:
+            for kind in list(self._pending):
+                self._dispatch(kind)
+
+    def close(self):
+        """Flush, and stop the threads once the lookups are over."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            for kind in list(self._pending):
+                self._dispatch(kind)
+            for _ in self._workers:
+                self._batches.put(None)
+            self._cond.notify()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+__all__ = ["LookupBatcher"]
@@ -0,0 +1,255 @@
+# encoding: utf-8
+"""
+Metrics of the API calls, exported in the OpenMetrics text format.
+
+A `Metrics` object is a hook (see `twitter.trace`) counting the requests
+of the `Twitter` and `TwitterStream` objects it is given to::
+
+    metrics = Metrics()
+    t = Twitter(auth=OAuth(...), hooks=metrics)
+    stream = TwitterStream(auth=OAuth(...), hooks=metrics)
+
+    metrics.serve(9464)             # http://127.0.0.1:9464/metrics
+    metrics.write("/var/lib/node_exporter/twitter.prom")
+
+It tracks, per endpoint template (statuses/user_timeline...):
+
+- `twitter_requests_total`, by method and status code ("error" when
+  no response came back),
+- `twitter_request_duration_seconds`, a histogram,
+- `twitter_requests_in_flight`,
+- `twitter_request_retries_total` and `twitter_rate_limited_total`
+  (429 responses),
+- `twitter_rate_limit_remaining`, from the last response headers,
+- `twitter_sent_bytes_total` and `twitter_received_bytes_total`,
+- `twitter_stream_messages_total` (whose rate is the number of messages
+  per second), `twitter_stream_connections_total` and
+  `twitter_stream_reconnects_total`.
+
+All the methods are thread-safe.
+"""
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import threading
+
+try:
+    import http.server as BaseHTTPServer
+    import socketserver as SocketServer
+except ImportError:
+    import BaseHTTPServer
+    import SocketServer
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Upper bounds, in seconds, of the buckets of the duration histogram.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, _escape(v)) for k, v in pairs)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _Family(object):
+    """A metric and its values, one per combination of labels."""
+
+    def __init__(self, type, name, help, labels):
+        self.type = type
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, labels, value):
+        self.values[labels] = value
+
+    def samples(self):
+        suffix = '_total' if self.type == 'counter' else ''
+        for labels, value in sorted(self.values.items()):
+            yield (self.name + suffix, _format_labels(self.labels, labels),
+                   value)
+
+
+class _Histogram(_Family):
+
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        _Family.__init__(self, 'histogram', name, help, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, labels, value):
+        counts = self.values.get(labels)
+        if counts is None:
+            # one count per bucket, then the sum
+            counts = self.values[labels] = [0] * len(self.buckets) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for labels, counts in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield (self.name + '_bucket',
+                       _format_labels(self.labels, labels,
+                                      [('le', _format_value(float(bound)))]),
+                       count)
+            label_text = _format_labels(self.labels, labels)
+            yield self.name + '_count', label_text, counts[-2]
+            yield self.name + '_sum', label_text, counts[-1]
+
+
+class Metrics(object):
+    """
+    Registry of the metrics of the API calls, to be passed as (one of)
+    the `hooks` of the API classes. See `twitter.metrics`.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self._lock = threading.Lock()
+        self._streams = set()
+        endpoint = ('endpoint',)
+        self.requests = _Family(
+            'counter', 'twitter_requests', 'Requests sent.',
+            ('endpoint', 'method', 'code'))
+        self.duration = _Histogram(
+            'twitter_request_duration_seconds', 'Duration of the requests.',
+            endpoint, buckets)
+        self.in_flight = _Family(
+            'gauge', 'twitter_requests_in_flight',
+            'Requests waiting for their response.', endpoint)
+        self.retries = _Family(
+            'counter', 'twitter_request_retries',
+            'Requests retrying a call which failed.', endpoint)
+        self.rate_limited = _Family(
+            'counter', 'twitter_rate_limited',
+            'Requests rejected by the rate limit (429).', endpoint)
+        self.rate_limit_remaining = _Family(
+            'gauge', 'twitter_rate_limit_remaining',
+            'Calls left in the current rate limit window.', endpoint)
+        self.sent_bytes = _Family(
+            'counter', 'twitter_sent_bytes',
+            'Bytes of request bodies sent.', endpoint)
+        self.received_bytes = _Family(
+            'counter', 'twitter_received_bytes',
+            'Bytes of response bodies received.', endpoint)
+        self.stream_messages = _Family(
+            'counter', 'twitter_stream_messages',
+            'Messages read from streams.', endpoint)
+        self.stream_connections = _Family(
+            'counter', 'twitter_stream_connections',
+            'Connections made to streams.', endpoint)
+        self.stream_reconnects = _Family(
+            'counter', 'twitter_stream_reconnects',
+            'Connections made to a stream after the first one.', endpoint)
+        self.families = [
+            self.requests, self.duration, self.in_flight, self.retries,
+            self.rate_limited, self.rate_limit_remaining, self.sent_bytes,
+            self.received_bytes, self.stream_messages,
+            self.stream_connections, self.stream_reconnects]
+
+    def request_started(self, trace):
+        with self._lock:
+            self.in_flight.inc((trace.endpoint,))
+
+    def __call__(self, trace):
+        labels = (trace.endpoint,)
+        code = 'error' if trace.status is None else str(trace.status)
+        with self._lock:
+            self.in_flight.inc(labels, -1)
+            self.requests.inc((trace.endpoint, trace.method, code))
+            self.duration.observe(labels, trace.total)
+            if trace.retries:
+                self.retries.inc(labels)
+            if trace.status == 429:
+                self.rate_limited.inc(labels)
+            if trace.rate_limit_remaining is not None:
+                self.rate_limit_remaining.set(
+                    labels, trace.rate_limit_remaining)
+            self.sent_bytes.inc(labels, trace.bytes_out)
+            self.received_bytes.inc(labels, trace.bytes_in)
+            if trace.stream:
+                self.stream_connections.inc(labels)
+                if trace.endpoint in self._streams:
+                    self.stream_reconnects.inc(labels)
+                self._streams.add(trace.endpoint)
+
+    def stream_message(self, trace):
+        with self._lock:
+            self.stream_messages.inc((trace.endpoint,))
+
+    def exposition(self):
+        """Return the metrics in the OpenMetrics text format."""
+        lines = []
+        with self._lock:
+            for family in self.families:
+                lines.append('# TYPE %s %s' % (family.name, family.type))
+                lines.append('# HELP %s %s' % (family.name, family.help))
+                for name, labels, value in family.samples():
+                    lines.append('%s%s %s' % (
+                        name, labels, _format_value(value)))
+        lines.append('# EOF\n')
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """
+        Write the metrics to the file at `path`, replacing it at once so
+        that its readers never see a partial file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.exposition().encode('utf-8'))
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+    def serve(self, port=0, host='127.0.0.1'):
+        """
+        Serve the metrics over HTTP on `host`:`port` from a background
+        thread and return the server; its `server_address` tells the
+        port chosen when `port` is 0. Call its `shutdown()` to stop it.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        server = Server((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+__all__ = ["Metrics"]
@@ -0,0 +1,192 @@
+# encoding: utf-8
+"""
+Compact objects for tweets and users, an alternative to plain dicts.
+
+Decoded as dicts, every tweet of a timeline carries its own copy of its
+author's profile, and every dict has room for many more keys than it
+holds. With `model=True` the responses are built, during decoding,
+from `Tweet`, `User` and `Entities` objects instead::
+
+    t = Twitter(auth=OAuth(...), model=True)
+    for tweet in t.statuses.home_timeline(count=200):
+        print(tweet.user.screen_name, tweet.full_text)
+
+These classes use `__slots__` for the fields the command line tools
+and the archiver use, keep the other fields of the response in a
+small dict, and behave like the dicts they replace (`tweet['user']`,
+`tweet.get('retweeted_status')`, `'entities' in tweet`...). All the
+tweets of a response written by the same user share the same `User`
+object. `to_dict()` gives back the plain dict.
+"""
+from __future__ import unicode_literals
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from .api import TwitterResponse
+
+
+class Model(TwitterResponse):
+    """
+    Base class of the models: a dict-like object storing the keys of
+    `FIELDS` in slots and the others in `_extra`.
+    """
+
+    __slots__ = ('headers', '_extra')
+    FIELDS = ()
+
+    def __init__(self, data):
+        fields = self._field_set
+        extra = None
+        for k, v in data.items():
+            if k in fields:
+                setattr(self, k, v)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[k] = v
+        self._extra = extra
+
+    def __getitem__(self, k):
+        if k in self._field_set:
+            try:
+                return getattr(self, k)
+            except AttributeError:
+                raise KeyError(k)
+        if self._extra is None:
+            raise KeyError(k)
+        return self._extra[k]
+
+    def __setitem__(self, k, v):
+        if k in self._field_set:
+            setattr(self, k, v)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[k] = v
+
+    def __contains__(self, k):
+        try:
+            self[k]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, k, default=None):
+        try:
+            return self[k]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = [k for k in self.FIELDS if hasattr(self, k)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def to_dict(self):
+        """Return the response data as plain dicts and lists."""
+        return dict((k, _to_plain(v)) for k, v in self.items())
+
+    def __getstate__(self):
+        # the values as they are, so that nested models stay models
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.to_dict())
+
+
+def _to_plain(value):
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _to_plain(v)) for k, v in value.items())
+    return value
+
+
+class Entities(Model):
+    FIELDS = ('hashtags', 'urls', 'user_mentions', 'symbols', 'media')
+    __slots__ = FIELDS
+
+
+class User(Model):
+    FIELDS = (
+        'id', 'id_str', 'screen_name', 'name', 'location', 'description',
+        'url', 'created_at', 'followers_count', 'friends_count',
+        'statuses_count', 'protected', 'verified')
+    __slots__ = FIELDS
+
+
+class Tweet(Model):
+    FIELDS = (
+        'id', 'id_str', 'created_at', 'text', 'full_text', 'user',
+        'entities', 'retweeted_status', 'quoted_status',
+        'in_reply_to_status_id', 'in_reply_to_screen_name', 'lang',
+        'retweet_count', 'favorite_count')
+    __slots__ = FIELDS
+
+
+for _cls in (Entities, User, Tweet):
+    _cls._field_set = frozenset(_cls.FIELDS)
+
+
+class _Builder(object):
+    """Object hook turning the dicts of one response into models."""
+
+    def __init__(self):
+        self.users = {}
+
+    def __call__(self, d):
+        if 'screen_name' in d and 'followers_count' in d:
+            user_id = d.get('id')
+            user = self.users.get(user_id)
+            if user is None:
+                user = User(d)
+                if user_id is not None:
+                    self.users[user_id] = user
+            return user
+        if 'user' in d and 'id' in d and ('text' in d or 'full_text' in d):
+            return Tweet(d)
+        if 'hashtags' in d and 'user_mentions' in d:
+            return Entities(d)
+        return d
+
+
+def loads(data):
+    """
+    Decode the JSON `data` (bytes or text) into models. This always uses
+    the stdlib decoder: it is the only one taking an object hook, and
+    converting the output of the faster ones afterwards is slower.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf8')
+    return json.loads(data, object_hook=_Builder())
+
+
+__all__ = ["Entities", "Model", "Tweet", "User"]
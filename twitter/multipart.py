@@ -0,0 +1,189 @@
+# encoding: utf-8
+"""
+multipart/form-data request bodies sent part by part.
+
+The media of an upload may be given as bytes, but also as a file object,
+a path object, an `mmap` or a `memoryview`::
+
+    t_upload.media.upload(media=open("video.mp4", "rb"))
+    t_upload.media.upload(media=pathlib.Path("animation.gif"))
+
+A string is always the content of the media, never a file name.
+
+The body is then read and sent in blocks of `BLOCK_SIZE` bytes, with
+its Content-Length computed beforehand, so uploading a large file
+doesn't need memory for the whole of it, let alone for several copies.
+"""
+from __future__ import unicode_literals
+
+import base64
+import io
+import os
+
+from .util import PY_3_OR_HIGHER, actually_bytes
+
+BOUNDARY = b"###Python-Twitter###"
+
+# A multiple of 3, so that the base64 encodings of the blocks can be
+# concatenated.
+BLOCK_SIZE = 3 * 2 ** 16
+
+try:
+    _fspath = os.fspath
+except AttributeError:
+    def _fspath(path):
+        return str(path)
+
+try:
+    from pathlib import PurePath
+except ImportError:
+    PurePath = ()
+
+
+class _Source(object):
+    """The bytes of a media, wherever they are, and how many there are."""
+
+    def __init__(self, media):
+        self.path = None
+        self.file = None
+        self.view = None
+        if hasattr(media, 'read'):
+            self.file = media
+            self.start = media.tell()
+            try:
+                self.size = os.fstat(media.fileno()).st_size - self.start
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                media.seek(0, 2)
+                self.size = media.tell() - self.start
+                media.seek(self.start)
+        elif _is_path(media):
+            self.path = _fspath(media)
+            self.size = os.path.getsize(self.path)
+        else:
+            try:
+                # bytes, memoryview, mmap and other buffers
+                view = memoryview(media)
+            except TypeError:
+                view = memoryview(actually_bytes(media))
+            if view.ndim != 1 or view.itemsize != 1:
+                try:
+                    view = view.cast('B')
+                except AttributeError:
+                    # Python 2 memoryviews can't be cast
+                    view = memoryview(view.tobytes())
+            self.view = view
+            try:
+                self.size = view.nbytes
+            except AttributeError:
+                # Python 2, where the view is one byte per item by now
+                self.size = len(view)
+
+    def __iter__(self):
+        if self.view is not None:
+            for i in range(0, self.size, BLOCK_SIZE):
+                block = self.view[i:i + BLOCK_SIZE]
+                # Python 2 can't join memoryviews, nor make bytes of them
+                yield block if PY_3_OR_HIGHER else block.tobytes()
+        elif self.path is not None:
+            with open(self.path, 'rb') as f:
+                for chunk in _read_blocks(f, self.size):
+                    yield chunk
+        else:
+            self.file.seek(self.start)
+            for chunk in _read_blocks(self.file, self.size):
+                yield chunk
+
+
+def _is_path(media):
+    # Not a string, which could name a file by chance.
+    return hasattr(media, '__fspath__') or isinstance(media, PurePath)
+
+
+def _read_blocks(f, size):
+    while size > 0:
+        chunk = f.read(min(BLOCK_SIZE, size))
+        if not chunk:
+            break
+        size -= len(chunk)
+        yield chunk
+
+
+def _base64_blocks(chunks):
+    rest = b''
+    for chunk in chunks:
+        if rest:
+            chunk = rest + bytes(chunk)
+        cut = len(chunk) - len(chunk) % 3
+        rest = bytes(chunk[cut:])
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if rest:
+        yield base64.b64encode(rest)
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data body: a media field followed by text fields.
+    Iterating over it gives its bytes, block by block, and can be done
+    again to send it again. `len()` is its Content-Length.
+    """
+
+    def __init__(self, boundary=BOUNDARY):
+        self.boundary = boundary
+        self._parts = []
+
+    @property
+    def content_type(self):
+        return b'multipart/form-data; boundary=' + self.boundary
+
+    def _head(self, name, content_type, extra=b''):
+        return (
+            b'--' + self.boundary + b'\r\n'
+            + b'Content-Disposition: form-data; name="'
+            + actually_bytes(name) + b'"\r\n'
+            + b'Content-Type: ' + content_type + b'\r\n'
+            + extra + b'\r\n')
+
+    def add_media(self, name, media, encode_base64=False, base64_encoded=False):
+        """
+        Add the media field `name`. With `encode_base64` the media is
+        base64 encoded on the fly; with either it is declared as such.
+        """
+        extra = b''
+        if encode_base64 or base64_encoded:
+            extra = b'Content-Transfer-Encoding: base64\r\n'
+        self._parts.append((
+            self._head(name, b'application/octet-stream', extra),
+            _Source(media), encode_base64))
+
+    def add_field(self, name, value):
+        self._parts.append((
+            self._head(name, b'text/plain;charset=utf-8'),
+            _Source(actually_bytes(value)), False))
+
+    def _trailer(self):
+        return b'--' + self.boundary + b'--\r\n\r\n'
+
+    def __len__(self):
+        length = len(self._trailer())
+        for head, source, encode in self._parts:
+            size = source.size
+            if encode:
+                size = 4 * ((size + 2) // 3)
+            length += len(head) + size + 2
+        return length
+
+    def __iter__(self):
+        for head, source, encode in self._parts:
+            yield head
+            if encode:
+                for chunk in _base64_blocks(source):
+                    yield chunk
+            else:
+                for chunk in source:
+                    yield chunk
+            yield b'\r\n'
+        yield self._trailer()
+
+
+__all__ = ["MultipartBody"]
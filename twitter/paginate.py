@@ -0,0 +1,169 @@
+# encoding: utf-8
+"""
+Iterate over all the pages of results of an endpoint.
+
+Twitter pages its results in three ways: with a `cursor` (followers/ids,
+friends/list, lists/members...), with the `meta.next_token` of the v2
+API, passed back as `pagination_token`, and with `max_id` for timelines
+and searches, where each page asks for tweets older than the last one
+seen, down to `since_id` when it is given. `TwitterCall.paginate`
+handles them all and yields the items of all the pages, while
+`TwitterCall.iter_pages` yields the pages themselves::
+
+    for tweet in t.statuses.user_timeline.paginate(
+            screen_name="jack", count=200, _max_items=1000):
+        print(tweet["full_text"])
+
+    for page in t.followers.ids.iter_pages(screen_name="jack"):
+        print(len(page["ids"]))
+
+The next page is requested in the background while the current one is
+consumed (pass `_prefetch=False` not to), tweets of the previous page
+aren't yielded again when `max_id` pages overlap, and the iteration
+stops after `_max_items` items or `_max_pages` pages when they are
+given.
+"""
+from __future__ import unicode_literals
+
+import numbers
+import threading
+
+# Keys of the items in the responses of cursored endpoints.
+CURSOR_ITEM_KEYS = ('ids', 'users', 'lists', 'events')
+
+
+class _Fetch(threading.Thread):
+    """A call made in a background thread."""
+
+    def __init__(self, call, kwargs):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.call = call
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.call(**self.kwargs)
+        except Exception as e:
+            self.error = e
+
+    def get(self):
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def page_items(page):
+    """Return the list of the items of a page of results."""
+    if isinstance(page, list):
+        return page
+    if 'statuses' in page:
+        # search/tweets
+        return page['statuses']
+    if 'meta' in page:
+        # API v2
+        return page.get('data', [])
+    for key in CURSOR_ITEM_KEYS:
+        if key in page:
+            return page[key]
+    for value in page.values():
+        if isinstance(value, list):
+            return value
+    return []
+
+
+def _is_cursored(page):
+    return not isinstance(page, list) and (
+        'next_cursor' in page or 'meta' in page)
+
+
+def next_page_kwargs(page, kwargs):
+    """
+    Return the arguments of the call for the page after `page`, fetched
+    with `kwargs`, or None if it was the last one, or if there is no
+    way to ask for the next one.
+    """
+    if _is_cursored(page):
+        if 'next_cursor' in page:
+            cursor = page['next_cursor']
+            return dict(kwargs, cursor=cursor) if cursor else None
+        token = (page['meta'] or {}).get('next_token')
+        return dict(kwargs, pagination_token=token) if token else None
+    try:
+        ids = [item['id'] for item in page_items(page)]
+    except (TypeError, KeyError, IndexError):
+        # neither cursor nor ids, a single page
+        return None
+    if not ids or not all(isinstance(i, numbers.Integral) for i in ids):
+        # string ids (direct messages...) can't be walked with max_id
+        return None
+    max_id = min(ids) - 1
+    if kwargs.get('max_id') is not None and max_id >= kwargs['max_id']:
+        # no older tweet on this page, the next one would be the same
+        return None
+    if kwargs.get('since_id') is not None and max_id <= kwargs['since_id']:
+        # all the tweets after since_id were seen
+        return None
+    return dict(kwargs, max_id=max_id)
+
+
+def iter_pages(call, kwargs, max_pages=None, prefetch=True, more=None):
+    """
+    Yield the pages of results of `call`. See `twitter.paginate`.
+    The page after `page` is only prefetched if `more(page)` is true.
+    """
+    pages = 0
+    fetch = None
+    while kwargs is not None:
+        page = call(**kwargs) if fetch is None else fetch.get()
+        pages += 1
+        kwargs = next_page_kwargs(page, kwargs)
+        if max_pages is not None and pages >= max_pages:
+            kwargs = None
+        fetch = None
+        if kwargs is not None and prefetch and (more is None or more(page)):
+            fetch = _Fetch(call, kwargs)
+            fetch.start()
+        yield page
+
+
+def paginate(call, kwargs, max_items=None, max_pages=None, prefetch=True):
+    """Yield the items of all the pages of `call`. See `twitter.paginate`."""
+    if max_items is not None and max_items <= 0:
+        return
+    # ids of the previous page, which the next one of a max_id
+    # pagination may repeat
+    previous = set()
+    count = [0]
+
+    def more(page):
+        # the next page is likely not needed when this one completes
+        # the budget
+        return count[0] + len(page_items(page)) < max_items
+
+    pages = iter_pages(call, kwargs, max_pages, prefetch,
+                       more if max_items is not None else None)
+    for page in pages:
+        dedupe = not _is_cursored(page)
+        current = set()
+        for item in page_items(page):
+            if dedupe:
+                try:
+                    key = item['id']
+                except (TypeError, KeyError, IndexError):
+                    pass
+                else:
+                    current.add(key)
+                    if key in previous:
+                        continue
+            count[0] += 1
+            yield item
+            if max_items is not None and count[0] >= max_items:
+                return
+        previous = current
+
+
+__all__ = ["iter_pages", "paginate"]
@@ -0,0 +1,198 @@
+# encoding: utf-8
+"""
+Proactive rate limiting from the X-Rate-Limit-* response headers.
+
+Twitter tells, with every response, how many calls are left for the
+endpoint in the current 15 minutes window and when that window ends.
+A `RateLimitScheduler` keeps that information per endpoint family
+(statuses/user_timeline, users/lookup, followers/ids...) and makes the
+calls wait for the next window once the quota is exhausted, instead of
+sending them to get a 429 back::
+
+    t = Twitter(auth=OAuth(...), rate_limit=True)
+
+The scheduler is thread-safe: threads sharing a `Twitter` object, or a
+scheduler passed to several of them, coordinate through it. With
+`pace=True` the remaining calls are also spread evenly over the window
+rather than sent in a burst.
+"""
+from __future__ import unicode_literals
+
+import threading
+from time import sleep, time
+
+# Length of a rate limit window, used until the server tells otherwise.
+WINDOW = 15 * 60
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket(object):
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = 0
+        self.next_slot = 0
+        # No call can be sent before this time: the window the calls are
+        # booked into starts then.
+        self.start = 0
+        # True while reset is our own guess rather than the server's.
+        self.estimated = False
+
+
+class RateLimitScheduler(object):
+    """
+    Token buckets, one per endpoint family, filled from the rate limit
+    headers of the responses.
+
+    `margin` is the number of seconds waited after the announced reset
+    time, to allow for clock differences with the servers.
+    """
+
+    def __init__(self, pace=False, margin=1.0):
+        self.pace = pace
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def __getstate__(self):
+        return {'pace': self.pace, 'margin': self.margin}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def reserve(self, family, now=None):
+        """
+        Book a call to the endpoint `family` and return the number of
+        seconds to wait before sending it.
+        """
+        if now is None:
+            now = time()
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None or bucket.remaining is None:
+                return 0
+            if now >= bucket.reset:
+                # The window is over; assume a full quota until the
+                # next response says otherwise.
+                if bucket.limit is None:
+                    bucket.remaining = None
+                    return 0
+                bucket.remaining = bucket.limit
+                bucket.reset = now + WINDOW
+                bucket.next_slot = now
+                bucket.estimated = True
+            if bucket.remaining > 0:
+                bucket.remaining -= 1
+                earliest = max(now, bucket.start)
+                if not self.pace:
+                    return earliest - now
+                slot = max(earliest, bucket.next_slot)
+                bucket.next_slot = slot + (
+                    (bucket.reset - slot) / (bucket.remaining + 1))
+                return slot - now
+            # Quota exhausted: this call opens the next window, and all
+            # the calls booked into it wait for its start.
+            start = bucket.start = bucket.reset + self.margin
+            bucket.reset = start + WINDOW
+            bucket.remaining = (bucket.limit or 1) - 1
+            bucket.next_slot = start
+            bucket.estimated = True
+            return start - now
+
+    def peek(self, family, now=None):
+        """
+        Return the number of calls to the endpoint `family` left in the
+        window (None if unknown) and the number of seconds to wait
+        before the next one can be sent, without booking it.
+        """
+        if now is None:
+            now = time()
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None or bucket.remaining is None:
+                return None, 0
+            if now >= bucket.reset:
+                return bucket.limit, 0
+            if bucket.remaining > 0:
+                return bucket.remaining, max(0, bucket.start - now)
+            return 0, bucket.reset + self.margin - now
+
+    def cancel(self, family):
+        """Give back a call booked by `reserve` but not sent."""
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None or bucket.remaining is None:
+                return
+            bucket.remaining += 1
+            if bucket.limit is not None:
+                bucket.remaining = min(bucket.remaining, bucket.limit)
+
+    def acquire(self, family, deadline=None):
+        """
+        Wait until a call to the endpoint `family` can be sent and return
+        True, or return False at once, without booking the call, if that
+        would be after `deadline` (a `time()`).
+        """
+        now = time()
+        delay = self.reserve(family, now)
+        if delay > 0:
+            if deadline is not None and now + delay > deadline:
+                self.cancel(family)
+                return False
+            sleep(delay)
+        return True
+
+    def update(self, family, headers):
+        """
+        Record the rate limit headers of a response (successful or not)
+        of the endpoint `family`.
+        """
+        remaining = _header_int(headers, 'X-Rate-Limit-Remaining')
+        reset = _header_int(headers, 'X-Rate-Limit-Reset')
+        if remaining is None or reset is None:
+            return
+        limit = _header_int(headers, 'X-Rate-Limit-Limit')
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None:
+                bucket = self._buckets[family] = _Bucket()
+            if reset < bucket.start:
+                # Late answer from before the window the calls are
+                # booked into.
+                return
+            if bucket.remaining is None or bucket.estimated or (
+                    reset > bucket.reset + 1):
+                bucket.remaining = remaining
+                bucket.reset = reset
+                bucket.next_slot = 0
+                bucket.estimated = False
+            elif reset < bucket.reset - 1:
+                # Late answer from a previous window.
+                pass
+            else:
+                # Calls booked but not answered yet aren't counted by the
+                # server, keep the lowest figure.
+                bucket.remaining = min(bucket.remaining, remaining)
+            if limit is not None:
+                bucket.limit = limit
+
+    def status(self, family):
+        """
+        Return (limit, remaining, reset) for the endpoint `family`, or
+        None if it hasn't been called yet.
+        """
+        with self._lock:
+            bucket = self._buckets.get(family)
+            if bucket is None or bucket.remaining is None:
+                return None
+            return bucket.limit, bucket.remaining, bucket.reset
+
+
+__all__ = ["RateLimitScheduler"]
@@ -0,0 +1,307 @@
+# encoding: utf-8
+"""
+Retries of failed calls with jittered backoff, a retry budget and a
+circuit breaker per host.
+
+Passing `retry=True` (or a number of retries) to `Twitter` waits a fixed
+time after each failure. A `RetryPolicy` decides instead, and is shared
+by all the calls of the object, or of several objects::
+
+    policy = RetryPolicy(max_retries=5, max_time=120,
+                         budget=RetryBudget(ratio=0.1))
+    t = Twitter(auth=OAuth(...), retry=policy)
+
+With it:
+
+- the delay between two attempts is drawn with "decorrelated jitter"
+  between `base` and three times the previous delay (up to `cap`), so
+  that clients failing at the same moment don't retry in lockstep;
+- a `Retry-After` header, or the X-Rate-Limit-Reset header of a 429
+  response, tells how long to wait instead;
+- a call isn't retried once `max_time` seconds have passed since it was
+  first sent, or when the wait would go past that;
+- with a `RetryBudget`, retries can't exceed a share of the calls made
+  recently, which stops clients from multiplying the load of a server
+  in trouble;
+- after `failure_threshold` failures in a row (network errors and 5xx
+  answers) the circuit of a host opens: calls to it fail at once with a
+  `CircuitOpenError` for `reset_timeout` seconds, after which a single
+  call is let through to probe the host.
+
+Errors which can't be retried (4xx other than 429) are raised as is.
+Only the calls whose HTTP method is in `retry_methods` (GET, HEAD and
+DELETE) are retried after any failure: sending a POST again after an
+error may post the same tweet twice. The others are only retried when
+the server tells it didn't handle them, with a 429 answer or a 503 with
+a Retry-After header. Pass `retry_methods=None` to retry every call.
+"""
+from __future__ import unicode_literals
+
+import random
+import threading
+from collections import deque
+from email.utils import mktime_tz, parsedate_tz
+from time import time
+
+from .api import TwitterError, TwitterHTTPError
+
+# Status codes of the answers worth retrying.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Methods of the calls which can be sent again whatever the failure.
+RETRY_METHODS = ('GET', 'HEAD', 'DELETE')
+
+
+class CircuitOpenError(TwitterError):
+    """
+    Raised instead of sending a call to a host whose circuit is open
+    because its last calls failed.
+    """
+
+    def __init__(self, host, retry_in):
+        self.host = host
+        self.retry_in = retry_in
+        TwitterError.__init__(
+            self, "Circuit open for %s, retry in %.1fs" % (host, retry_in))
+
+
+def retry_after(headers, now=None):
+    """
+    Return the number of seconds a `Retry-After` header (a number of
+    seconds or an HTTP date) asks to wait, or None.
+    """
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, mktime_tz(date) - (time() if now is None else now))
+
+
+class RetryBudget(object):
+    """
+    Allows, over the last `ttl` seconds, `ratio` retries per call plus
+    `min_per_second` retries per second. Share one between clients to
+    cap their retries together.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, ttl=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._retries = deque()
+
+    def __getstate__(self):
+        return {'ratio': self.ratio, 'min_per_second': self.min_per_second,
+                'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _expire(self, now):
+        for times in (self._calls, self._retries):
+            while times and times[0] <= now - self.ttl:
+                times.popleft()
+
+    def deposit(self, now=None):
+        """Count a call."""
+        now = time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._calls.append(now)
+
+    def withdraw(self, now=None):
+        """Count a retry and return True if the budget allows it."""
+        now = time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            allowed = (self.min_per_second * self.ttl
+                       + self.ratio * len(self._calls))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker(object):
+    """
+    The state of the calls to one host: closed (calls go through), open
+    (calls fail fast) or half-open (one call goes through, as a probe).
+    """
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def check(self, now=None):
+        """Raise a CircuitOpenError if a call can't go through now."""
+        now = time() if now is None else now
+        with self._lock:
+            if self.opened_at is None:
+                return
+            retry_in = self.opened_at + self.reset_timeout - now
+            if retry_in <= 0:
+                # let this call through as a probe, and no other one
+                # before it is over or another timeout has passed
+                self.opened_at = now
+                return
+            raise CircuitOpenError(self.host, retry_in)
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self, now=None):
+        now = time() if now is None else now
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = now
+
+
+def _is_failure(e):
+    """Whether e tells that the server is in trouble."""
+    if isinstance(e, TwitterHTTPError):
+        return e.e.code >= 500
+    return True
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when to retry failed calls. See `twitter.retry`.
+
+    `max_retries` and `max_time` limit the retries of each call (None
+    for no limit); `base` and `cap` bound the delays between attempts.
+    `budget` is an optional `RetryBudget`. `failure_threshold` and
+    `reset_timeout` set up the circuit breakers; a `failure_threshold`
+    of 0 disables them. `retry_methods` are the HTTP methods of the
+    calls which are safe to send twice, None for all of them.
+    """
+
+    def __init__(self, max_retries=5, max_time=300.0, base=1.0, cap=60.0,
+                 budget=None, failure_threshold=5, reset_timeout=30.0,
+                 retry_statuses=RETRY_STATUSES, retry_methods=RETRY_METHODS):
+        self.max_retries = max_retries
+        self.max_time = max_time
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_statuses = retry_statuses
+        self.retry_methods = retry_methods
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_breakers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def breaker(self, host):
+        """Return the `CircuitBreaker` of `host`, or None if disabled."""
+        if not self.failure_threshold:
+            return None
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(
+                    host, self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def next_delay(self, delay):
+        """Return the delay to wait after waiting `delay` last time."""
+        return min(self.cap, random.uniform(self.base, delay * 3))
+
+    def start(self, host, method='GET'):
+        """Return the `RetryState` of a `method` call to `host`."""
+        return RetryState(self, host, method)
+
+
+class RetryState(object):
+    """
+    The retries of one call. `check()` before each attempt, then either
+    `succeeded()` or `failed(e)`, which re-raises e or returns the time
+    to wait before the next attempt.
+    """
+
+    def __init__(self, policy, host, method='GET'):
+        self.policy = policy
+        self.breaker = policy.breaker(host)
+        self.idempotent = (policy.retry_methods is None
+                           or method.upper() in policy.retry_methods)
+        self.started = time()
+        self.retries = 0
+        self.delay = policy.base
+        if policy.budget is not None:
+            policy.budget.deposit(self.started)
+
+    def check(self):
+        if self.breaker is not None:
+            self.breaker.check()
+
+    def succeeded(self):
+        if self.breaker is not None:
+            self.breaker.success()
+
+    def failed(self, e):
+        policy = self.policy
+        http_error = isinstance(e, TwitterHTTPError)
+        if self.breaker is not None:
+            if _is_failure(e):
+                self.breaker.failure()
+            else:
+                # the host answered, even if it was to say no
+                self.breaker.success()
+        if http_error and e.e.code not in policy.retry_statuses:
+            raise e
+        if policy.max_retries is not None and self.retries >= policy.max_retries:
+            raise e
+        now = time()
+        wait = retry_after(e.e.headers, now) if http_error else None
+        if not self.idempotent and not (http_error and (
+                e.e.code == 429 or (e.e.code == 503 and wait is not None))):
+            # the call may have been handled before failing
+            raise e
+        if wait is None and http_error and e.e.code == 429:
+            try:
+                wait = max(0.0, int(e.e.headers.get('X-Rate-Limit-Reset'))
+                           - now + 1)
+            except (TypeError, ValueError):
+                pass
+        if wait is None:
+            wait = self.delay = policy.next_delay(self.delay)
+        if (policy.max_time is not None
+                and now + wait - self.started > policy.max_time):
+            raise e
+        if policy.budget is not None and not policy.budget.withdraw(now):
+            raise e
+        self.retries += 1
+        return wait
+
+
+__all__ = ["CircuitOpenError", "RetryBudget", "RetryPolicy"]
@@ -0,0 +1,92 @@
+# encoding: utf-8
+"""
+Coalescing of identical API calls made at the same time.
+
+When several threads sharing a `Twitter` object ask for the same thing
+at the same moment, e.g. `users.show(screen_name="jack")`, each of them
+normally sends its own request and spends its own share of the rate
+limit. With `single_flight=True` the first of these calls is sent and
+the others wait for its response::
+
+    t = Twitter(auth=OAuth(...), single_flight=True)
+
+Only GET calls without media are coalesced. Two calls are identical
+when they have the same credentials, URL, parameters, and `raw`/`model`
+settings; the OAuth nonce, timestamp and signature don't matter. All
+the callers get the very same response object (or the same exception),
+so it is best not to modify it. A caller with a deadline stops waiting
+for the response of another one at its deadline.
+"""
+from __future__ import unicode_literals
+
+import threading
+from time import time
+
+
+class FlightTimeout(Exception):
+    """Raised when the call waited for isn't over by the deadline."""
+
+
+class _Flight(object):
+    """A call in progress and, once it is over, its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs at most one call at a time per key, the callers coming while it
+    runs sharing its outcome. `coalesced` counts the calls which didn't
+    have to be made.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.coalesced = 0
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Return fn(*args), unless a call with the same key is running:
+        then wait for it and return (or raise) what it returns, or raise
+        a FlightTimeout if it isn't over by the `deadline` (a `time()`)
+        keyword argument.
+        """
+        deadline = kwargs.get('deadline')
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            if deadline is None:
+                flight.done.wait()
+            elif not flight.done.wait(max(0, deadline - time())):
+                raise FlightTimeout(key)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn(*args)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+
+__all__ = ["FlightTimeout", "SingleFlight"]
@@ -3,22 +3,11 @@ from __future__ import unicode_literals
 
 from .util import PY_3_OR_HIGHER
 
-try:
-    import ssl
-except ImportError:
-    _HAVE_SSL = False
-else:
-    _HAVE_SSL = True
-
 if PY_3_OR_HIGHER:
-    import urllib.request as urllib_request
     import urllib.error as urllib_error
 else:
-    import urllib2 as urllib_request
     import urllib2 as urllib_error
 
-import certifi
-
 import json
 from ssl import SSLError
 import socket
@@ -26,6 +15,10 @@ import codecs
 import select, time
 
 from .api import TwitterCall, wrap_response, TwitterHTTPError
+from .connection import ssl_context
+from .transport import URLLIB
+
+READ_SIZE = 65536
 
 CRLF = b'\r\n'
 MIN_SOCK_TIMEOUT = 0.0  # Apparenty select with zero wait is okay!
@@ -92,13 +85,56 @@ class HttpChunkDecoder(object):
 
 class JsonDecoder(object):
 
-    def __init__(self):
+    def __init__(self, json_backend=None):
         self.buf = ""
+        # data received since self.buf, which can't end a message
+        self.pending = []
         self.raw_decode = json.JSONDecoder().raw_decode
+        if json_backend is None or json_backend.name == 'json':
+            self.loads = None
+        else:
+            self.loads = json_backend.loads
 
     def decode(self, data):
-        chunks = []
+        # Parsing the partial message again for each piece of a large
+        # one would take quadratic time: wait for a newline, or a piece
+        # which may end a message.
+        if '\n' not in data and not data.rstrip().endswith(('}', ']')):
+            self.pending.append(data)
+            return []
+        if self.pending:
+            self.pending.append(data)
+            data = ''.join(self.pending)
+            self.pending = []
         buf = self.buf + data
+        if self.loads is None:
+            chunks, self.buf = self._raw_decode_all(buf)
+            return chunks
+        # Messages end with a newline: decode each complete line with
+        # the backend, which has no raw_decode.
+        lines = buf.split('\n')
+        self.buf = lines.pop()
+        chunks = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chunks.append(self.loads(line))
+            except ValueError:
+                # several messages on one line
+                chunks.extend(self._raw_decode_all(line)[0])
+        if self.buf.rstrip().endswith(('}', ']')):
+            # the last message may be complete without its newline yet
+            try:
+                chunks.append(self.loads(self.buf))
+                self.buf = ""
+            except ValueError:
+                pass
+        return chunks
+
+    def _raw_decode_all(self, buf):
+        chunks = []
         while True:
             try:
                 buf = buf.lstrip()
@@ -107,8 +143,7 @@ class JsonDecoder(object):
                 chunks.append(res)
             except ValueError:
                 break
-        self.buf = buf
-        return chunks
+        return chunks, buf
 
 
 class Timer(object):
@@ -150,10 +185,45 @@ class SockReader(object):
         return bytearray()
 
 
+class HandleReader(object):
+    """
+    Reads the body of a stream from the response of a transport other
+    than urllib, as it comes. The reads block: the timeouts are only
+    noticed between them.
+    """
+
+    def __init__(self, handle):
+        self._read = getattr(handle, 'read1', None) or handle.read
+
+    def read(self):
+        return self._read(READ_SIZE)
+
+
+class PlainDecoder(object):
+    """The HttpChunkDecoder of bodies which aren't chunked any more."""
+
+    def decode(self, data):  # -> (bytearray, end_of_stream, decode_error)
+        return bytearray(data), not data, False
+
+
+def _stream_socket(handle):
+    """The socket of a urllib response, if handle is one."""
+    try:
+        if PY_3_OR_HIGHER:
+            return handle.fp.raw._sock
+        return handle.fp._sock.fp._sock
+    except AttributeError:
+        return None
+
+
 class TwitterJSONIter(object):
 
-    def __init__(self, handle, uri, arg_data, block, timeout, heartbeat_timeout):
+    def __init__(self, handle, uri, arg_data, block, timeout, heartbeat_timeout,
+                 json_backend=None, trace=None, hooks=()):
         self.handle = handle
+        self.json_backend = json_backend
+        self.trace = trace
+        self.hooks = hooks
         self.uri = uri
         self.arg_data = arg_data
         self.timeout_token = Timeout
@@ -171,15 +241,22 @@ class TwitterJSONIter(object):
         timeouts = [t for t in (self.timeout, self.heartbeat_timeout, MAX_SOCK_TIMEOUT)
                     if t is not None]
         sock_timeout = min(*timeouts)
-        sock = self.handle.fp.raw._sock if PY_3_OR_HIGHER else self.handle.fp._sock.fp._sock
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock = _stream_socket(self.handle)
         headers = self.handle.headers
-        sock_reader = SockReader(sock, sock_timeout)
-        chunk_decoder = HttpChunkDecoder()
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            sock_reader = SockReader(sock, sock_timeout)
+            chunk_decoder = HttpChunkDecoder()
+        else:
+            sock_reader = HandleReader(self.handle)
+            chunk_decoder = PlainDecoder()
         utf8_decoder = codecs.getincrementaldecoder("utf-8")()
-        json_decoder = JsonDecoder()
+        json_decoder = JsonDecoder(self.json_backend)
         timer = Timer(self.timeout)
         heartbeat_timer = Timer(self.heartbeat_timeout)
+        trace = self.trace
+        on_message = [hook.stream_message for hook in self.hooks
+                      if hasattr(hook, 'stream_message')]
 
         while True:
             # Decode all the things:
@@ -194,6 +271,8 @@ class TwitterJSONIter(object):
 
             # Yield data-like things:
             for json_obj in json_data:
+                for callback in on_message:
+                    callback(trace)
                 yield wrap_response(json_obj, headers)
 
             # Reset timers:
@@ -216,19 +295,23 @@ class TwitterJSONIter(object):
                 yield self.timeout_token
 
 
-def handle_stream_response(req, uri, arg_data, block, timeout, heartbeat_timeout, verify_context=True):
+def handle_stream_response(req, uri, arg_data, block, timeout, heartbeat_timeout, verify_context=True,
+                           json_backend=None, trace=None, hooks=(), transport=None):
+    if trace is not None:
+        trace.stream = True
+    if transport is None:
+        transport = URLLIB
     try:
-        context = None
-        if _HAVE_SSL:
-            if not verify_context:
-                context = ssl._create_unverified_context()
-            else:
-                context = ssl.create_default_context()
-                context.load_verify_locations(cafile=certifi.where())
-        handle = urllib_request.urlopen(req, context=context)
+        handle = transport.urlopen(
+            req, context=ssl_context(verify_context), trace=trace)
     except urllib_error.HTTPError as e:
+        if trace is not None:
+            trace.response(e.code, e.headers)
         raise TwitterHTTPError(e, uri, 'json', arg_data)
-    return iter(TwitterJSONIter(handle, uri, arg_data, block, timeout, heartbeat_timeout))
+    if trace is not None:
+        trace.response(handle.getcode(), handle.headers)
+    return iter(TwitterJSONIter(handle, uri, arg_data, block, timeout, heartbeat_timeout,
+                                json_backend, trace, hooks))
 
 class TwitterStream(TwitterCall):
     """
@@ -268,20 +351,35 @@ class TwitterStream(TwitterCall):
     this mode, the iterator always yields immediately. It returns
     stream data, or `None`. Note that `timeout` supercedes this
     argument, so it should also be set `None` to use this mode.
+
+    The `json_backend` parameter chooses the library decoding the
+    messages, `hooks` the functions called with the trace of each
+    connection to the stream (up to its headers), and `transport` the
+    transport sending the requests, as for the Twitter class. The
+    `timeout` and `block` settings need the default transport.
     """
     def __init__(self, domain="stream.twitter.com", secure=True, auth=None,
                  api_version='1.1', block=True, timeout=None,
-                 heartbeat_timeout=90.0, verify_context=True):
+                 heartbeat_timeout=90.0, verify_context=True, json_backend=None,
+                 hooks=None, transport=None):
         uriparts = (str(api_version),)
 
         class TwitterStreamCall(TwitterCall):
             def _handle_response(self, req, uri, arg_data, _timeout=None):
+                if self.hooks:
+                    return self._traced(self._open_stream, req, 0,
+                                        uri, arg_data, _timeout)
+                return self._open_stream(req, uri, arg_data, _timeout)
+
+            def _open_stream(self, req, uri, arg_data, _timeout, trace=None):
                 return handle_stream_response(
                     req, uri, arg_data, block,
-                    _timeout or timeout, heartbeat_timeout, verify_context)
+                    _timeout or timeout, heartbeat_timeout, verify_context,
+                    self.json_backend, trace, self.hooks, self.transport)
 
         TwitterCall.__init__(
             self, auth=auth, format="json", domain=domain,
             callable_cls=TwitterStreamCall,
             secure=secure, uriparts=uriparts, timeout=timeout, gzip=False,
-            retry=False, verify_context=verify_context)
+            retry=False, verify_context=verify_context,
+            json_backend=json_backend, hooks=hooks, transport=transport)
@@ -0,0 +1,138 @@
+# encoding: utf-8
+"""
+Timings of the requests sent by the API classes.
+
+Pass one or several functions as the `hooks` of a `Twitter` or
+`TwitterStream` object and each of them is called with a `RequestTrace`
+once every request made through it is over::
+
+    def log_slow(trace):
+        if trace.total > 1:
+            print(trace.method, trace.endpoint, trace.as_dict())
+
+    t = Twitter(auth=OAuth(...), keep_alive=True, hooks=log_slow)
+
+A trace tells which endpoint was called, its status, the size of the
+bodies sent and received, the rate limit headers and where the time
+went: DNS lookup, TCP connect, TLS handshake, time to the first byte of
+the response, body read, decompression and JSON decoding. The DNS,
+connect and TLS phases are only known for the connections of a
+connection pool (`keep_alive`); they are None when the connection was
+reused, and without a pool `ttfb` includes the connection. The phases
+of a stream stop at its headers.
+
+Calls answered from the response cache don't send any request and
+aren't traced. When no hook is given, no trace is made at all.
+
+A hook may also be an object with, besides its `__call__`, methods
+called at other times: `request_started(trace)` before the request is
+sent, and `stream_message(trace)` for each message read from a stream.
+`twitter.metrics.Metrics` is such a hook.
+"""
+from __future__ import unicode_literals
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'body', 'decompress', 'decode')
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def body_length(body):
+    """Return the number of bytes of a request body."""
+    if body is None:
+        return 0
+    return len(body)
+
+
+class RequestTrace(object):
+    """
+    What happened during one request. The phases are durations in
+    seconds, None when they didn't happen or couldn't be measured.
+
+    `retries` is the number of attempts of the same call made before
+    this request, and `error` the exception it ended with, if any.
+    """
+
+    def __init__(self, endpoint, method, retries=0, bytes_out=0):
+        self.endpoint = endpoint
+        self.method = method
+        self.retries = retries
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+        self.status = None
+        self.stream = False
+        self.reused = None
+        self.error = None
+        self.rate_limit_limit = None
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = None
+        for phase in PHASES:
+            setattr(self, phase, None)
+        self.total = None
+        self._start = clock()
+
+    def response(self, status, headers):
+        """Note the status and rate limit headers of the response."""
+        self.status = status
+        self.rate_limit_limit = _header_int(headers, 'X-Rate-Limit-Limit')
+        self.rate_limit_remaining = _header_int(
+            headers, 'X-Rate-Limit-Remaining')
+        self.rate_limit_reset = _header_int(headers, 'X-Rate-Limit-Reset')
+
+    def timed_decompress(self, decompress):
+        """
+        Wrap the `decompress` function of a body so that its time is
+        added to the `decompress` phase and its input to `bytes_in`.
+        """
+        self.decompress = 0.0
+
+        def timed(data):
+            start = clock()
+            data_out = decompress(data)
+            self.decompress += clock() - start
+            self.bytes_in += len(data)
+            return data_out
+        return timed
+
+    def done(self):
+        self.total = clock() - self._start
+
+    def as_dict(self):
+        d = dict(
+            (k, v) for k, v in self.__dict__.items() if not k.startswith('_'))
+        if d['error'] is not None:
+            d['error'] = repr(d['error'])
+        return d
+
+    def __repr__(self):
+        return "<RequestTrace %s %s %s %.3fs>" % (
+            self.method, self.endpoint, self.status, self.total or 0)
+
+
+def notify(hooks, event, trace):
+    """Call the `event` method of the hooks which have one."""
+    for hook in hooks:
+        method = getattr(hook, event, None)
+        if method is not None:
+            method(trace)
+
+
+def as_hooks(hooks):
+    """Return `hooks`, a function or a sequence of them, as a tuple."""
+    if not hooks:
+        return ()
+    if callable(hooks):
+        return (hooks,)
+    return tuple(hooks)
+
+
+__all__ = ["RequestTrace"]
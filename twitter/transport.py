@@ -0,0 +1,207 @@
+# encoding: utf-8
+"""
+The HTTP transports sending the requests of the API classes.
+
+A transport is any object with an `urlopen` method like this one::
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        ...
+
+It sends `req`, a `Request` (a `urllib` request knowing its method, and
+maybe a `deadline`), with a socket `timeout` in seconds and the SSL
+`context` to use, and returns the response once its headers are in:
+an object with `headers` (with a `get()` method), `getcode()`, and
+`read(amt=None)` for the body, or `read1(amt)` returning what is
+available. Non-2xx statuses are raised as `urllib` `HTTPError`s and
+network errors as `URLError`s. `trace`, when not None, is the
+`twitter.trace.RequestTrace` of the request, to fill with the timings
+known to the transport.
+
+Three transports come with this package:
+
+- `UrllibTransport`, which calls `urlopen` and is used by default,
+- `twitter.connection.ConnectionPool`, which keeps connections alive
+  and is used with `keep_alive=True`,
+- `MemoryTransport`, which answers from canned responses without any
+  network, for tests and for benchmarking the client itself.
+
+`twitter.cassette` adds transports recording real traffic and replaying
+it offline.
+
+Pass another one, e.g. an adapter to a faster HTTP library, as the
+`transport` of `Twitter` or `TwitterStream`.
+"""
+from __future__ import unicode_literals
+
+import email.message
+import json
+import threading
+from io import BytesIO
+
+try:
+    import urllib.request as urllib_request
+    import urllib.error as urllib_error
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urllib2 as urllib_request
+    import urllib2 as urllib_error
+    import urlparse as urllib_parse
+
+from .trace import clock
+from .util import actually_bytes
+
+
+class Request(urllib_request.Request):
+    """
+    A `urllib` request with its HTTP `method`, which Python 2 requests
+    can't be given, the `deadline` (a `time()`) of its call, and the
+    `rate_limit` scheduler of its credential when it is pooled.
+    """
+
+    def __init__(self, url, data=None, headers={}, method='GET'):
+        urllib_request.Request.__init__(self, url, data=data, headers=headers)
+        self.method = method
+        self.deadline = None
+        self.rate_limit = None
+
+    def get_method(self):
+        return self.method
+
+
+class UrllibTransport(object):
+    """Sends each request with `urllib` `urlopen`, on a new connection."""
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        kwargs = {'context': context}
+        if timeout:
+            kwargs['timeout'] = timeout
+        if trace is None:
+            return urllib_request.urlopen(req, **kwargs)
+        start = clock()
+        try:
+            return urllib_request.urlopen(req, **kwargs)
+        finally:
+            trace.ttfb = clock() - start
+
+
+URLLIB = UrllibTransport()
+
+
+def make_headers(headers):
+    """Return the (name, value) pairs `headers` as a message object."""
+    message = email.message.Message()
+    for name, value in headers:
+        message[name] = value
+    return message
+
+
+class MemoryResponse(object):
+    """
+    A response made of `status`, `headers` (a dict or (name, value)
+    pairs) and a body given as bytes, or as a list of chunks of bytes
+    which are read one at a time, like the messages of a stream.
+    """
+
+    def __init__(self, status=200, headers=(), body=b'', url=None):
+        self.code = self.status = status
+        self.reason = self.msg = 'OK' if status < 400 else 'Error'
+        if isinstance(headers, dict):
+            headers = headers.items()
+        self.headers = make_headers(headers)
+        if isinstance(body, (bytes, bytearray)):
+            body = [body]
+        self._chunks = list(body)
+        self.url = url
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def read(self, amt=None):
+        if amt is None:
+            data, self._chunks = b''.join(self._chunks), []
+            return data
+        return self.read1(amt)
+
+    def read1(self, amt=-1):
+        while self._chunks and not self._chunks[0]:
+            self._chunks.pop(0)
+        if not self._chunks:
+            return b''
+        chunk = self._chunks[0]
+        if amt is None or amt < 0 or amt >= len(chunk):
+            return self._chunks.pop(0)
+        self._chunks[0] = chunk[amt:]
+        return chunk[:amt]
+
+    def close(self):
+        self._chunks = []
+
+
+def json_response(data, status=200, headers=()):
+    """Return a MemoryResponse whose body is the JSON of `data`."""
+    headers = dict(headers)
+    headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+    return MemoryResponse(
+        status, headers, actually_bytes(json.dumps(data)))
+
+
+class MemoryTransport(object):
+    """
+    Answers the requests from responses added beforehand for a method
+    and a URL path (without the query string, e.g.
+    "/1.1/users/show.json"), and records them in `requests`::
+
+        transport = MemoryTransport()
+        transport.add("GET", "/1.1/users/show.json", {"id": 12})
+        t = Twitter(transport=transport)
+        assert t.users.show(screen_name="jack")["id"] == 12
+
+    A response is a `MemoryResponse`, data to return as JSON, or a
+    function called with the request and returning one of those. The
+    same response is given to every matching request; the others get
+    a 404.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.requests = []
+
+    def add(self, method, path, response):
+        self._routes[(method, path)] = response
+
+    def urlopen(self, req, timeout=None, context=None, trace=None):
+        url = req.get_full_url()
+        with self._lock:
+            self.requests.append(req)
+        response = self._routes.get(
+            (req.get_method(), urllib_parse.urlsplit(url).path))
+        if callable(response):
+            response = response(req)
+        if response is None:
+            response = json_response(
+                {"errors": [{"message": "Sorry, that page does not exist",
+                             "code": 34}]}, 404)
+        elif not isinstance(response, MemoryResponse):
+            response = json_response(response)
+        else:
+            # a copy, so that the response can be read again next time
+            response = MemoryResponse(
+                response.code, response.headers.items(), response._chunks)
+        response.url = url
+        if trace is not None:
+            trace.ttfb = 0.0
+        if not 200 <= response.code < 300:
+            raise urllib_error.HTTPError(
+                url, response.code, response.reason, response.headers,
+                BytesIO(response.read()))
+        return response
+
+
+__all__ = ["MemoryResponse", "MemoryTransport", "Request", "UrllibTransport"]
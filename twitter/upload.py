@@ -0,0 +1,253 @@
+# encoding: utf-8
+"""
+Chunked media upload (INIT, APPEND, FINALIZE, STATUS) of large files.
+
+`Twitter.upload_media` uploads a video, GIF or image file through the
+chunked upload endpoint of upload.twitter.com and returns the final
+response, holding the `media_id_string` to attach to a tweet::
+
+    t_upload = Twitter(domain='upload.twitter.com', auth=OAuth(...))
+    media = t_upload.upload_media("video.mp4")
+    t.statuses.update(status="...", media_ids=media["media_id_string"])
+
+The file is sent in segments of `segment_size` bytes, several of them at
+the same time over kept-alive connections. A segment which fails
+because of a network error or a 5xx/429 answer is sent again, up to
+`retries` times. The progress is saved in a small JSON file next to the
+media (or wherever `state_path` says), so that when an upload is
+interrupted, calling `upload_media` again only sends the missing
+segments, as long as the media id hasn't expired.
+"""
+from __future__ import unicode_literals
+
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+from time import sleep, time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+from .api import TwitterError, TwitterHTTPError, TwitterTimeoutError
+
+SEGMENT_SIZE = 4 * 1024 * 1024
+STATE_SUFFIX = '.twupload'
+
+
+class FileSegment(object):
+    """A part of an open file, which reads like a file of its own."""
+
+    def __init__(self, f, offset, size):
+        self._f = f
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(0, min(pos, self.size))
+        return self.pos
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.size - self.pos
+        n = min(n, self.size - self.pos)
+        self._f.seek(self.offset + self.pos)
+        data = self._f.read(n)
+        self.pos += len(data)
+        return data
+
+
+def media_category_for(media_type):
+    if media_type.startswith('video/'):
+        return 'tweet_video'
+    if media_type == 'image/gif':
+        return 'tweet_gif'
+    return 'tweet_image'
+
+
+def _retriable(e):
+    if isinstance(e, TwitterHTTPError):
+        return e.e.code == 429 or e.e.code >= 500
+    return isinstance(e, (urllib_error.URLError, IOError))
+
+
+class MediaUpload(object):
+    """
+    The chunked upload of the file at `path` with the upload.twitter.com
+    client `twitter`. See `twitter.upload`.
+    """
+
+    def __init__(self, twitter, path, media_type=None, media_category=None,
+                 segment_size=SEGMENT_SIZE, max_concurrency=4, retries=3,
+                 state_path=None):
+        self.twitter = twitter
+        self.path = path
+        self.media_type = (
+            media_type or mimetypes.guess_type(path)[0]
+            or 'application/octet-stream')
+        self.media_category = (
+            media_category or media_category_for(self.media_type))
+        self.segment_size = segment_size
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.state_path = state_path or path + STATE_SUFFIX
+        self._lock = threading.Lock()
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.state = None
+
+    @property
+    def segments(self):
+        return max(1, -(-self.size // self.segment_size))
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if (state.get('size') != self.size
+                or state.get('mtime') != self.mtime
+                or state.get('segment_size') != self.segment_size
+                or state.get('expires_at', 0) < time() + 60):
+            return None
+        return state
+
+    def _save_state(self):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f)
+        getattr(os, 'replace', os.rename)(tmp, self.state_path)
+
+    def _remove_state(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def init(self):
+        res = self.twitter.media.upload(
+            command='INIT', total_bytes=self.size,
+            media_type=self.media_type, media_category=self.media_category)
+        self.state = {
+            'media_id': res['media_id_string'],
+            'expires_at': time() + int(res.get('expires_after_secs', 3600)),
+            'size': self.size,
+            'mtime': self.mtime,
+            'segment_size': self.segment_size,
+            'done': [],
+        }
+        self._save_state()
+
+    def append(self, f, index):
+        offset = index * self.segment_size
+        size = min(self.segment_size, self.size - offset)
+        attempt = 0
+        while True:
+            try:
+                self.twitter.media.upload(
+                    command='APPEND', media_id=self.state['media_id'],
+                    segment_index=index, media=FileSegment(f, offset, size))
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.retries or not _retriable(e):
+                    raise
+                sleep(min(2 ** (attempt - 1), 30))
+        with self._lock:
+            self.state['done'].append(index)
+            self._save_state()
+
+    def _worker(self, todo, errors):
+        with open(self.path, 'rb') as f:
+            while not errors:
+                try:
+                    index = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self.append(f, index)
+                except Exception as e:
+                    errors.append(e)
+
+    def finalize(self):
+        res = self.twitter.media.upload(
+            command='FINALIZE', media_id=self.state['media_id'])
+        self._remove_state()
+        return res
+
+    def wait(self, res, timeout=None):
+        """
+        Poll the STATUS of the media until its processing is over and
+        return the last response. A TwitterTimeoutError is raised when
+        it isn't over after `timeout` seconds.
+        """
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            info = res.get('processing_info')
+            if not info or info.get('state') == 'succeeded':
+                return res
+            if info.get('state') == 'failed':
+                raise TwitterError("Processing of media %s failed: %s" % (
+                    self.state['media_id'], info.get('error')))
+            delay = info.get('check_after_secs', 1)
+            if deadline is not None and time() + delay > deadline:
+                raise TwitterTimeoutError(
+                    "media/upload.json?command=STATUS&media_id=%s"
+                    % self.state['media_id'], deadline)
+            sleep(delay)
+            res = self.twitter.media.upload(
+                command='STATUS', media_id=self.state['media_id'],
+                _method='GET')
+
+    def run(self, wait=True, wait_timeout=None):
+        """
+        Upload the file, resuming the upload saved in the state file if
+        there is one, and return the FINALIZE response, or the last
+        STATUS one when `wait` is True and the media is processed
+        asynchronously, waiting at most `wait_timeout` seconds.
+        """
+        self.state = self._load_state()
+        if self.state is None:
+            self.init()
+        done = set(self.state['done'])
+        todo = queue.Queue()
+        for index in range(self.segments):
+            if index not in done:
+                todo.put(index)
+        errors = []
+        workers = [
+            threading.Thread(target=self._worker, args=(todo, errors))
+            for _ in range(min(self.max_concurrency, todo.qsize()))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[0]
+        res = self.finalize()
+        if wait:
+            res = self.wait(res, wait_timeout)
+        return res
+
+
+__all__ = ["MediaUpload"]